@@ -0,0 +1,106 @@
+############################################################
+# Benchmark of the throughput of parsing the comment dumps #
+############################################################
+
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data gathering"))
+
+from dumpParsing import convertSimpleIntToInt, getCommentsDataFromFile
+
+FILES: int = 200
+COMMENTS_PER_FILE: list[int] = [100, 1_000, 10_000]
+REPEATS: int = 3
+
+HASHTAG_PATTERN = re.compile(r'#\w+')
+
+def createDumps(directory: str, commentsPerFile: int) -> list[str]:
+    """
+    Creates FILES comment dumps with hashtags, multi-line comments and shortened like counts
+    :param directory: Where the files are created
+    :param commentsPerFile: Number of comments in every file
+    :return: Paths to the created files
+    """
+    random.seed(commentsPerFile)
+    texts = ["nice video", "so #cool and #fun", "first line\nsecond line", "wow " * 20, "agree #tag1"]
+    likes = ["0", "12", "1.2K", "3M", ""]
+
+    files = []
+    for i in range(FILES):
+        hashtags = [f"#tag{random.randint(0, 500)}" for _ in range(random.randint(0, 6))]
+        comments = [
+            f"@user{random.randint(0, 100_000)}${random.choice(texts)}${random.choice(likes)}"
+            for _ in range(commentsPerFile)
+        ]
+
+        filename = f"{directory}/@creator{i}-video-{i}.txt"
+        with open(filename, "w", encoding="utf-8") as file:
+            file.write(f"{commentsPerFile}\n" + "\n".join(hashtags) + "\n\n" + "\n".join(comments))
+        files.append(filename)
+
+    return files
+
+def previousParser(filename: str) -> tuple[int, set[str], set[tuple[str, str, int]]]:
+    """
+    The previous three-pass parsing - split into sections, join the continuation lines, split every line on "$"
+    """
+    with open(filename, "r", encoding="UTF-8") as f:
+        count = int(f.readline().strip())
+        text = f.read()
+
+    if text[:2] == "\n\n":
+        hashtags = set()
+        commentsLines = text[2:].split("\n")
+    else:
+        data = text.strip().split("\n\n")
+        hashtags = set(data[0].split("\n"))
+        commentsLines = data[1].split("\n")
+
+    joined = []
+    for line in commentsLines:
+        if line.strip() == "":
+            continue
+        if not line.startswith("@") and len(joined) > 0:
+            joined[-1] = joined[-1] + " " + line
+        else:
+            joined.append(line)
+
+    comments = set()
+    for line in joined:
+        sep = line.split("$")
+        hashtags.update(HASHTAG_PATTERN.findall(sep[1]))
+        comments.add((sep[0], sep[1], convertSimpleIntToInt(sep[2])))
+
+    return count, hashtags, comments
+
+def throughput(parser, files: list[str], size: int) -> float:
+    """
+    :return: Best throughput of the parser over all the files in MB/s
+    """
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for filename in files:
+            parser(filename)
+        best = min(best, time.perf_counter() - start)
+
+    return size / 2 ** 20 / best
+
+print(f"{'comments/file':>14} {'MB':>8} {'previous MB/s':>14} {'single-pass MB/s':>17}")
+for commentsPerFile in COMMENTS_PER_FILE:
+    with tempfile.TemporaryDirectory() as directory:
+        files = createDumps(directory, commentsPerFile)
+        size = sum(os.path.getsize(filename) for filename in files)
+
+        for filename in files[:5]:
+            assert previousParser(filename)[:3] == getCommentsDataFromFile(filename)[:3]
+
+        previous = throughput(previousParser, files, size)
+        current = throughput(getCommentsDataFromFile, files, size)
+
+        print(f"{commentsPerFile:>14} {size / 2 ** 20:>8.1f} {previous:>14.1f} {current:>17.1f}")
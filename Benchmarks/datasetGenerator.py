@@ -0,0 +1,196 @@
+#############################################################################
+# Generator of synthetic TikTok dumps in the formats of the browser scripts #
+#############################################################################
+
+import argparse
+import os
+
+import numpy as np
+
+# Number of users of the prepared dataset sizes
+SIZES: dict[str, int] = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+# Share of the users which are creators - their posts and both of their follows lists are scraped
+CREATOR_SHARE: float = 0.01
+# Share of the other users whose Following list is scraped
+FOLLOWING_SHARE: float = 0.02
+# The scraping scrolls only through a part of the long lists
+SHOWN_FOLLOWS_LIMIT: int = 5_000
+SHOWN_COMMENTS_LIMIT: int = 1_500
+# Share of the post dumps downloaded from the search, their filenames contain "_q="
+SEARCH_SHARE: float = 0.15
+# Followers of a creator and comments under a post per unit of popularity (at least 1, the top creators have ~50)
+FOLLOWERS_PER_POPULARITY: int = 10
+COMMENTS_PER_POPULARITY: tuple[int, int] = (1, 6)
+# Share of the comments with a hashtag. The hashtags of the comments become hashtags of the post, which are stored
+# with every comment under it, so even a few percent make the data many times larger
+COMMENT_HASHTAG_SHARE: float = 0.005
+# Shape of the power-law distributions (Pareto), smaller means heavier tail
+POPULARITY_SHAPE: float = 1.2
+ACTIVITY_SHAPE: float = 1.5
+
+WORDS: tuple[str, ...] = (
+    "this", "is", "so", "true", "lol", "omg", "who", "else", "watching", "in", "2024", "love", "it", "no", "way",
+    "the", "best", "part", "bro", "fr", "real", "same", "wait", "what", "again", "please", "part", "2", "need",
+)
+EMOJIS: tuple[str, ...] = ("😂", "🔥", "❤️", "😭", "👀", "💀", "🙏")
+
+def userName(userId: int) -> str:
+    return f"@user{userId:07d}" if userId % 3 else f"@u.{userId}_tt"
+
+def generateDataset(directory: str, numUsers: int, seed: int = 0) -> dict[str, int]:
+    """
+    Generates the dumps of a scraping session over numUsers users. Popularity (followers), activity (comments) and
+    hashtag usage follow power laws. Creators get their Followers and Following dumps and the dumps of their
+    posts, a part of the other users gets a Following dump. The files are written as the browser scripts save them
+    :param directory: Where the "comments" and "follows" directories are created
+    :param numUsers: Number of users
+    :param seed: Seed of the random generator, the same seed gives the same files
+    :return: Number of created files and their total size in bytes under "files" and "bytes"
+    """
+    random = np.random.default_rng(seed)
+
+    commentsDirectory = f"{directory}/comments"
+    followsDirectory = f"{directory}/follows"
+    os.makedirs(commentsDirectory, exist_ok=True)
+    os.makedirs(followsDirectory, exist_ok=True)
+
+    popularity = random.pareto(POPULARITY_SHAPE, numUsers) + 1
+    activity = random.pareto(ACTIVITY_SHAPE, numUsers) + 1
+    popularityCdf = np.cumsum(popularity) / popularity.sum()
+    activityCdf = np.cumsum(activity) / activity.sum()
+
+    numHashtags = max(numUsers // 20, 50)
+    hashtagCdf = np.cumsum(1 / np.arange(1, numHashtags + 1)) / np.sum(1 / np.arange(1, numHashtags + 1))
+
+    numCreators = max(int(numUsers * CREATOR_SHARE), 10)
+    creators = np.argsort(-popularity)[:numCreators]
+    followingUsers = random.choice(numUsers, max(int(numUsers * FOLLOWING_SHARE), 10), replace=False)
+
+    totals = {"files": 0, "bytes": 0}
+
+    def write(filename: str, text: str) -> None:
+        encoded = text.encode("utf-8")
+        with open(filename, "wb") as file:
+            file.write(encoded)
+        totals["files"] += 1
+        totals["bytes"] += len(encoded)
+
+    # Followers of the creators - everybody follows popular accounts with the same chance
+    for creator in creators.tolist():
+        total = int(popularity[creator] * FOLLOWERS_PER_POPULARITY)
+        shown = np.unique(random.integers(0, numUsers, min(total, SHOWN_FOLLOWS_LIMIT)))
+        shown = shown[shown != creator]
+        write(
+            f"{followsDirectory}/{userName(creator)} (Followers).txt",
+            "\n".join([str(total)] + [userName(follower) for follower in shown.tolist()]),
+        )
+
+    # Following of the creators and of the sampled users - popular accounts are followed more
+    for user in np.union1d(creators, followingUsers).tolist():
+        total = int(random.pareto(ACTIVITY_SHAPE) * 60) + 1
+        sampled = np.searchsorted(popularityCdf, random.random(min(total, SHOWN_FOLLOWS_LIMIT)))
+        shown = np.unique(np.minimum(sampled, numUsers - 1))
+        shown = shown[shown != user]
+        write(
+            f"{followsDirectory}/{userName(user)} (Following).txt",
+            "\n".join([str(total)] + [userName(followed) for followed in shown.tolist()]),
+        )
+
+    # Posts of the creators - more popular creators post more and get more comments
+    videoId = 7_300_000_000_000_000_000
+    for creator in creators.tolist():
+        numPosts = int(min(1 + random.pareto(ACTIVITY_SHAPE) * 2, 30))
+
+        for _ in range(numPosts):
+            videoId += int(random.integers(1, 1_000_000))
+            filename = f"{userName(creator)}-video-{videoId}"
+            if random.random() < SEARCH_SHARE:
+                tag = f"tag{int(np.searchsorted(hashtagCdf, random.random()))}"
+                filename += f"_q={tag}&t={1_700_000_000_000 + int(random.integers(0, 10 ** 10))}"
+
+            write(f"{commentsDirectory}/{filename}.txt", createPostDump(random, creator, popularity[creator],
+                                                                        activityCdf, hashtagCdf, numUsers))
+
+    return totals
+
+def createPostDump(random: np.random.Generator,
+                   creator: int,
+                   popularity: float,
+                   activityCdf: np.ndarray,
+                   hashtagCdf: np.ndarray,
+                   numUsers: int,
+                   ) -> str:
+    """
+    Creates the text of a post dump - the comment count, the hashtags of the post, an empty line and the comments
+    "@user$text$likes". Some comments span more lines, mention other users (lines starting with "@" without "$"),
+    contain "$" or hashtags, the likes may be shortened ("1.2K")
+    :return: Text of the dump
+    """
+    numHashtags = int(random.integers(0, 9))
+    postHashtags = np.unique(np.searchsorted(hashtagCdf, random.random(numHashtags)))
+
+    totalComments = int(popularity * random.integers(*COMMENTS_PER_POPULARITY))
+    shownComments = min(totalComments, SHOWN_COMMENTS_LIMIT)
+
+    # Active users comment more, the same user often comments more times under one post
+    commenters = np.minimum(np.searchsorted(activityCdf, random.random(shownComments)), numUsers - 1)
+    likes = (random.pareto(1.1, shownComments) * 3).astype(np.int64)
+    lengths = random.integers(1, 14, shownComments)
+    shapes = random.random(shownComments)
+
+    commentLines = []
+
+    for commenter, likeCount, length, shape in zip(commenters.tolist(), likes.tolist(), lengths.tolist(),
+                                                  shapes.tolist()):
+        words = [WORDS[index] for index in random.integers(0, len(WORDS), length).tolist()]
+
+        if shape < COMMENT_HASHTAG_SHARE:
+            words.insert(int(random.integers(0, len(words) + 1)), f"#tag{int(np.searchsorted(hashtagCdf, random.random()))}")
+        elif shape < 0.05:
+            words.append(EMOJIS[int(random.integers(0, len(EMOJIS)))])
+        elif shape < 0.08:
+            words.append("$5")
+
+        text = " ".join(words)
+
+        if shape > 0.97:
+            # Reply mentioning another user on a new line
+            text += f"\n{userName(int(random.integers(0, numUsers)))} {' '.join(words[:3])}"
+        elif shape > 0.94:
+            text += "\n\n" + " ".join(reversed(words))
+
+        commentLines.append(f"{userName(commenter)}${text}${shortNumber(likeCount)}")
+
+    return postDump(totalComments, [f"#tag{tag}" for tag in postHashtags.tolist()], commentLines)
+
+def postDump(count: int, hashtags: list[str], comments: list[str]) -> str:
+    """
+    :return: Text of a post dump laid out as postScript.js saves it - an untagged post gets an empty hashtag line
+    """
+    return f"{count}\n" + "\n".join(hashtags) + "\n\n" + "\n".join(comments)
+
+def shortNumber(number: int) -> str:
+    """
+    :return: The number as TikTok shows it - "999", "1.2K", "3.4M"
+    """
+    if number >= 1_000_000:
+        return f"{number / 1_000_000:.1f}M"
+    if number >= 1_000:
+        return f"{number / 1_000:.1f}K"
+    return str(number)
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Generates synthetic TikTok dumps")
+    arguments.add_argument("directory", help="Where the comments and follows directories are created")
+    arguments.add_argument("--size", default="10k", help=f"One of {', '.join(SIZES)} or a number of users")
+    arguments.add_argument("--seed", type=int, default=0)
+    options = arguments.parse_args()
+
+    users = SIZES[options.size] if options.size in SIZES else int(options.size)
+    created = generateDataset(options.directory, users, options.seed)
+    print(f"Created {created['files']} files ({created['bytes'] / 2 ** 20:.1f} MB) for {users} users")
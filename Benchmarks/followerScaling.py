@@ -0,0 +1,61 @@
+#####################################################################################
+# Benchmark of DataParser ingest time depending on the size of the follower lists #
+#####################################################################################
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data gathering"))
+
+from jsonTransfer import DataParser
+
+SIZES: list[int] = [1_000, 10_000, 50_000, 100_000, 200_000]
+FOLLOWING_FILES: int = 200
+
+def createDumps(directory: str, size: int) -> None:
+    """
+    Creates follows dumps around one popular account with size followers:
+    two overlapping Followers files of the account (union of two big lists) and FOLLOWING_FILES Following files
+    of its followers, every one of them listing the popular account (membership check in a big list)
+    :param directory: Where the files are created
+    :param size: Number of followers of the popular account
+    :return: None
+    """
+    followers = [f"@fan{i}" for i in range(size)]
+
+    with open(f"{directory}/@popular (Followers).txt", "w", encoding="utf-8") as file:
+        file.write(f"{size}\n" + "\n".join(followers[:size * 3 // 4]))
+
+    os.makedirs(f"{directory}/second", exist_ok=True)
+    with open(f"{directory}/second/@popular (Followers).txt", "w", encoding="utf-8") as file:
+        file.write(f"{size}\n" + "\n".join(followers[size // 4:]))
+
+    os.makedirs(f"{directory}/following", exist_ok=True)
+    for i in range(FOLLOWING_FILES):
+        with open(f"{directory}/following/@fan{i} (Following).txt", "w", encoding="utf-8") as file:
+            file.write(f"3\n@popular\n@other{i}\n@fan{size - i - 1}")
+
+def measure(size: int) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        createDumps(directory, size)
+
+        parser = DataParser(f"{directory}/data.json", f"{directory}/hashtags.json")
+        parser.manifestFile = f"{directory}/parsedSources.manifest"
+        parser.parsedSourceFile = f"{directory}/parsedSources.txt"
+
+        start = time.perf_counter()
+
+        parser.startBatch()
+        parser.parseDirectoryFollowsData(directory)
+        parser.parseDirectoryFollowsData(f"{directory}/second")
+        parser.parseDirectoryFollowsData(f"{directory}/following")
+        parser.endBatch()
+
+        return time.perf_counter() - start
+
+print(f"{'followers':>10} {'seconds':>10} {'us/follower':>12}")
+for size in SIZES:
+    seconds = measure(size)
+    print(f"{size:>10} {seconds:>10.3f} {seconds / size * 1_000_000:>12.2f}")
@@ -0,0 +1,71 @@
+#####################################################################
+# Benchmark of the peak memory used for reading large follows dumps #
+#####################################################################
+
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data gathering"))
+
+from dumpParsing import readFollowsChunks
+
+SIZES: list[int] = [10_000, 100_000, 500_000, 1_000_000]
+
+def readWhole(filename: str) -> int:
+    """
+    The previous way of reading the dump - whole text, split into lines and made into a set
+    :return: Number of unique usernames
+    """
+    with open(filename, "r", encoding="UTF-8") as file:
+        file.readline()
+        names = set(file.read().split("\n"))
+    names.discard("")
+    return len(names)
+
+def readStreamed(filename: str) -> int:
+    """
+    Reads the dump in chunks, which are dropped right away like when they are applied onto the data
+    :return: Number of unique usernames
+    """
+    return sum(len(chunk) for chunk in readFollowsChunks(filename))
+
+def uniqueNamesSize(size: int) -> int:
+    """
+    Memory needed just for the set of the unique usernames, which has to be kept for the deduplication
+    and ends up in the user data anyway
+    :return: Size in bytes
+    """
+    names = {f"@fan{i}" for i in range(size)}
+    return sys.getsizeof(names) + sum(sys.getsizeof(name) for name in names)
+
+def peakMemory(function, filename: str) -> tuple[int, int]:
+    """
+    :return: Result of the function and its peak traced memory in bytes
+    """
+    tracemalloc.start()
+    result = function(filename)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+# The overhead is the peak memory on top of the set of the unique usernames - the text of the file and its copies
+print(f"{'usernames':>10} {'whole MB':>10} {'streamed MB':>12} {'whole overhead MB':>18} {'streamed overhead MB':>21}")
+with tempfile.TemporaryDirectory() as directory:
+    for size in SIZES:
+        filename = f"{directory}/@popular (Followers).txt"
+        with open(filename, "w", encoding="utf-8") as file:
+            file.write(f"{size}\n")
+            file.writelines(f"@fan{i}\n" for i in range(size))
+
+        wholeCount, wholePeak = peakMemory(readWhole, filename)
+        streamedCount, streamedPeak = peakMemory(readStreamed, filename)
+        assert wholeCount == streamedCount == size
+
+        namesSize = uniqueNamesSize(size)
+
+        print(
+            f"{size:>10} {wholePeak / 2 ** 20:>10.1f} {streamedPeak / 2 ** 20:>12.1f}"
+            f" {(wholePeak - namesSize) / 2 ** 20:>18.1f} {(streamedPeak - namesSize) / 2 ** 20:>21.1f}"
+        )
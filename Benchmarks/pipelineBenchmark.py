@@ -0,0 +1,205 @@
+#########################################################################################
+# End-to-end benchmark of the pipeline stages on synthetic datasets of different sizes #
+#########################################################################################
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import runpy
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY = os.path.join(BENCHMARKS_DIRECTORY, "..")
+
+sys.path.append(os.path.join(REPOSITORY_DIRECTORY, "Data gathering"))
+
+from datasetGenerator import SIZES, generateDataset
+
+# Stages in the order they run, every stage works with the files created by the previous ones
+STAGES: tuple[str, ...] = (
+    "generate", "ingestComments", "ingestFollows", "snapshot", "userGraph", "leiden", "louvain",
+)
+# Slowdown against the baseline which is reported as a regression
+REGRESSION_THRESHOLD: float = 0.10
+
+def peakRss() -> int:
+    """
+    :return: Peak resident set size of this process in bytes
+    """
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+def directorySize(directory: str) -> tuple[int, int]:
+    """
+    :return: Number of files in the directory and their total size in bytes
+    """
+    sizes = [entry.stat().st_size for entry in os.scandir(directory) if entry.is_file()]
+    return len(sizes), sum(sizes)
+
+def runCommunityScript(module: str, directory: str) -> None:
+    """
+    Runs a community generation script on the dataset as if it was started from the repository. The graph is built
+    from the UserGraph of the userGraph stage and the communities are filled from the snapshot of the snapshot stage
+    (the UserGraph is created after it, so getGraphData() takes it as up to date)
+    """
+    sys.path.append(REPOSITORY_DIRECTORY)
+    sys.path.append(os.path.join(REPOSITORY_DIRECTORY, "GeneratingCommunities"))
+
+    from GeneratingCommunities import fileGetter
+
+    fileGetter.DATA_SOURCE = f"{directory}/data.snapshot"
+    fileGetter.USER_GRAPH_SOURCE = f"{directory}/userGraph.npz"
+    fileGetter.LEIDEN_DATA_SOURCE = f"{directory}/leiden.json"
+    fileGetter.LOUVAIN_DATA_SOURCE = f"{directory}/louvain.json"
+    fileGetter.GRAPH_CACHE_SOURCE = f"{directory}/graphCache"
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        runpy.run_module(module, run_name="__main__")
+
+def runStage(stage: str, directory: str, users: int, seed: int, workers: int) -> dict:
+    """
+    Runs one stage of the pipeline over the dataset in the directory
+    :return: Measurement of the stage - seconds, processed items and their unit, processed bytes
+    """
+    result = {"items": 0, "unit": "", "bytes": 0}
+    start = time.perf_counter()
+
+    if stage == "generate":
+        created = generateDataset(directory, users, seed)
+        result.update(items=created["files"], unit="files", bytes=created["bytes"])
+
+    elif stage in ("ingestComments", "ingestFollows"):
+        from jsonTransfer import DataParser
+
+        source = f"{directory}/comments" if stage == "ingestComments" else f"{directory}/follows"
+        files, size = directorySize(source)
+        start = time.perf_counter()
+
+        # Every file the parser keeps goes into the temporary directory, the defaults are relative
+        # to the working directory and would mix the benchmark with the real parsed sources
+        parser = DataParser(f"{directory}/data.json", f"{directory}/hashtags.json")
+        parser.manifestFile = f"{directory}/parsedSources.manifest"
+        parser.parsedSourceFile = f"{directory}/parsedSources.txt"
+        if stage == "ingestComments":
+            parser.parseDirectoryCommentsData(source, workers=workers)
+        else:
+            parser.parseDirectoryFollowsData(source, workers=workers)
+
+        result.update(items=files, unit="files", bytes=size)
+
+    elif stage in ("userGraph", "snapshot"):
+        sys.path.append(REPOSITORY_DIRECTORY)
+        from GeneratingCommunities.snapshot import UserSnapshot
+        from GeneratingCommunities.userGraph import UserGraph
+
+        with open(f"{directory}/data.json", "r", encoding="utf-8") as file:
+            data = json.load(file)
+
+        if stage == "userGraph":
+            UserGraph.fromData(data).save(f"{directory}/userGraph.npz")
+        else:
+            UserSnapshot.save(data, f"{directory}/data.snapshot")
+
+        result.update(items=len(data), unit="users", bytes=os.path.getsize(f"{directory}/data.json"))
+
+    elif stage in ("leiden", "louvain"):
+        runCommunityScript(f"GeneratingCommunities.{stage}CommunityGeneration", directory)
+
+        with open(f"{directory}/{stage}.json", "r", encoding="utf-8") as file:
+            communities = json.load(file)
+
+        result.update(items=sum(len(info["members"]) for info in communities.values()), unit="users")
+
+    else:
+        raise ValueError(f"Unknown stage {stage}")
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def stageProcess(queue: multiprocessing.Queue, *arguments) -> None:
+    """
+    Entry point of the process running one stage, so the peak memory belongs to that stage only
+    """
+    try:
+        result = runStage(*arguments)
+        result["peakRss"] = peakRss()
+        queue.put(result)
+    except BaseException as error:
+        queue.put({"error": f"{type(error).__name__}: {error}"})
+
+def measureStage(stage: str, directory: str, users: int, seed: int, workers: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+
+    process = context.Process(target=stageProcess, args=(queue, stage, directory, users, seed, workers))
+    process.start()
+    result = queue.get()
+    process.join()
+
+    return result
+
+def printResult(size: str, stage: str, result: dict, baseline: dict | None) -> None:
+    if "error" in result:
+        print(f"{size:>6} {stage:>15} failed - {result['error']}")
+        return
+
+    seconds = result["seconds"]
+    throughput = f"{result['items'] / seconds:,.0f} {result['unit']}/s" if seconds > 0 else "-"
+    if result["bytes"] > 0 and seconds > 0:
+        throughput += f", {result['bytes'] / seconds / 2 ** 20:.1f} MB/s"
+
+    line = f"{size:>6} {stage:>15} {seconds:>10.2f} {result['peakRss'] / 2 ** 20:>10.0f}  {throughput}"
+
+    previous = (baseline or {}).get(size, {}).get(stage)
+    if previous is not None and "seconds" in previous and previous["seconds"] > 0:
+        change = seconds / previous["seconds"] - 1
+        line += f"  ({change:+.0%} vs baseline{', REGRESSION' if change > REGRESSION_THRESHOLD else ''})"
+
+    print(line)
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description="Measures the pipeline stages on synthetic datasets")
+    arguments.add_argument("--sizes", nargs="+", default=["10k"], help=f"Dataset sizes ({', '.join(SIZES)})")
+    arguments.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    arguments.add_argument("--workers", type=int, default=1, help="Worker processes of the ingest stages")
+    arguments.add_argument("--seed", type=int, default=0)
+    arguments.add_argument("--output", help=".json file the results are saved into")
+    arguments.add_argument("--baseline", help=".json file with earlier results to compare with")
+    options = arguments.parse_args()
+
+    baseline = None
+    if options.baseline is not None:
+        with open(options.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    # The stages work with the files of the previous ones, so everything up to the last selected stage runs
+    stages = STAGES[:max(STAGES.index(stage) for stage in options.stages) + 1]
+
+    results: dict[str, dict[str, dict]] = {}
+
+    print(f"{'size':>6} {'stage':>15} {'seconds':>10} {'peak MB':>10}  throughput")
+    for size in options.sizes:
+        users = SIZES[size] if size in SIZES else int(size)
+        results[size] = {}
+
+        with tempfile.TemporaryDirectory() as directory:
+            for stage in stages:
+                result = measureStage(stage, directory, users, options.seed, options.workers)
+                results[size][stage] = result
+                printResult(size, stage, result, baseline)
+
+                if "error" in result:
+                    break
+
+    if options.output is not None:
+        with open(options.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=3)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+####################################################################################
+# Benchmark of building the graph and aggregating the users from JSON and snapshot #
+####################################################################################
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY = os.path.join(BENCHMARKS_DIRECTORY, "..")
+
+sys.path.append(os.path.join(REPOSITORY_DIRECTORY, "Data gathering"))
+sys.path.append(os.path.join(REPOSITORY_DIRECTORY, "GeneratingCommunities"))
+sys.path.append(REPOSITORY_DIRECTORY)
+
+from datasetGenerator import generateDataset
+from jsonTransfer import DataParser
+from GeneratingCommunities.snapshot import UserSnapshot
+from RelationshipExtractor import GraphBuilder
+from communityPostprocessing import aggregateUsers
+
+USERS: list[int] = [1_000, 3_000]
+COMMUNITIES: int = 50
+
+def timed(function) -> tuple[object, float]:
+    """
+    :return: Result of the function and its wall time in seconds
+    """
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def readTimes(load) -> tuple[list[float], int]:
+    """
+    Loads the user data, builds the graph from it and aggregates the users into COMMUNITIES communities
+    :return: Wall times of the three steps and the number of edges
+    """
+    data, loadTime = timed(load)
+    edges, buildTime = timed(lambda: GraphBuilder().build(data))
+    communityIndex = {user: index % COMMUNITIES for index, user in enumerate(data)}
+    _, aggregateTime = timed(lambda: aggregateUsers(data, communityIndex, COMMUNITIES))
+
+    return [loadTime, buildTime, aggregateTime], edges.numEdges
+
+def loadJson(filename: str) -> dict:
+    with open(filename, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+print(f"{'users':>6} {'MB':>6} {'source':>9} {'load s':>7} {'build s':>8} {'aggregate s':>12} {'total s':>8}")
+for numUsers in USERS:
+    with tempfile.TemporaryDirectory() as directory:
+        generateDataset(directory, numUsers)
+        parser = DataParser(f"{directory}/data.json", f"{directory}/hashtags.json")
+        parser.parsedSourceFile = f"{directory}/parsedSources.txt"
+        parser.manifestFile = f"{directory}/parsedSources.manifest"
+        parser.parseDirectoryCommentsData(f"{directory}/comments")
+        parser.parseDirectoryFollowsData(f"{directory}/follows")
+        UserSnapshot.save(loadJson(f"{directory}/data.json"), f"{directory}/data.snapshot")
+
+        size = os.path.getsize(f"{directory}/data.json") / 2 ** 20
+        jsonTimes, jsonEdges = readTimes(lambda: loadJson(f"{directory}/data.json"))
+        snapshotTimes, snapshotEdges = readTimes(lambda: UserSnapshot.open(f"{directory}/data.snapshot"))
+        assert jsonEdges == snapshotEdges
+
+        for source, times in (("json", jsonTimes), ("snapshot", snapshotTimes)):
+            print(f"{numUsers:>6} {size:>6.0f} {source:>9} {times[0]:>7.2f} {times[1]:>8.2f} {times[2]:>12.2f} "
+                  f"{sum(times):>8.2f}")
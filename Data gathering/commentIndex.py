@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+
+def normalizeComment(text: str, likes: int, hashtags) -> dict:
+    """
+    The one normalization rule for the posted comments - used for storing them and for finding duplicates
+    :param text: Comment text
+    :param likes: Number of likes
+    :param hashtags: Hashtags of the post
+    :return: Comment in the format stored in commentsPosted
+    """
+    return {
+        "text": text.strip().lower(),
+        "likes": likes,
+        "hashtags": sorted(hashtags),
+    }
+
+def commentKey(comment: dict) -> str:
+    """
+    :param comment: Comment from commentsPosted
+    :return: Hash of the normalized comment (text, likes, sorted hashtags)
+    """
+    normalized = normalizeComment(comment["text"], comment["likes"], comment["hashtags"])
+    encoded = json.dumps([normalized["text"], normalized["likes"], normalized["hashtags"]], ensure_ascii=False)
+
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+def postedCommentKeys(record: dict) -> list[list[str]]:
+    """
+    :param record: Comments record
+    :return: Sorted [user, commentKey] of the comments the record stores
+    """
+    hashtags = set(record["hashtags"])
+    keys = {(user, commentKey(normalizeComment(text, likes, hashtags))) for user, text, likes in record["comments"]}
+
+    return [list(key) for key in sorted(keys)]
+
+def staleCommentKeys(record: dict) -> list[tuple[str, str]]:
+    """
+    :param record: Comments record, with the contribution of the previous version of its source under "previous"
+    :return: [user, commentKey] of the comments stored by the previous version which the record doesn't store
+    """
+    previousKeys = record.get("previous", {}).get("comments", [])
+    if len(previousKeys) == 0:
+        return []
+
+    currentKeys = {tuple(key) for key in postedCommentKeys(record)}
+    return [tuple(key) for key in previousKeys if tuple(key) not in currentKeys]
+
+class CommentIndex:
+    """
+    Per-user sets of the comment keys, so a new comment is checked for duplicates in O(1).
+    The index is kept next to the data file and is only trusted if it was written for the current version
+    of the data file, otherwise the sets are rebuilt from commentsPosted the first time a user is touched
+    """
+
+    def __init__(self, indexFile: str, dataFile: str):
+        self.indexFile: str = indexFile
+        self.dataFile: str = dataFile
+
+        self.__keys: dict[str, set[str]] = {}
+
+    def load(self) -> None:
+        """
+        Loads the index if it belongs to the current data file
+        :return: None
+        """
+        self.__keys = {}
+
+        try:
+            with open(self.indexFile, "r") as file:
+                index = json.load(file)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return
+
+        if index.get("stamp") != self.__dataStamp():
+            return
+
+        self.__keys = {user: set(keys) for user, keys in index["users"].items()}
+
+    def save(self) -> None:
+        """
+        Writes the index stamped with the current version of the data file. Should be called right after
+        the data file is written
+        :return: None
+        """
+        index = {
+            "stamp": self.__dataStamp(),
+            "users": {user: list(keys) for user, keys in self.__keys.items()},
+        }
+
+        temporaryFile = self.indexFile + ".tmp"
+        with open(temporaryFile, "w") as file:
+            json.dump(index, file)
+        os.replace(temporaryFile, self.indexFile)
+
+    def add(self, user: str, comment: dict, commentsPosted: list[dict]) -> bool:
+        """
+        Notes the comment of the user in the index
+        :param user: Author of the comment
+        :param comment: Normalized comment
+        :param commentsPosted: Comments of the user already in the data, used only when the user is not indexed yet
+        :return: True if the comment is new, False if it is a duplicate
+        """
+        keys = self.__keys.get(user)
+        if keys is None:
+            keys = {commentKey(posted) for posted in commentsPosted}
+            self.__keys[user] = keys
+
+        key = commentKey(comment)
+        if key in keys:
+            return False
+
+        keys.add(key)
+        return True
+
+    def remove(self, user: str, key: str, commentsPosted: list[dict]) -> None:
+        """
+        Forgets the comment of the user, so the same comment can be stored again
+        :param user: Author of the comment
+        :param key: Key of the comment from commentKey()
+        :param commentsPosted: Comments of the user already in the data, used only when the user is not indexed yet
+        :return: None
+        """
+        keys = self.__keys.get(user)
+        if keys is None:
+            keys = {commentKey(posted) for posted in commentsPosted}
+            self.__keys[user] = keys
+
+        keys.discard(key)
+
+    def __dataStamp(self) -> list[int] | None:
+        try:
+            stat = os.stat(self.dataFile)
+        except FileNotFoundError:
+            return None
+
+        return [stat.st_size, stat.st_mtime_ns]
@@ -0,0 +1,298 @@
+import re
+
+from sourceManifest import describeSource
+
+HASHTAG_PATTERN = re.compile(r'#\w+')
+# Continuation lines of a comment (skipping the empty ones) are joined with a space
+CONTINUATION_PATTERN = re.compile(r'\n(?:[^\S\n]*\n)*')
+# Likes as shown by TikTok, e.g. "12", "1.2K" or "3M". Comments without likes have an empty likes field
+LIKES_PATTERN = re.compile(r'\d+(?:\.\d+)?[KM]?')
+# Total number of the comments on the first line of a comments dump
+COUNT_PATTERN = re.compile(r'\d+')
+SHORT_NUMBER_MULTIPLIERS: dict[str, float] = {
+    "K": 1000.0,
+    "M": 1_000_000.0
+}
+
+# Kinds of the tokens yielded by tokenizeCommentsDump()
+HASHTAG: str = "hashtag"
+COMMENT: str = "comment"
+MALFORMED: str = "malformed"
+
+FOLLOWS_CHUNK_SIZE: int = 10_000
+
+def followsFileInfo(source: str) -> (str, str):
+    """
+    Discerns the account and the type of the follows file from its name
+    :param source: File with name format "@name (type)" where type is Followers or Following
+    :return: Account username and the type - Followers or Following
+    """
+    noPath: str = source.split("/")[-1]
+    accountUser: str = noPath.split(" ")[0]
+    fileType: str = noPath.split(" ")[1].replace(").txt", "").replace("(","")
+
+    if fileType not in ["Followers","Following"]:
+        raise NameError("File must be either (Followers) or (Following)")
+
+    return accountUser, fileType
+
+def sourceKind(source: str) -> str | None:
+    """
+    Routes the dump file by the filenames given by the browser scripts
+    :param source: Path to the file
+    :return: "follows" for "@name (Followers).txt" and "@name (Following).txt", "comments" for the other "@...txt"
+    files, None if the file is not a dump
+    """
+    noPath: str = source.split("/")[-1]
+
+    if noPath.startswith("--") or not noPath.startswith("@") or not noPath.endswith(".txt"):
+        return None
+
+    if noPath.endswith(" (Followers).txt") or noPath.endswith(" (Following).txt"):
+        return "follows"
+
+    return "comments"
+
+def createCommentsRecord(source: str) -> dict:
+    """
+    Reads the comments file and creates the record which DataParser applies onto the stores
+    :param source: Path to the comments file (without the search tag)
+    :return: Comments record
+    """
+    count: int
+    hashtags: set[str]
+    comments: set[tuple[str, str, int]]
+    malformed: int
+    count, hashtags, comments, malformed = getCommentsDataFromFile(source)
+
+    postCreator = source.split("/")[-1].split("-")[0]
+
+    return {
+        "type": "comments",
+        "creator": postCreator,
+        "count": count,
+        "hashtags": sorted(hashtags),
+        "comments": sorted([list(entry) for entry in comments]),
+        "malformed": malformed,
+    }
+
+def createFollowsRecord(source: str, streamed: bool = False) -> dict:
+    """
+    Reads the follows file and creates the record which DataParser applies onto the stores
+    :param source: File with name format "@name (type)" where type is Followers or Following
+    :param streamed: If True, the record gets a generator of username chunks under "chunks" instead of the
+    sorted "users" list, so the file is read only while the record is being applied
+    :return: Follows record
+    """
+    accountUser, fileType = followsFileInfo(source)
+
+    record = {
+        "type": "follows",
+        "account": accountUser,
+        "kind": fileType,
+        "count": readFollowsCount(source),
+    }
+
+    if streamed:
+        record["chunks"] = readFollowsChunks(source)
+    else:
+        usernames: list[str] = []
+        for chunk in readFollowsChunks(source):
+            usernames.extend(chunk)
+        usernames.sort()
+        record["users"] = usernames
+
+    return record
+
+def createRecord(task: tuple[str, str]) -> tuple[str, dict, dict]:
+    """
+    Entry point for the worker processes of DataParser.parseDirectory*Data
+    :param task: Tuple (type, source) where type is "comments" or "follows"
+    :return: Tuple (source, record, manifest description of the source)
+    """
+    kind, source = task
+
+    description = describeSource(source)
+
+    if kind == "comments":
+        return source, createCommentsRecord(source), description
+
+    return source, createFollowsRecord(source), description
+
+def getCommentsDataFromFile(filename: str) -> (int, set[str], set[tuple[str, str, int]], int):
+    """
+    Function reads the provided file and discerns the hashtags and usernames/comments/likes from it
+
+    Source file should be .txt with format hashtags each in a new line. There should be
+    an empty line separating the two sections. The other section should be "@user$Comment$likes".
+
+    :param filename: name of the source file
+    :return: Int=total comments count, sets containing hashtags and tuples containing the rest of the data respectively
+    and the number of malformed comment lines
+    :raises ValueError: If the first line is not the total comments count, the whole file is rejected
+    """
+    hashtags = set()
+    comments = set()
+    commentTexts = []
+    malformed = 0
+
+    with open(filename, "r", encoding="UTF-8") as f:
+
+        countLine = f.readline().strip()
+        if not COUNT_PATTERN.fullmatch(countLine):
+            raise ValueError(f"The first line of {filename} should be the total comments count, not {countLine!r}")
+        count = int(countLine)
+
+        text = f.read()
+
+    for kind, value in tokenizeCommentsDump(text):
+        if kind == COMMENT:
+            comments.add(value)
+            commentTexts.append(value[1])
+        elif kind == HASHTAG:
+            hashtags.add(value)
+        else:
+            malformed += 1
+
+    # Hashtags of all the comments are found by one search over their joined texts
+    hashtags.update(HASHTAG_PATTERN.findall("\n".join(commentTexts)))
+
+    return count, hashtags, comments, malformed
+
+def tokenizeCommentsDump(text: str):
+    """
+    Generator going once through the comments dump (the text after the count on the first line).
+    Lines up to the first empty line are the hashtags of the post, then every comment starts on a new line
+    "@user$" and lines not starting like that continue the previous comment (joined with a space).
+    The text of the comment is everything between the first and the last "$", so it may contain "$" as well.
+    An empty likes field counts as 0 likes, a comment with likes which aren't a (shortened) number is malformed
+    :param text: Text of the dump without the first line
+    :return: Yields tuples (HASHTAG, tag), (COMMENT, (user, text, likes)) and (MALFORMED, line)
+    """
+    if text.startswith("\n"):
+        hashtagSection, commentSection = "", text
+    else:
+        hashtagSection, _, commentSection = text.partition("\n\n")
+
+    for line in hashtagSection.split("\n"):
+        tag = line.strip()
+        if tag != "":
+            yield HASHTAG, tag
+
+    # Every piece starts with a username, unless the "@" only started a continuation line
+    pieces = ("\n" + commentSection).split("\n@")
+    orphanLines = pieces[0]
+    # The first piece is replaced by an empty comment start, which makes the loop yield the last comment
+    pieces[0] = "$"
+    pieces.append(pieces.pop(0))
+
+    user: str | None = None
+    rest: str = ""
+    knownLikes: dict[str, int] = {}
+
+    for piece in pieces:
+        username, separator, pieceRest = piece.partition("$")
+
+        if separator == "" or " " in username or "\n" in username:
+            if user is None:
+                orphanLines += "\n@" + piece
+            else:
+                rest += "\n@" + piece
+            continue
+
+        if user is not None:
+            if "\n" in rest:
+                rest = CONTINUATION_PATTERN.sub(" ", rest.rstrip())
+
+            commentText, likesSeparator, likes = rest.rpartition("$")
+
+            # The same few like counts repeat a lot, so each of them is validated and converted only once
+            likesCount = knownLikes.get(likes)
+            if likesCount is None:
+                strippedLikes = likes.strip()
+                if strippedLikes == "":
+                    # TikTok shows no count for comments without likes
+                    likesCount = 0
+                elif LIKES_PATTERN.fullmatch(strippedLikes):
+                    likesCount = convertSimpleIntToInt(strippedLikes)
+                else:
+                    likesCount = -1
+                knownLikes[likes] = likesCount
+
+            if likesSeparator != "" and likesCount >= 0:
+                yield COMMENT, (user, commentText, likesCount)
+            else:
+                yield MALFORMED, user + "$" + rest
+
+        user, rest = "@" + username, pieceRest
+
+    # Continuation lines without any comment before them
+    for line in orphanLines.split("\n"):
+        if line.strip() != "":
+            yield MALFORMED, line
+
+def getFollowsDataFromFile(filename: str) -> (int, set[str]):
+    """
+    Function reads the provided file and discerns the number on the first line and creates a set from the rest from it
+    :param filename: File with either Following or Followers
+    :return: Total count from TikTok and a set of shown Users in the current category
+    """
+    names: set[str] = set()
+    for chunk in readFollowsChunks(filename):
+        names.update(chunk)
+
+    return readFollowsCount(filename), names
+
+def readFollowsCount(filename: str) -> int:
+    """
+    :param filename: File with either Following or Followers
+    :return: Total count from TikTok on the first line of the file
+    """
+    with open(filename, "r", encoding="UTF-8") as file:
+        return convertSimpleIntToInt(file.readline().strip())
+
+def readFollowsChunks(filename: str, chunkSize: int = FOLLOWS_CHUNK_SIZE):
+    """
+    Generator going through the usernames of the follows file line by line, so the text of the file is never
+    held in memory as a whole. Every username is yielded only once and empty lines are skipped
+    :param filename: File with either Following or Followers
+    :param chunkSize: Maximal number of usernames in one chunk
+    :return: Yields lists of new unique usernames
+    """
+    seen: set[str] = set()
+    chunk: list[str] = []
+
+    with open(filename, "r", encoding="UTF-8") as file:
+        file.readline()
+
+        for line in file:
+            name = line.rstrip("\n")
+            if name == "" or name in seen:
+                continue
+
+            seen.add(name)
+            chunk.append(name)
+
+            if len(chunk) >= chunkSize:
+                yield chunk
+                chunk = []
+
+    if len(chunk) > 0:
+        yield chunk
+
+def convertSimpleIntToInt(number: str) -> int:
+    """
+    Converts number in string form into an integer. Takes in mind the number might be in format "1.1M" or "6.8K"
+    (Shouldn't be needed but kept for redundancy)
+    :param number: String
+    :return: Converted integer
+    """
+    if len(number) == 0:
+        return 0
+
+    multiplier: str = number[-1]
+
+    if multiplier in SHORT_NUMBER_MULTIPLIERS:
+        return int( float(number[:-1]) * SHORT_NUMBER_MULTIPLIERS[multiplier])
+    else:
+        return int(number)
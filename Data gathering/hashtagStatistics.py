@@ -0,0 +1,273 @@
+import os
+from array import array
+
+import numpy as np
+
+class HashtagStatistics:
+    """
+    Hashtag statistics of the whole ingest - how many posts every hashtag appeared on and how many times every
+    two hashtags appeared on the same post. Hashtags are interned as int ids and the co-occurrences are kept
+    as a sparse upper triangle - sorted pair keys (id << 32 | otherId, id < otherId) with their counts.
+    New and removed pairs are only appended into buffers and summed into the matrix in bulk
+    """
+
+    # Number of buffered pairs after which they are summed into the matrix
+    FOLD_SIZE: int = 1 << 20
+
+    def __init__(self):
+        self.__ids: dict[str, int] = {}
+        self.__names: list[str] = []
+        self.__counts: array = array("q")
+
+        self.__pairKeys: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.__pairWeights: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.__pending: array = array("q")
+        self.__pendingRemoved: array = array("q")
+
+    def __len__(self) -> int:
+        return len(self.__names)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self.__ids
+
+    def addPost(self, hashtags: set[str], previousHashtags: set[str] = frozenset()) -> None:
+        """
+        Notes the hashtags of one post. The counts of a changed post replace the counts of its previous version
+        :param hashtags: Hashtags of the post
+        :param previousHashtags: Hashtags of the previous version of the same post, they are already counted
+        :return: None
+        """
+        tagIds = sorted(self.__intern(tag) for tag in hashtags)
+        previousIds = sorted(self.__ids[tag] for tag in previousHashtags if tag in self.__ids)
+        current = set(tagIds)
+        previous = set(previousIds)
+
+        for tagId in current - previous:
+            self.__counts[tagId] += 1
+        for tagId in previous - current:
+            self.__counts[tagId] -= 1
+
+        # Pairs of both versions stay counted, only the new ones are added and the gone ones removed
+        for ids, otherVersion, pending in ((tagIds, previous, self.__pending),
+                                           (previousIds, current, self.__pendingRemoved)):
+            for i, tagId in enumerate(ids):
+                for otherId in ids[i + 1:]:
+                    if tagId in otherVersion and otherId in otherVersion:
+                        continue
+                    pending.append(tagId << 32 | otherId)
+
+        if len(self.__pending) + len(self.__pendingRemoved) >= self.FOLD_SIZE:
+            self.__fold()
+
+    def count(self, tag: str) -> int:
+        """
+        :param tag: Hashtag
+        :return: Number of posts with the hashtag
+        """
+        tagId = self.__ids.get(tag)
+        return 0 if tagId is None else self.__counts[tagId]
+
+    def weight(self, tag: str, other: str) -> int:
+        """
+        :param tag: Hashtag
+        :param other: Other hashtag
+        :return: Number of posts with both of the hashtags
+        """
+        if tag not in self.__ids or other not in self.__ids or tag == other:
+            return 0
+
+        key = self.__pairKey(self.__ids[tag], self.__ids[other])
+        keys, weights = self.__matrix()
+
+        index = np.searchsorted(keys, key)
+        if index < len(keys) and keys[index] == key:
+            return int(weights[index])
+        return 0
+
+    def connections(self, tag: str) -> dict[str, int]:
+        """
+        :param tag: Hashtag
+        :return: Dict of the hashtags which appeared together with the given one and their co-occurrence counts
+        """
+        if tag not in self.__ids:
+            return {}
+
+        rows, columns, weights = self.coo()
+        tagId = self.__ids[tag]
+
+        result = {}
+        for others, ownSide in ((columns, rows), (rows, columns)):
+            selected = ownSide == tagId
+            for otherId, weight in zip(others[selected].tolist(), weights[selected].tolist()):
+                result[self.__names[otherId]] = weight
+
+        return result
+
+    def names(self) -> list[str]:
+        """
+        :return: Hashtags ordered by their ids
+        """
+        return list(self.__names)
+
+    def counts(self) -> np.ndarray:
+        """
+        :return: Number of posts of every hashtag, indexed by the hashtag ids
+        """
+        return np.frombuffer(self.__counts, dtype=np.int64).copy()
+
+    def coo(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :return: Upper triangle of the co-occurrence matrix as arrays (rows, columns, weights), rows < columns
+        """
+        keys, weights = self.__matrix()
+        return (keys >> 32).astype(np.int32), (keys & 0xFFFFFFFF).astype(np.int32), weights
+
+    def toJson(self) -> dict[str, dict]:
+        """
+        :return: Statistics in the format of the hashtag .json file - {tag: {"count": n, "connections": [tags]}},
+        without the hashtags whose posts all changed to other hashtags
+        """
+        rows, columns, _ = self.coo()
+
+        connections: list[list[str]] = [[] for _ in self.__names]
+        for tagId, otherId in zip(rows.tolist(), columns.tolist()):
+            connections[tagId].append(self.__names[otherId])
+            connections[otherId].append(self.__names[tagId])
+
+        return {
+            tag: {"count": self.__counts[tagId], "connections": connections[tagId]}
+            for tagId, tag in enumerate(self.__names) if self.__counts[tagId] > 0
+        }
+
+    @classmethod
+    def fromJson(cls, data: dict) -> "HashtagStatistics":
+        """
+        Creates the statistics from the hashtag .json file. The file has no co-occurrence counts, so every
+        connection gets the count 1
+        :param data: Loaded hashtag .json file
+        :return: HashtagStatistics
+        """
+        return cls.fromWeights(
+            {tag: info["count"] for tag, info in data.items()},
+            ((tag, other, 1) for tag, info in data.items() for other in info["connections"]),
+        )
+
+    @classmethod
+    def fromWeights(cls, counts: dict[str, int], weights) -> "HashtagStatistics":
+        """
+        :param counts: Number of posts of every hashtag
+        :param weights: Iterable of (tag, other, co-occurrence count), a pair may be listed in both directions
+        :return: HashtagStatistics
+        """
+        statistics = cls()
+
+        for tag, count in counts.items():
+            statistics.__counts[statistics.__intern(tag)] = count
+
+        keys = array("q")
+        values = array("q")
+        for tag, other, weight in weights:
+            if tag != other:
+                keys.append(cls.__pairKey(statistics.__intern(tag), statistics.__intern(other)))
+                values.append(weight)
+
+        # A pair listed in both directions has the same count, so it is taken only once
+        statistics.__pairKeys, inverse = np.unique(np.frombuffer(keys, dtype=np.int64), return_inverse=True)
+        statistics.__pairWeights = np.zeros(len(statistics.__pairKeys), dtype=np.int64)
+        np.maximum.at(statistics.__pairWeights, inverse, np.frombuffer(values, dtype=np.int64))
+
+        return statistics
+
+    def save(self, filename: str, sync: bool = False) -> None:
+        """
+        Saves the statistics into one uncompressed .npz file - the hashtags as one UTF-8 buffer with offsets,
+        their counts and the co-occurrence matrix
+        :param filename: Path to the .npz file
+        :param sync: Whether to sync the file to the disk
+        :return: None
+        """
+        encoded = [tag.encode("utf-8") for tag in self.__names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(tag) for tag in encoded], out=offsets[1:])
+
+        keys, weights = self.__matrix()
+
+        with open(filename, "wb") as file:
+            np.savez(
+                file,
+                tagOffsets=offsets,
+                tagBuffer=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                counts=np.frombuffer(self.__counts, dtype=np.int64),
+                pairKeys=keys,
+                pairWeights=weights,
+            )
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+
+    @classmethod
+    def load(cls, filename: str) -> "HashtagStatistics":
+        """
+        :param filename: Path to the .npz file created by save()
+        :return: HashtagStatistics
+        """
+        statistics = cls()
+
+        with np.load(filename) as arrays:
+            offsets = arrays["tagOffsets"]
+            buffer = arrays["tagBuffer"].tobytes()
+
+            statistics.__names = [
+                buffer[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)
+            ]
+            statistics.__ids = {tag: tagId for tagId, tag in enumerate(statistics.__names)}
+            statistics.__counts = array("q", arrays["counts"].tobytes())
+            statistics.__pairKeys = arrays["pairKeys"]
+            statistics.__pairWeights = arrays["pairWeights"]
+
+        return statistics
+
+    def __intern(self, tag: str) -> int:
+        tagId = self.__ids.get(tag)
+        if tagId is None:
+            tagId = len(self.__names)
+            if tagId >= 2 ** 31:
+                raise OverflowError("Too many hashtags for int32 ids")
+
+            self.__ids[tag] = tagId
+            self.__names.append(tag)
+            self.__counts.append(0)
+
+        return tagId
+
+    @staticmethod
+    def __pairKey(tagId: int, otherId: int) -> int:
+        if tagId > otherId:
+            tagId, otherId = otherId, tagId
+        return tagId << 32 | otherId
+
+    def __matrix(self) -> tuple[np.ndarray, np.ndarray]:
+        if len(self.__pending) + len(self.__pendingRemoved) > 0:
+            self.__fold()
+        return self.__pairKeys, self.__pairWeights
+
+    def __fold(self) -> None:
+        """
+        Sums the buffered pairs into the sorted pair keys and their counts, the pairs whose count drops to 0 are
+        left out
+        :return: None
+        """
+        keys = np.concatenate((self.__pairKeys, np.frombuffer(self.__pending, dtype=np.int64),
+                               np.frombuffer(self.__pendingRemoved, dtype=np.int64)))
+        weights = np.concatenate((self.__pairWeights, np.ones(len(self.__pending), dtype=np.int64),
+                                  -np.ones(len(self.__pendingRemoved), dtype=np.int64)))
+
+        uniqueKeys, inverse = np.unique(keys, return_inverse=True)
+        summed = np.bincount(inverse, weights=weights, minlength=len(uniqueKeys)).astype(np.int64)
+
+        # Counts of the legacy hashtag .json file are only 1 per pair (see fromJson()), so they may drop below 0
+        kept = summed > 0
+        self.__pairKeys = uniqueKeys[kept]
+        self.__pairWeights = summed[kept]
+        self.__pending = array("q")
+        self.__pendingRemoved = array("q")
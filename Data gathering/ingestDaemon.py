@@ -0,0 +1,316 @@
+###############################################################################
+# Daemon ingesting the dumps from a watched directory during scraping sessions #
+###############################################################################
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+from dumpParsing import sourceKind
+from jsonTransfer import DataParser
+from sqliteStorage import SqliteStorage
+
+class FolderWatcher:
+    """
+    Waits for changes in a directory. On Linux it sleeps on inotify until something in the directory is written,
+    moved in or deleted, elsewhere it just waits for the poll interval
+    """
+
+    # inotify event masks, see <sys/inotify.h>
+    IN_MODIFY: int = 0x002
+    IN_CLOSE_WRITE: int = 0x008
+    IN_MOVED_TO: int = 0x080
+    IN_CREATE: int = 0x100
+    IN_DELETE: int = 0x200
+
+    def __init__(self, directory: str, pollInterval: float):
+        self.directory: str = directory
+        self.pollInterval: float = pollInterval
+
+        self.__fd: int | None = self.__initInotify(directory)
+
+    @property
+    def usesInotify(self) -> bool:
+        return self.__fd is not None
+
+    def wait(self, timeout: float) -> None:
+        """
+        Blocks until something changes in the directory or the timeout passes
+        :param timeout: Maximal waiting time in seconds
+        :return: None
+        """
+        if self.__fd is None:
+            time.sleep(min(timeout, self.pollInterval))
+            return
+
+        readable, _, _ = select.select([self.__fd], [], [], timeout)
+        if readable:
+            # The events only wake the daemon up, the directory is scanned afterwards anyway
+            try:
+                while os.read(self.__fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+    @classmethod
+    def __initInotify(cls, directory: str) -> int | None:
+        """
+        :return: Non-blocking inotify descriptor watching the directory, None if inotify is not available
+        """
+        if not sys.platform.startswith("linux"):
+            return None
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+
+        if fd < 0:
+            return None
+
+        mask = cls.IN_MODIFY | cls.IN_CLOSE_WRITE | cls.IN_MOVED_TO | cls.IN_CREATE | cls.IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+
+        return fd
+
+class IngestDaemon:
+    """
+    Watches the directory the browser scripts download into and ingests every new or changed dump.
+    A file is parsed only after its size and modification time stay the same for settleSeconds, so partially
+    downloaded files are skipped. The files are applied onto the in-memory stores of DataParser in batch mode
+    and flushed durably every flushSeconds, so the new data is in the .json files (or the database) within seconds
+    """
+
+    def __init__(self,
+                 parser: DataParser,
+                 directory: str,
+                 settleSeconds: float = 1.0,
+                 flushSeconds: float = 5.0,
+                 pollInterval: float = 0.5,
+                 ):
+        """
+        :param parser: DataParser the files are applied onto, it is kept in batch mode while the daemon runs
+        :param directory: Watched directory
+        :param settleSeconds: How long a file has to stay unchanged before it is parsed
+        :param flushSeconds: How often the applied files are flushed
+        :param pollInterval: How often the directory is scanned when inotify is not available
+        """
+        if settleSeconds < 0 or flushSeconds <= 0 or pollInterval <= 0:
+            raise ValueError("settleSeconds must not be negative, flushSeconds and pollInterval must be positive")
+
+        self.parser: DataParser = parser
+        self.directory: str = directory
+        self.settleSeconds: float = settleSeconds
+        self.flushSeconds: float = flushSeconds
+        self.pollInterval: float = pollInterval
+
+        # Files waiting to settle - their (size, mtime) and when it was first seen
+        self.__pending: dict[str, tuple[tuple[int, int], float]] = {}
+        # Files which are flushed (or failed to parse) with the (size, mtime) they had
+        self.__handled: dict[str, tuple[int, int]] = {}
+        # Files handed to the parser since the last flush with their (size, mtime) and whether they were applied
+        # (not skipped as unchanged), they become handled only once the flush succeeds
+        self.__unflushed: dict[str, tuple[tuple[int, int], bool]] = {}
+
+        self.__lastFlush: float = time.monotonic()
+        self.__running: bool = False
+
+        self.appliedFiles: int = 0
+        self.failedFiles: int = 0
+        self.malformedLines: int = 0
+
+    def run(self) -> None:
+        """
+        Runs until stop() is called or the process is interrupted, the applied files are flushed on the way out
+        :return: None
+        """
+        watcher = FolderWatcher(self.directory, self.pollInterval)
+        self.parser.startBatch()
+        self.__running = True
+
+        try:
+            while self.__running:
+                self.step()
+
+                # Settling files are checked again soon, otherwise the daemon sleeps until the next flush
+                timeout = self.flushSeconds
+                if len(self.__pending) > 0:
+                    timeout = min(timeout, max(self.settleSeconds / 2, 0.05))
+                watcher.wait(timeout)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.__running = False
+            watcher.close()
+            self.parser.endBatch()
+
+    def stop(self) -> None:
+        self.__running = False
+
+    def step(self) -> int:
+        """
+        Scans the directory once, parses the settled files and flushes if it is time to
+        :return: Number of files applied in this step which were not rolled back
+        """
+        now = time.monotonic()
+        applied = 0
+
+        for source, signature in self.__scan():
+            if self.__handled.get(source) == signature or self.__unflushed.get(source, (None,))[0] == signature:
+                continue
+
+            pendingSignature, since = self.__pending.get(source, (None, now))
+            if pendingSignature != signature:
+                # New file or still being written - the settle time starts again
+                self.__pending[source] = (signature, now)
+                if self.settleSeconds > 0:
+                    continue
+            elif now - since < self.settleSeconds:
+                continue
+
+            del self.__pending[source]
+
+            status = self.__ingest(source)
+            if status == "failed":
+                # The failed file waits until it changes again
+                self.__handled[source] = signature
+                if self.parser.usesStorage:
+                    # The file may have failed before anything was applied, so the storage is rolled back
+                    # explicitly and the files applied since the last flush are parsed again
+                    self.parser.rollback()
+                    self.__requeueUnflushed()
+                    applied = 0
+            elif status != "missing":
+                self.__unflushed[source] = (signature, status == "applied")
+                if status == "applied":
+                    applied += 1
+
+        waiting = any(wasApplied for _, wasApplied in self.__unflushed.values())
+        if waiting and now - self.__lastFlush >= self.flushSeconds:
+            self.flush()
+
+        return applied
+
+    def flush(self) -> None:
+        """
+        Durably writes the applied files. A failed flush keeps them waiting, so it is tried again in the next step
+        :return: None
+        """
+        try:
+            self.parser.flush(durable=True)
+        except Exception as error:
+            print(f"Error: Couldn't flush the applied files: {error}")
+            return
+
+        self.__handled.update((source, signature) for source, (signature, _) in self.__unflushed.items())
+        self.__unflushed = {}
+        self.__lastFlush = time.monotonic()
+
+    def __requeueUnflushed(self) -> None:
+        """
+        Forgets the files applied since the last flush after the storage was rolled back,
+        so the next scans hand them to the parser again
+        :return: None
+        """
+        self.appliedFiles -= sum(wasApplied for _, wasApplied in self.__unflushed.values())
+        self.__unflushed = {}
+
+    def __scan(self) -> list[tuple[str, tuple[int, int]]]:
+        """
+        :return: Paths of the dumps in the directory with their (size, mtime)
+        """
+        files = []
+
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            print("Error: Directory not found.")
+            return files
+
+        for entry in entries:
+            if sourceKind(entry.name) is None:
+                continue
+
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            files.append((f"{self.directory}/{entry.name}", (stat.st_size, stat.st_mtime_ns)))
+
+        # Removed files don't have to be remembered anymore
+        present = {source for source, _ in files}
+        for source in list(self.__pending):
+            if source not in present:
+                del self.__pending[source]
+
+        return sorted(files)
+
+    def __ingest(self, source: str) -> str:
+        """
+        Parses the file with the parser of its kind. A file which can't be parsed is reported
+        :param source: Path to the dump
+        :return: "applied", "unchanged" if the parser skipped the file, "missing" if the file disappeared
+        or "failed"
+        """
+        try:
+            if sourceKind(source) == "follows":
+                applied = self.parser.parseFileFollowsData(source)
+            else:
+                applied = self.parser.parseFileCommentsData(source)
+        except FileNotFoundError:
+            # Renamed or removed while settling, e.g. a file with a search tag renamed by the parser
+            return "missing"
+        except Exception as error:
+            self.failedFiles += 1
+            print(f"Error: Couldn't parse {source}: {error}")
+            return "failed"
+
+        if not applied:
+            return "unchanged"
+
+        # The parser only counts the malformed lines, the daemon reports them as they come
+        for parsedSource, malformed in self.parser.malformedLines.items():
+            self.malformedLines += malformed
+            print(f"Warning: {malformed} malformed comment lines in {parsedSource}")
+        self.parser.malformedLines.clear()
+
+        self.appliedFiles += 1
+        return "applied"
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description="Ingests the dumps downloaded into a directory as they arrive")
+    arguments.add_argument("directory", help="Directory the browser scripts download into")
+    arguments.add_argument("dataFile", help=".json file with the user data")
+    arguments.add_argument("hashtagFile", help=".json file with the hashtag statistics")
+    arguments.add_argument("--database", help="SQLite database used instead of the .json files")
+    arguments.add_argument("--settle", type=float, default=1.0, help="Seconds a file has to stay unchanged")
+    arguments.add_argument("--flush", type=float, default=5.0, help="Seconds between the flushes")
+    options = arguments.parse_args()
+
+    storage = SqliteStorage(options.database) if options.database is not None else None
+    parser = DataParser(options.dataFile, options.hashtagFile, storage=storage)
+
+    daemon = IngestDaemon(parser, options.directory, settleSeconds=options.settle, flushSeconds=options.flush)
+    print(f"Watching {options.directory}, press Ctrl+C to stop")
+    daemon.run()
+    print(f"Ingested {daemon.appliedFiles} files, {daemon.failedFiles} failed, "
+          f"{daemon.malformedLines} malformed comment lines skipped")
+
+    if storage is not None:
+        storage.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import json
+import os
+
+class IngestLog:
+    """
+    Append-only log of the parsed sources. Every parsed source is stored as one line containing the source path,
+    the delta record created from it and its manifest entry. A line is only valid when it is complete, so a crash while writing
+    leaves at most one torn line at the end, which is cut off on the next start.
+    """
+
+    def __init__(self, logFile: str):
+        self.logFile: str = logFile
+        self.compactingFile: str = logFile + ".compacting"
+        self.commitFile: str = logFile + ".commit"
+
+        self.__sources: dict[str, dict] | None = None
+
+    def append(self, source: str, record: dict, entry: dict) -> None:
+        """
+        Appends the record of a parsed source to the log. The line is flushed and synced to the disk, so once
+        this function returns the source counts as parsed
+        :param source: Path to the source file
+        :param record: Delta record created from the source
+        :param entry: Manifest entry of the source
+        :return: None
+        """
+        sources = self.sources()
+
+        line = json.dumps(
+            {"source": source, "record": record, "entry": entry}, ensure_ascii=False, separators=(",", ":")
+        )
+
+        with open(self.logFile, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+        sources[source] = entry
+
+    def sources(self) -> dict[str, dict]:
+        """
+        Returns the sources which are noted in the log, including the ones waiting to be compacted
+        :return: Dict of the source paths and their latest manifest entries
+        """
+        if self.__sources is None:
+            self.recover()
+
+            self.__sources = {}
+            for logFile in (self.compactingFile, self.logFile):
+                for source, _, entry in self.entries(logFile):
+                    self.__sources[source] = entry
+
+        return self.__sources
+
+    def sourceEntry(self, source: str) -> dict | None:
+        """
+        :param source: Path to the source file
+        :return: The latest manifest entry of the source in the log, None if it is not in the log
+        """
+        return self.sources().get(source)
+
+    def entries(self, logFile: str | None = None):
+        """
+        Generator going through the complete entries of the log
+        :param logFile: Which log file to read, the current log by default
+        :return: Yields tuples (source, record, manifest entry)
+        """
+        if logFile is None:
+            logFile = self.logFile
+
+        try:
+            file = open(logFile, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+
+        with file:
+            for line in file:
+                if not line.endswith("\n"):
+                    break
+                entry = json.loads(line)
+                yield entry["source"], entry["record"], entry["entry"]
+
+    def recover(self) -> None:
+        """
+        Cuts off the torn line at the end of the log, left there by a crash while appending
+        :return: None
+        """
+        try:
+            file = open(self.logFile, "rb+")
+        except FileNotFoundError:
+            return
+
+        with file:
+            validSize = 0
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    break
+                validSize += len(line)
+
+            file.truncate(validSize)
+
+    def startCompaction(self) -> str:
+        """
+        Moves the current log aside, so new sources can be appended while it is being compacted.
+        If a previous compaction did not finish, its log is kept and nothing is moved
+        :return: Path to the log which should be compacted
+        """
+        self.sources()
+
+        if not os.path.exists(self.compactingFile) and os.path.exists(self.logFile):
+            os.replace(self.logFile, self.compactingFile)
+
+        return self.compactingFile
+
+    def commitCompaction(self, replacements: list[tuple[str, str]]) -> None:
+        """
+        Atomically replaces the snapshots with their compacted versions. The list of replacements is noted
+        in the commit file first, so a crash at any point can be finished with finishCompaction()
+        :param replacements: List of (temporary file, snapshot file) which are already completely written
+        :return: None
+        """
+        with open(self.commitFile, "w", encoding="utf-8") as file:
+            json.dump(replacements, file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        self.__replaceSnapshots(replacements)
+
+    def pendingCommit(self) -> bool:
+        """
+        :return: True if a compaction got committed but its log was not yet removed
+        """
+        return os.path.exists(self.commitFile)
+
+    def replaceCommitted(self) -> None:
+        """
+        Replaces the snapshots of a committed compaction which were not replaced yet because of a crash
+        :return: None
+        """
+        if self.pendingCommit():
+            with open(self.commitFile, "r", encoding="utf-8") as file:
+                self.__replaceSnapshots(json.load(file))
+
+    def finishCompaction(self) -> None:
+        """
+        Removes the compacted log and the commit file. Should only be called once the snapshots are replaced
+        and the compacted sources are noted elsewhere
+        :return: None
+        """
+        if os.path.exists(self.compactingFile):
+            os.remove(self.compactingFile)
+        if self.pendingCommit():
+            os.remove(self.commitFile)
+
+        # Sources appended during the compaction stay, so the entries are read again from the current log
+        self.__sources = None
+
+    def abortCompaction(self, temporaryFiles: list[str]) -> None:
+        """
+        Removes the partially written snapshots of a compaction which never got committed
+        :param temporaryFiles: Paths to the temporary snapshot files
+        :return: None
+        """
+        for temporaryFile in temporaryFiles:
+            if os.path.exists(temporaryFile):
+                os.remove(temporaryFile)
+
+    @staticmethod
+    def __replaceSnapshots(replacements: list[tuple[str, str]]) -> None:
+        for temporaryFile, snapshotFile in replacements:
+            # A missing temporary file was already moved in place before the crash
+            if os.path.exists(temporaryFile):
+                os.replace(temporaryFile, snapshotFile)
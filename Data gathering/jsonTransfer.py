@@ -1,134 +1,301 @@
 import json
+import multiprocessing
 import os
-import re
+
+from commentIndex import CommentIndex, commentKey, normalizeComment, postedCommentKeys, staleCommentKeys
+from dumpParsing import createCommentsRecord, createFollowsRecord, createRecord, followsFileInfo
+from hashtagStatistics import HashtagStatistics
+from ingestLog import IngestLog
+from sourceManifest import CHANGED, NEW, SourceManifest, describeSource, sourceState
+from sqliteStorage import SqliteStorage
 
 class DataParser:
-    def __init__(self, dataFile: str, hashtagFile: str):
+    def __init__(self, dataFile: str, hashtagFile: str, logFile: str | None = None, compactEvery: int = 0,
+                 storage: SqliteStorage | None = None):
+        """
+        :param dataFile: .json file with the user data
+        :param hashtagFile: .json file with the hashtag statistics, the statistics with the co-occurrence counts
+        are kept next to it in hashtagStatisticsFile
+        :param logFile: Optional append-only ingest log. When used, parsed sources are only appended to the log
+        and the .json files are updated by compactLog()
+        :param compactEvery: number of logged sources after which the log is compacted automatically, 0 means never
+        :param storage: Optional SQLite storage. When used, the records are upserted into the database instead of
+        the .json files, which can be created with exportJson()
+        """
         self.dataFile: str = dataFile
         self.hashtagFile: str = hashtagFile
+        self.hashtagStatisticsFile: str = hashtagFile + ".cooccurrence.npz"
 
+        # parsedSourceFile is the old list of parsed sources, it is only read and its sources are kept as parsed
         self.parsedSourceFile: str = "parsedSources.txt"
-        self.parsedSources = []
+        self.manifestFile: str = "parsedSources.manifest"
+        self.__manifest: SourceManifest | None = None
+
+        # Number of malformed comment lines of every parsed source which had some, the callers report them
+        self.malformedLines: dict[str, int] = {}
+
+        # Batch mode keeps both stores in memory and writes them out only on flush
+        self.__batchMode: bool = False
+        self.__flushEvery: int = 0
+        self.__filesSinceFlush: int = 0
+        self.__data: dict | None = None
+        self.__commentIndex: CommentIndex = CommentIndex(dataFile + ".commentIndex.json", dataFile)
+        self.__hashtagData: HashtagStatistics | None = None
+        self.__pendingEntries: dict[str, dict] = {}
+
+        if compactEvery < 0:
+            raise ValueError("compactEvery must not be negative")
+        if logFile is not None and storage is not None:
+            raise ValueError("Ingest log can't be used together with a storage")
+
+        self.__storage: SqliteStorage | None = storage
+
+        self.__log: IngestLog | None = None
+        self.__logRecovered: bool = False
+        self.__compactEvery: int = compactEvery
+        self.__sourcesSinceCompaction: int = 0
+
+        # A compaction committed before a crash is finished on the first use of the log, see __getLog()
+        if logFile is not None:
+            self.__log = IngestLog(logFile)
+
+    def compactLog(self) -> None:
+        """
+        Folds all the records from the ingest log into dataFile and hashtagFile and notes their sources
+        in the manifest. The new snapshots are written next to the old ones and swapped in atomically,
+        so a crash at any point either keeps the old snapshots with the log, or is finished on the next start.
+        :return: None
+        """
+        if self.__log is None:
+            raise RuntimeError("DataParser has no ingest log")
+
+        if self.__log.pendingCommit():
+            self.__finishCompaction()
+
+        # The log of a compaction interrupted before its commit is compacted first, the current log after it
+        interrupted = os.path.exists(self.__log.compactingFile)
+        compactingFile = self.__log.startCompaction()
+        if not os.path.exists(compactingFile):
+            return
+
+        dataTmp = self.dataFile + ".tmp"
+        hashtagTmp = self.hashtagFile + ".tmp"
+        statisticsTmp = self.hashtagStatisticsFile + ".tmp"
+        self.__log.abortCompaction([dataTmp, hashtagTmp, statisticsTmp])
+
+        data = self.__toWorkingModel(self.__readJson(self.dataFile))
+        hashtagData = self.__readHashtagStatistics()
+        self.__commentIndex.load()
+
+        for _, record, _ in self.__log.entries(compactingFile):
+            self.__applyRecord(data, hashtagData, record)
+
+        self.__writeJson(dataTmp, data, sync=True)
+        self.__writeJson(hashtagTmp, hashtagData.toJson(), sync=True)
+        hashtagData.save(statisticsTmp, sync=True)
+
+        self.__log.commitCompaction([
+            (dataTmp, self.dataFile), (hashtagTmp, self.hashtagFile), (statisticsTmp, self.hashtagStatisticsFile)
+        ])
+        self.__finishCompaction()
+        self.__commentIndex.save()
+
+        self.__sourcesSinceCompaction = 0
+
+        if interrupted:
+            self.compactLog()
+
+    def __finishCompaction(self) -> None:
+        """
+        Notes the sources of a committed compaction in the manifest and removes the compacted log.
+        Noting the same entries again after a crash is harmless
+        :return: None
+        """
+        self.__log.replaceCommitted()
+
+        entries = {source: entry for source, _, entry in self.__log.entries(self.__log.compactingFile)}
+        self.__getManifest().note(list(entries.values()))
+
+        self.__log.finishCompaction()
+
+    @property
+    def usesStorage(self) -> bool:
+        """
+        :return: Whether the records go into the SQLite storage, whose uncommitted changes can be dropped
+        by rollback()
+        """
+        return self.__storage is not None
+
+    def rollback(self) -> None:
+        """
+        Drops the changes of the SQLite storage since the last commit (or flush in batch mode) together with their
+        parsed sources, e.g. when a file fails to parse in the middle of a batch
+        :return: None
+        """
+        if self.__storage is None:
+            raise RuntimeError("DataParser has no storage")
+
+        self.__storage.rollback()
+
+    def exportJson(self) -> None:
+        """
+        Writes the contents of the SQLite storage into dataFile, hashtagFile and hashtagStatisticsFile,
+        so the scripts reading the files can be used
+        :return: None
+        """
+        if self.__storage is None:
+            raise RuntimeError("DataParser has no storage")
+
+        self.__storage.exportJson(self.dataFile, self.hashtagFile, self.hashtagStatisticsFile)
+
+    def startBatch(self, flushEvery: int = 0) -> None:
+        """
+        Starts the batch mode. Both the data and the hashtag file are loaded only once and all the following
+        parse calls work on the in-memory copies. The files are written on flush() / endBatch()
+        or automatically after every flushEvery parsed files.
+        :param flushEvery: number of parsed files after which the stores are written, 0 means only at the end
+        :return: None
+        """
+        if flushEvery < 0:
+            raise ValueError("flushEvery must not be negative")
+
+        self.__batchMode = True
+        self.__flushEvery = flushEvery
+        self.__filesSinceFlush = 0
+
+    def flush(self, durable: bool = False) -> None:
+        """
+        Writes the in-memory stores into dataFile and hashtagFile and only then notes the parsed sources,
+        so the manifest never gets ahead of the data
+        :param durable: Whether to write the files next to the old ones, sync them and swap them in atomically,
+        so a crash during the flush keeps the previous versions
+        :return: None
+        """
+        if self.__storage is not None:
+            self.__storage.commit()
+        if self.__data is not None:
+            self.__writeJson(self.dataFile, self.__data, sync=durable, atomic=durable)
+            self.__commentIndex.save()
+        if self.__hashtagData is not None:
+            self.__writeHashtagStatistics(self.__hashtagData, durable=durable)
+
+        self.__getManifest().note(list(self.__pendingEntries.values()))
+        self.__pendingEntries = {}
+
+        self.__filesSinceFlush = 0
+
+    def endBatch(self) -> None:
+        """
+        Flushes the stores and leaves the batch mode
+        :return: None
+        """
+        if not self.__batchMode:
+            return
+
+        self.flush()
+
+        self.__batchMode = False
+        self.__data = None
+        self.__hashtagData = None
+
+    def __abortBatch(self) -> None:
+        """
+        Leaves the batch mode without writing anything. Changes since the last flush are dropped together with
+        their parsed sources, so the stores stay consistent with the manifest
+        :return: None
+        """
+        if self.__storage is not None:
+            self.__storage.rollback()
+
+        self.__pendingEntries = {}
+        self.__batchMode = False
+        self.__data = None
+        self.__hashtagData = None
 
-    def parseFileCommentsData(self, source: str) -> None:
+    def parseFileCommentsData(self, source: str) -> bool:
         """
         Function reads the source file and creates connections between the creator and commenters,
         as well as storing the associated hashtags as well as comment text and the number of likes.
+        Unchanged files are skipped, a file which changed since it was parsed is applied only as the difference.
         :param source: source filename
-        :return: None
+        :return: True if the file was applied, False if it was skipped as unchanged
         """
 
         usedSource = self.__removeSearchFromFilename(source)
 
-        if self.__fileParsed(usedSource):
-            return
+        previous = self.__changedSourceEntry(usedSource)
+        if previous is None:
+            return False
 
-        count: int
-        hashtags: set[str]
-        comments: set[tuple[str, str, int]]
-        count, hashtags, comments = self.__getCommentsDataFromFile(usedSource)
+        description = describeSource(usedSource)
+        record = createCommentsRecord(usedSource)
 
-        postCreator = usedSource.split("/")[-1].split("-")[0]
+        self.__storeRecord(usedSource, record, description, previous)
+        return True
 
-        filteredComments = set()
-        usernames = set()
-        for entry in comments:
-            user, text, likes = entry
+    def parseDirectoryCommentsData(self, directory: str, flushEvery: int = 0, workers: int = 1) -> None:
+        """
+        Function gets all the filenames from a directory and calls the parseFileCommentsData function.
+        The files are parsed in batch mode, so the stores are loaded once and written once at the end
+        (or after every flushEvery files). With more workers the files are read and parsed in a pool of
+        processes, while the results are applied in this process in the order of the sorted filenames.
 
-            usernames.add(user)
-            filteredComments.add(entry)
+        Important: the func ignores filenames starting with "--"
 
-        try:
-            with open(self.dataFile, "r") as file:
-                data = json.load(file)
-        except (FileNotFoundError, json.decoder.JSONDecodeError):
-            data = {}
+        :param directory: path to the directory from which the source files will be taken
+        :param flushEvery: number of parsed files after which the stores are written, 0 means only at the end
+        :param workers: number of worker processes parsing the files, 0 means one per CPU core
+        :return: None
+        """
 
-        # Creator
-        if postCreator in data.keys():
-            data[postCreator]["commenters"] = list( set(data[postCreator]["commenters"]).union(usernames) )
-            data[postCreator]["hashtags"] = list( set(data[postCreator]["hashtags"]).union(hashtags) )
-            data[postCreator]["totalCommentsCount"] += count
-            data[postCreator]["shownCommentsCount"] += len(filteredComments)
-        else:
-            data[postCreator] = {
-                "totalFollowingCount" : 0,
-                "shownFollowingCount" : 0,
-                "following" : [],
-                "totalFollowersCount": 0,
-                "shownFollowersCount" : 0,
-                "followers" : [],
-                "totalCommentsCount" : count,
-                "shownCommentsCount" : len(filteredComments),
-                "commentedOn" : [],
-                "commenters": list(usernames),
-                "hashtags": list(hashtags),
-                "commentsPosted": []
-            }
+        self.__parseDirectory(directory, "comments", flushEvery, workers)
 
-        # All users except Creator
-        for entry in filteredComments:
-            user, text, likes = entry
+    def parseFileFollowsData(self, source: str) -> bool:
+        """
+        Function parses through the file containing either Followers or Following with the site provided total amount
+        :param source: File with name format "@name (type)" where type is Followers or Following
+        :return: True if the file was applied, False if it was skipped as unchanged
+        """
 
-            adjustedUsers = usernames.copy()
-            adjustedUsers.remove(user)
-            adjustedUsers.add(postCreator)
-            if user in data.keys():
-                data[user]["commentedOn"] = list( set(data[user]["commentedOn"]).union(postCreator) )
-                data[user]["hashtags"] = list( set(data[user]["hashtags"]).union(hashtags) )
-
-                newComment = {
-                    "text": text.strip().lower(),
-                    "likes": likes,
-                    "hashtags": sorted(list(hashtags))
-                }
-
-                if newComment not in [
-                    {
-                        "text": comment["text"].strip().lower(),
-                        "likes": comment["likes"],
-                        "hashtags": sorted(comment["hashtags"])
-                    }
-                    for comment in data[user]["commentsPosted"]
-                ]:
-                    data[user]["commentsPosted"].append(newComment)
+        followsFileInfo(source)
 
-            else:
-                data[user] = {
-                    "totalFollowingCount": 0,
-                    "shownFollowingCount": 0,
-                    "following": [],
-                    "totalFollowersCount": 0,
-                    "shownFollowersCount": 0,
-                    "followers": [],
-                    "totalCommentsCount": 0,
-                    "shownCommentsCount": 0,
-                    "commentedOn": [postCreator,],
-                    "commenters": [],
-                    "hashtags": list(hashtags),
-                    "commentsPosted": [
-                        {
-                            "text": text,
-                            "likes": likes,
-                            "hashtags": list(hashtags),
-                        }
-                    ],
-                }
-
-        with open(self.dataFile, "w") as file:
-            json.dump(data, file, indent=3)
-
-        self.__storeHashtagStatistics(hashtags)
-
-        self.__noteParsedFile(usedSource)
-
-    def parseDirectoryCommentsData(self, directory: str) -> None:
+        previous = self.__changedSourceEntry(source)
+        if previous is None:
+            return False
+
+        description = describeSource(source)
+
+        # Applied straight onto the in-memory user data, the usernames are streamed from the file in chunks
+        streamed = self.__storage is None and self.__log is None
+        record = createFollowsRecord(source, streamed=streamed)
+
+        self.__storeRecord(source, record, description, previous)
+        return True
+
+    def parseDirectoryFollowsData(self, directory: str, flushEvery: int = 0, workers: int = 1) -> None:
         """
-        Function gets all the filenames from a directory and calls the parseFileCommentsData function.
+        Function gets all the filenames from a directory and calls the parseFileFollowsData function.
+        The files are parsed in batch mode, so the stores are loaded once and written once at the end
+        (or after every flushEvery files). With more workers the files are read and parsed in a pool of
+        processes, while the results are applied in this process in the order of the sorted filenames.
 
         Important: the func ignores filenames starting with "--"
 
         :param directory: path to the directory from which the source files will be taken
+        :param flushEvery: number of parsed files after which the stores are written, 0 means only at the end
+        :param workers: number of worker processes parsing the files, 0 means one per CPU core
+        :return: None
+        """
+
+        self.__parseDirectory(directory, "follows", flushEvery, workers)
+
+    def __parseDirectory(self, directory: str, kind: str, flushEvery: int, workers: int) -> None:
+        """
+        Parses all the source files of the given type from the directory in batch mode
+        :param directory: path to the directory from which the source files will be taken
+        :param kind: "comments" or "follows"
+        :param flushEvery: number of parsed files after which the stores are written, 0 means only at the end
+        :param workers: number of worker processes parsing the files, 0 means one per CPU core
         :return: None
         """
 
@@ -141,301 +308,482 @@ class DataParser:
             print("Error: Permission denied.")
             return
 
-        for file in files:
-            if file.startswith("--") or not file.startswith("@") or not file.endswith(".txt"):
-                continue
+        # Sorted, so both the serial and the pool parsing apply the files in the same order on any filesystem
+        files = [
+            f"{directory}/{file}" for file in sorted(files)
+            if not file.startswith("--") and file.startswith("@") and file.endswith(".txt")
+        ]
+
+        if workers == 0:
+            workers = os.cpu_count() or 1
+
+        alreadyBatched = self.__batchMode
+        if not alreadyBatched:
+            self.startBatch(flushEvery)
 
-            self.parseFileCommentsData(f"{directory}/{file}")
+        try:
+            if workers == 1:
+                for file in files:
+                    if kind == "comments":
+                        self.parseFileCommentsData(file)
+                    else:
+                        self.parseFileFollowsData(file)
+            else:
+                self.__parseFilesInPool(files, kind, workers)
+        except BaseException:
+            if not alreadyBatched:
+                self.__abortBatch()
+            raise
 
-    def __getCommentsDataFromFile(self, filename: str) -> (int ,set[str], set[tuple[str, str, int]]):
+        if not alreadyBatched:
+            self.endBatch()
+
+    def __parseFilesInPool(self, files: list[str], kind: str, workers: int) -> None:
         """
-        Function reads the provided file and discerns the hashtags and usernames/comments/likes from it
+        Parses the files in a pool of worker processes. The workers only read the files and create the records,
+        which are then stored one by one in this process in the order of the files
+        :param files: Paths to the source files, sorted
+        :param kind: "comments" or "follows"
+        :param workers: number of worker processes
+        :return: None
+        """
+        previousEntries: dict[str, dict] = {}
+        for file in files:
+            if kind == "comments":
+                source = self.__removeSearchFromFilename(file)
+            else:
+                followsFileInfo(file)
+                source = file
 
-        Source file should be .txt with format hashtags each in a new line. There should be
-        an empty line separating the two sections. The other section should be "@user$Comment$likes".
+            previous = self.__changedSourceEntry(source)
+            if previous is not None:
+                previousEntries[source] = previous
 
-        :param filename: name of the source file
-        :return: Int=total comments count, sets containing hashtags and tuples containing the rest of the data respectively
+        tasks = [(kind, source) for source in previousEntries]
+        if len(tasks) == 0:
+            return
+
+        chunkSize = max(1, min(64, len(tasks) // (workers * 4)))
+
+        with multiprocessing.Pool(workers) as pool:
+            for source, record, description in pool.imap(createRecord, tasks, chunksize=chunkSize):
+                self.__storeRecord(source, record, description, previousEntries[source])
+
+    def __storeRecord(self, source: str, record: dict, description: dict, previous: dict) -> None:
+        """
+        Stores the record created from the source - either appends it to the ingest log, or applies it onto
+        the stores straight away - and notes the source in the manifest. If the source was parsed before,
+        the record gets what the previous version contributed, so only the difference is applied
+        :param source: Path to the source file
+        :param record: Record created by one of the parse functions
+        :param description: Manifest description of the source file, created before the file was parsed
+        :param previous: Manifest entry of the previous version of the source, empty if it is new
+        :return: None
         """
-        with open(filename, "r", encoding="UTF-8") as f:
+        malformed = record.pop("malformed", 0)
+        if malformed > 0:
+            self.malformedLines[source] = malformed
 
-            count = int(f.readline().strip())
+        if "contribution" in previous:
+            record["previous"] = previous["contribution"]
 
-            text = f.read()
+        entry = dict(description, contribution=self.__contribution(record))
 
-        if text[:2] == "\n\n":
-            hashtags = set()
-            text = text[2:]
-            commentsLines = text.split("\n")
+        if self.__storage is not None:
+            self.__storage.applyRecord(source, record, entry, commit=not self.__batchMode)
+        elif self.__log is not None:
+            self.__getLog().append(source, record, entry)
+
+            self.__sourcesSinceCompaction += 1
+            if 0 < self.__compactEvery <= self.__sourcesSinceCompaction:
+                self.compactLog()
         else:
-            data = text.strip().split("\n\n")
-            hashtags = set(data[0].split("\n"))
-            commentsLines = data[1].split("\n")
+            data = self.__loadData()
+            hashtagData = self.__loadHashtagData() if record["type"] == "comments" else None
 
-        commentsLines = self.__cleanUpCommentsData(commentsLines)
+            self.__applyRecord(data, hashtagData, record)
 
-        comments = set()
+            self.__storeData(data)
+            if hashtagData is not None:
+                self.__storeHashtagData(hashtagData)
 
-        for line in commentsLines:
-            sep = line.split("$")
+            self.__noteSource(entry)
 
-            sep[2] = self.__convertSimpleIntToInt(sep[2])
+        self.__fileDone()
 
-            try:
-                hashtags.update(set(re.findall(r'#\w+', sep[1])))
-            except:
-                pass
+    @staticmethod
+    def __contribution(record: dict) -> dict:
+        """
+        What the record adds to the data on top of the idempotent unions - needed to apply a changed version
+        of the same source as a difference
+        :param record: Record created by one of the parse functions
+        :return: Contribution noted in the manifest
+        """
+        if record["type"] == "comments":
+            return {
+                "count": record["count"],
+                "shown": len({tuple(comment) for comment in record["comments"]}),
+                "hashtags": record["hashtags"],
+                "comments": postedCommentKeys(record),
+            }
 
-            try:
-                comments.add((sep[0], sep[1], sep[2]))
-            except:
-                comments.add((sep[0], sep[1], 0))
+        # Follows records only assign the counts and add to sets, so applying them again is enough
+        return {}
 
-        return count, hashtags, comments
+    def __applyRecord(self, data: dict, hashtagData: HashtagStatistics | None, record: dict) -> None:
+        """
+        Applies a record onto the user data and the hashtag statistics
+        :param data: User data
+        :param hashtagData: Hashtag statistics, only needed for comments records
+        :param record: Record created by one of the parse functions
+        :return: None
+        """
+        if record["type"] == "comments":
+            self.__applyCommentsRecord(data, record)
+            hashtagData.addPost(
+                set(record["hashtags"]), set(record.get("previous", {}).get("hashtags", []))
+            )
+        elif record["type"] == "follows":
+            self.__applyFollowsRecord(data, record)
+        else:
+            raise ValueError(f"Unknown record type {record['type']}")
 
-    def __cleanUpCommentsData(self, lines: list[str]) -> list[str]:
+    def __applyFollowsRecord(self, data: dict, record: dict) -> None:
         """
-        Gets the comments data in form "@user$Comment$likes". It clears empty lines and
-        connects up seperated comment lines
-        :param lines: Data in form list["@user$Comment$likes"]
-        :return: Cleaned data
+        Applies a follows record onto the user data - connects the account with its followers or followed users
+        :param data: User data
+        :param record: Record created by parseFileFollowsData
+        :return: None
         """
 
-        retData = []
+        accountUser: str = record["account"]
+        fileType: str = record["kind"]
+        count: int = record["count"]
 
-        for i, line in enumerate(lines):
-            if line.strip() == "":
-                continue
+        if fileType not in ["Followers", "Following"]:
+            raise NameError("File must be either (Followers) or (Following)")
+
+        if accountUser not in data:
+            data[accountUser] = self.__newUser()
+        account = data[accountUser]
+
+        # Streamed records bring their unique usernames in chunks, the others as one list
+        chunks = record["chunks"] if "chunks" in record else [record["users"]]
+        shownCount = 0
+
+        for chunk in chunks:
+            usernames: set[str] = set(chunk)
+            usernames.discard("")
+            shownCount += len(usernames)
+
+            if fileType == "Followers":
+                account["followers"] |= usernames
+
+                for followerUser in usernames:
+                    if followerUser not in data:
+                        data[followerUser] = self.__newUser()
+                    # Not total, accountUser should be counted in that already
+                    # Not shown, that tells only what TikTok showed us
+                    data[followerUser]["following"].add(accountUser)
 
-            if not line.startswith("@") and len(retData) > 0:
-                retData[-1] = retData[-1] + " " + line
             else:
-                retData.append(line)
+                account["following"] |= usernames
 
-        return retData
+                for followingUser in usernames:
+                    if followingUser not in data:
+                        data[followingUser] = self.__newUser()
+                    # Not total, accountUser should be counted in that already
+                    # Not shown, that tells only what TikTok showed us
+                    data[followingUser]["followers"].add(accountUser)
 
-    def parseFileFollowsData(self, source: str) -> None:
+        if fileType == "Followers":
+            account["totalFollowersCount"] = count
+            account["shownFollowersCount"] = shownCount
+        else:
+            account["totalFollowingCount"] = count
+            account["shownFollowingCount"] = shownCount
+
+    def __applyCommentsRecord(self, data: dict, record: dict) -> None:
         """
-        Function parses through the file containing either Followers or Following with the site provided total amount
-        :param source: File with name format "@name (type)" where type is Followers or Following
+        Applies a comments record onto the user data - connects the creator with the commenters and stores
+        the hashtags, comment texts and likes
+        :param data: User data
+        :param record: Record created by parseFileCommentsData
         :return: None
         """
 
-        noPath: str = source.split("/")[-1]
-        accountUser: str = noPath.split(" ")[0]
-        fileType: str = noPath.split(" ")[1].replace(").txt", "").replace("(","")
+        postCreator: str = record["creator"]
+        count: int = record["count"]
+        hashtags: set[str] = set(record["hashtags"])
 
-        if fileType not in ["Followers","Following"]:
-            raise NameError("File must be either (Followers) or (Following)")
+        # Kept in the order of the record, so applying a record is deterministic
+        filteredComments = dict()
+        usernames = set()
+        for entry in record["comments"]:
+            user, text, likes = entry
 
-        if self.__fileParsed(source):
-            return
+            usernames.add(user)
+            filteredComments[(user, text, likes)] = None
+
+        # Creator
+        if postCreator not in data:
+            data[postCreator] = self.__newUser()
+        creator = data[postCreator]
+
+        creator["commenters"] |= usernames
+        creator["hashtags"] |= hashtags
+        # A changed source replaces the counts of its previous version
+        previous = record.get("previous", {})
+        creator["totalCommentsCount"] += count - previous.get("count", 0)
+        creator["shownCommentsCount"] += len(filteredComments) - previous.get("shown", 0)
+
+        # Comments of the previous version which changed (likes, hashtags of the post) or are gone are removed,
+        # otherwise they would stay next to their new versions
+        for user, key in staleCommentKeys(record):
+            if user not in data:
+                continue
+            commentsPosted = data[user]["commentsPosted"]
 
-        count: int
-        usernames: set[str]
-        count, usernames = self.__getFollowsDataFromFile(source)
+            commentsPosted[:] = [comment for comment in commentsPosted if commentKey(comment) != key]
+            self.__commentIndex.remove(user, key, commentsPosted)
 
-        if "" in usernames:
-            usernames.remove("")
+        # All users except Creator
+        for entry in filteredComments:
+            user, text, likes = entry
 
-        try:
-            with open(self.dataFile, "r") as file:
-                data = json.load(file)
-        except (FileNotFoundError, json.decoder.JSONDecodeError):
-            data = {}
+            if user not in data:
+                data[user] = self.__newUser()
+            commenter = data[user]
 
-        if fileType == "Followers":
-            if accountUser in data.keys():
-                data[accountUser]["followers"] = list( set(data[accountUser]["followers"]).union(usernames) )
-                data[accountUser]["totalFollowersCount"] = count
-                data[accountUser]["shownFollowersCount"] = len(usernames)
-            else:
-                data[accountUser] = {
-                    "totalFollowingCount": 0,
-                    "shownFollowingCount": 0,
-                    "following": [],
-                    "totalFollowersCount": count,
-                    "shownFollowersCount": len(usernames),
-                    "followers": list(usernames),
-                    "totalCommentsCount": 0,
-                    "shownCommentsCount": 0,
-                    "commentedOn": [],
-                    "commenters": [],
-                    "hashtags": [],
-                    "commentsPosted": []
-                }
-
-            for followerUser in usernames:
-                if followerUser == "":
-                    continue
-                if followerUser in data.keys():
-                    if accountUser not in data[followerUser]["following"]:
-                        data[followerUser]["following"].append(accountUser)
-                        # Not total, accountUser should be counted in that already
-                        # Not shown, that tells only what TikTok showed us
-                else:
-                    data[followerUser] = {
-                        "totalFollowingCount": 0,
-                        "shownFollowingCount": 0,
-                        "following": [accountUser],
-                        "totalFollowersCount": 0,
-                        "shownFollowersCount": 0,
-                        "followers": [],
-                        "totalCommentsCount": 0,
-                        "shownCommentsCount": 0,
-                        "commentedOn": [],
-                        "commenters": [],
-                        "hashtags": [],
-                        "commentsPosted": []
-                    }
-
-        elif fileType == "Following":
-            if accountUser in data.keys():
-                data[accountUser]["following"] = list(set(data[accountUser]["following"]).union(usernames))
-                data[accountUser]["totalFollowingCount"] = count
-                data[accountUser]["shownFollowingCount"] = len(usernames)
-            else:
-                data[accountUser] = {
-                    "totalFollowingCount": count,
-                    "shownFollowingCount": len(usernames),
-                    "following": list(usernames),
-                    "totalFollowersCount": 0,
-                    "shownFollowersCount": 0,
-                    "followers": [],
-                    "totalCommentsCount": 0,
-                    "shownCommentsCount": 0,
-                    "commentedOn": [],
-                    "commenters": [],
-                    "hashtags": [],
-                    "commentsPosted": []
-                }
-
-            for followingUser in usernames:
-                if followingUser == "":
-                    continue
-                if followingUser in data.keys():
-                    if accountUser not in data[followingUser]["followers"]:
-                        data[followingUser]["followers"].append(accountUser)
-                        # Not total, accountUser should be counted in that already
-                        # Not shown, that tells only what TikTok showed us
-                else:
-                    data[followingUser] = {
-                        "totalFollowingCount": 0,
-                        "shownFollowingCount": 0,
-                        "following": [],
-                        "totalFollowersCount": 0,
-                        "shownFollowersCount": 0,
-                        "followers": [accountUser],
-                        "totalCommentsCount": 0,
-                        "shownCommentsCount": 0,
-                        "commentedOn": [],
-                        "commenters": [],
-                        "hashtags": [],
-                        "commentsPosted": []
-                    }
-
-
-        with open(self.dataFile, "w") as file:
-            json.dump(data, file, indent=3)
-
-        self.__noteParsedFile(source)
-
-    def parseDirectoryFollowsData(self, directory: str) -> None:
+            commenter["commentedOn"].add(postCreator)
+            commenter["hashtags"] |= hashtags
+
+            newComment = normalizeComment(text, likes, hashtags)
+            if self.__commentIndex.add(user, newComment, commenter["commentsPosted"]):
+                commenter["commentsPosted"].append(newComment)
+
+    @staticmethod
+    def __newUser() -> dict:
         """
-        Function gets all the filenames from a directory and calls the parseFileFollowsData function.
+        :return: Empty user record of the in-memory working model
+        """
+        return {
+            "totalFollowingCount": 0,
+            "shownFollowingCount": 0,
+            "following": set(),
+            "totalFollowersCount": 0,
+            "shownFollowersCount": 0,
+            "followers": set(),
+            "totalCommentsCount": 0,
+            "shownCommentsCount": 0,
+            "commentedOn": set(),
+            "commenters": set(),
+            "hashtags": set(),
+            "commentsPosted": []
+        }
 
-        Important: the func ignores filenames starting with "--"
+    @staticmethod
+    def __toWorkingModel(data: dict) -> dict:
+        """
+        Turns the relation lists of the loaded user data into sets, so the membership checks and unions
+        don't depend on the length of the lists. The sets are turned back into lists only when written
+        :param data: User data as loaded from dataFile
+        :return: The same dict with sets
+        """
+        for info in data.values():
+            for key in ("following", "followers", "commentedOn", "commenters", "hashtags"):
+                info[key] = set(info[key])
 
-        :param directory: path to the directory from which the source files will be taken
-        :return: None
+        return data
+
+    def __changedSourceEntry(self, source: str) -> dict | None:
+        """
+        Checks whether the source file has to be parsed. Files noted in the manifest with the same size and
+        modification time are skipped without opening them, otherwise their content hash decides
+        :param source: Path to the source file
+        :return: None if the file is unchanged, otherwise the manifest entry of its previous version
+        (empty dict for a new file)
         """
+        entry = self.__sourceEntry(source)
 
-        try:
-            files: list[str] = os.listdir(directory)
-        except FileNotFoundError:
-            print("Error: Directory not found.")
-            return
-        except PermissionError:
-            print("Error: Permission denied.")
-            return
+        state, description = sourceState(source, entry)
+        if state == NEW:
+            return {}
+        if state == CHANGED:
+            return entry
 
-        for file in files:
-            if file.startswith("--") or not file.startswith("@") or not file.endswith(".txt"):
-                continue
+        if description is not None:
+            # Touched but with the same content, the new time is noted so the file is not hashed again
+            self.__noteSource(dict(entry, **description))
 
-            self.parseFileFollowsData(f"{directory}/{file}")
+        return None
 
-    def __getFollowsDataFromFile(self, filename: str) -> (int, set[str]):
+    def __sourceEntry(self, source: str) -> dict | None:
         """
-        Function reads the provided file and discerns the number on the first line and creates a set from the rest from it
-        :param filename: File with either Following or Followers
-        :return: Total count from TikTok and a set of shown Users in the current category
+        :param source: Path to the source file
+        :return: The latest manifest entry of the source, None if it was never parsed
         """
-        with open(filename, "r", encoding="UTF-8") as file:
+        if self.__storage is not None:
+            return self.__storage.sourceEntry(source)
 
-            count: int = self.__convertSimpleIntToInt(file.readline().strip())
+        if self.__log is not None:
+            entry = self.__getLog().sourceEntry(source)
+            if entry is not None:
+                return entry
 
-            names = file.read().split("\n")
+        if source in self.__pendingEntries:
+            return self.__pendingEntries[source]
 
-            return count, set(names)
+        return self.__getManifest().entry(source)
 
-    def __storeHashtagStatistics(self, hashtags: set[str]) -> None:
+    def __noteSource(self, entry: dict) -> None:
         """
-        Function to store the number of hashtag appearances in self.hashtagFile
-        :param hashtags: set of strings in format # + text
+        Notes the parsed source in the manifest. In batch mode the entry waits for the flush of the data
+        :param entry: Manifest entry of the source
         :return: None
         """
+        if self.__storage is not None:
+            self.__storage.noteSource(entry, commit=not self.__batchMode)
+        elif self.__batchMode and self.__log is None:
+            self.__pendingEntries[entry["source"]] = entry
+        else:
+            self.__getManifest().note([entry])
 
-        try:
-            with open(self.hashtagFile, "r") as file:
-                data = json.load(file)
-        except (FileNotFoundError, json.decoder.JSONDecodeError):
-            data = {}
+    def __getLog(self) -> IngestLog:
+        """
+        Returns the ingest log. On the first use a compaction committed before a crash is finished, which notes
+        its sources in the manifest - so it waits until manifestFile is set
+        :return: Ingest log
+        """
+        if not self.__logRecovered:
+            self.__logRecovered = True
+            if self.__log.pendingCommit():
+                self.__finishCompaction()
 
-        for tag in hashtags:
-            if tag in data.keys():
-                data[tag]["count"] += 1
-                data[tag]["connections"] = list(set(data[tag]["connections"]).union(hashtags))
-                data[tag]["connections"].remove(tag)
-            else:
-                data[tag] = {"count": 1, "connections": list(hashtags)}
-                data[tag]["connections"].remove(tag)
+        return self.__log
 
-        with open(self.hashtagFile, "w") as file:
-            json.dump(data, file, indent=3)
+    def __getManifest(self) -> SourceManifest:
+        if self.__manifest is None:
+            self.__manifest = SourceManifest(self.manifestFile, self.parsedSourceFile)
 
-    def __fileParsed(self, source: str) -> bool:
+        return self.__manifest
+
+    def __fileDone(self) -> None:
         """
-        Checks whether the source file is parsed or not. Reads and notes the contents of the parsedPostsFile
-        if we haven't yet accessed it.
-        :param source: Path to the source file
-        :return: True/False if the file has been parsed or not
+        Counts the parsed files in batch mode and flushes the stores after every flushEvery files
+        :return: None
         """
+        if not self.__batchMode:
+            return
+
+        self.__filesSinceFlush += 1
+        if 0 < self.__flushEvery <= self.__filesSinceFlush:
+            self.flush()
 
-        if len(self.parsedSources) == 0:
-            try:
-                with open(self.parsedSourceFile, "r") as file:
-                    self.parsedSources = file.read().split("\n")
-            except FileNotFoundError:
-                return False
+    def __loadData(self) -> dict:
+        """
+        Loads the user data from dataFile. In batch mode the file is read only once and the in-memory copy is reused
+        :return: User data
+        """
+        if self.__batchMode and self.__data is not None:
+            return self.__data
 
-        return source in self.parsedSources
+        data = self.__toWorkingModel(self.__readJson(self.dataFile))
+        self.__commentIndex.load()
 
-    def __noteParsedFile(self, source: str) -> None:
+        if self.__batchMode:
+            self.__data = data
+
+        return data
+
+    def __storeData(self, data: dict) -> None:
         """
-        Notes the current file so we don't have to parse over it unnecessarily. The information is remembered in
-        the parsedPostsFile and as a class parameter, so we don't have to open a file everytime we want to check,
-        thus making the process more efficient
-        :param source: Path to the source file
+        Stores the user data into dataFile. In batch mode the write is postponed until flush
+        :param data: User data
         :return: None
         """
-        if source in self.parsedSources:
+        if self.__batchMode:
+            self.__data = data
             return
 
-        with open(self.parsedSourceFile, "a") as file:
-            file.write(source + "\n")
+        self.__writeJson(self.dataFile, data)
+        self.__commentIndex.save()
 
-        self.parsedSources.append(source)
+    def __loadHashtagData(self) -> HashtagStatistics:
+        """
+        Loads the hashtag statistics. In batch mode the file is read only once
+        :return: Hashtag statistics
+        """
+        if self.__batchMode and self.__hashtagData is not None:
+            return self.__hashtagData
+
+        data = self.__readHashtagStatistics()
+
+        if self.__batchMode:
+            self.__hashtagData = data
+
+        return data
+
+    def __storeHashtagData(self, data: HashtagStatistics) -> None:
+        """
+        Stores the hashtag statistics. In batch mode the write is postponed until flush
+        :param data: Hashtag statistics
+        :return: None
+        """
+        if self.__batchMode:
+            self.__hashtagData = data
+            return
+
+        self.__writeHashtagStatistics(data)
+
+    def __readHashtagStatistics(self) -> HashtagStatistics:
+        """
+        Reads the statistics from hashtagStatisticsFile. Without it they are created from hashtagFile,
+        whose connections have no co-occurrence counts
+        :return: Hashtag statistics
+        """
+        if os.path.exists(self.hashtagStatisticsFile):
+            return HashtagStatistics.load(self.hashtagStatisticsFile)
+
+        return HashtagStatistics.fromJson(self.__readJson(self.hashtagFile))
+
+    def __writeHashtagStatistics(self, data: HashtagStatistics, durable: bool = False) -> None:
+        """
+        Saves the statistics into hashtagStatisticsFile and exports them into hashtagFile
+        :param data: Hashtag statistics
+        :param durable: Whether to sync the files and swap them in atomically
+        :return: None
+        """
+        if durable:
+            data.save(self.hashtagStatisticsFile + ".tmp", sync=True)
+            os.replace(self.hashtagStatisticsFile + ".tmp", self.hashtagStatisticsFile)
+        else:
+            data.save(self.hashtagStatisticsFile)
+
+        self.__writeJson(self.hashtagFile, data.toJson(), sync=durable, atomic=durable)
+
+    @staticmethod
+    def __readJson(filename: str) -> dict:
+        try:
+            with open(filename, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def __writeJson(filename: str, data: dict, sync: bool = False, atomic: bool = False) -> None:
+        # An atomic write goes into a temporary file which then replaces the old one
+        target = filename + ".tmp" if atomic else filename
+
+        with open(target, "w") as file:
+            # Sets of the working model are written as lists
+            json.dump(data, file, indent=3, default=list)
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+
+        if atomic:
+            os.replace(target, filename)
 
     def __removeSearchFromFilename(self, source: str) -> str:
         """
@@ -451,24 +799,3 @@ class DataParser:
             os.rename(source, newSource)
 
         return newSource
-
-    def __convertSimpleIntToInt(self, number: str) -> int:
-        """
-        Converts number in string form into an integer. Takes in mind the number might be in format "1.1M" or "6.8K"
-        (Shouldn't be needed but kept for redundancy)
-        :param number: String
-        :return: Converted integer
-        """
-        if len(number) == 0:
-            return 0
-
-        dic = {
-            "K": 1000.0,
-            "M": 1_000_000.0
-        }
-        multiplier: str = number[-1]
-
-        if multiplier in dic.keys():
-            return int( float(number[:-1]) * dic[multiplier])
-        else:
-            return int(number)
\ No newline at end of file
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+
+NEW: str = "new"
+UNCHANGED: str = "unchanged"
+CHANGED: str = "changed"
+
+# The manifest is compacted once it has this many times more lines than entries (and at least MIN_COMPACT_LINES)
+COMPACT_RATIO: int = 4
+MIN_COMPACT_LINES: int = 1_000
+
+def describeSource(source: str) -> dict:
+    """
+    Creates the manifest entry of the source file - its size, modification time and content hash
+    :param source: Path to the source file
+    :return: Manifest entry
+    """
+    stat = os.stat(source)
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(source, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return {
+        "source": source,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": digest.hexdigest(),
+    }
+
+def sourceState(source: str, entry: dict | None) -> tuple[str, dict | None]:
+    """
+    Compares the source file with its manifest entry. Files with the same size and modification time are
+    considered unchanged without opening them, otherwise the content hash decides
+    :param source: Path to the source file
+    :param entry: Manifest entry of the source, None if it was never parsed
+    :return: State (NEW, UNCHANGED or CHANGED) and the fresh description of the file if it had to be read
+    """
+    if entry is None:
+        return NEW, None
+
+    # Sources noted before the manifest existed have no description, they are skipped as before
+    if "hash" not in entry:
+        return UNCHANGED, None
+
+    stat = os.stat(source)
+    if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime"]:
+        return UNCHANGED, None
+
+    description = describeSource(source)
+    if description["hash"] == entry["hash"]:
+        return UNCHANGED, description
+
+    return CHANGED, description
+
+class SourceManifest:
+    """
+    Manifest of the parsed source files. Every parsed source is appended as one line with its size,
+    modification time, content hash and what it contributed to the data, later lines override earlier ones.
+    A source noted again only appends the values which changed, e.g. the new size and modification time of a file
+    touched without changing its content. The entries are kept in a dict, so checking a source is O(1).
+    Once the manifest has many more lines than entries, it is rewritten with one line per entry
+    """
+
+    def __init__(self, manifestFile: str, legacyFile: str | None = None):
+        """
+        :param manifestFile: File with the manifest lines
+        :param legacyFile: Old list of parsed sources (one path per line), its sources are treated as unchanged
+        """
+        self.manifestFile: str = manifestFile
+        self.legacyFile: str | None = legacyFile
+
+        self.compactingFile: str = manifestFile + ".compacting"
+
+        self.__entries: dict[str, dict] | None = None
+        # Number of lines in the manifest file
+        self.__lines: int = 0
+
+    def entry(self, source: str) -> dict | None:
+        """
+        :param source: Path to the source file
+        :return: Manifest entry of the source, None if it was never parsed
+        """
+        return self.__load().get(source)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self.__load()
+
+    def currentEntry(self, source: str) -> dict:
+        """
+        Describes the source file as it is now and notes the description if it differs from the noted one.
+        A file with the same size and modification time is not read
+        :param source: Path to the source file
+        :return: Manifest entry of the current version of the file
+        """
+        entry = self.entry(source)
+
+        _, description = sourceState(source, entry)
+        if entry is None:
+            description = describeSource(source)
+        if description is not None:
+            self.note([description])
+
+        return self.entry(source)
+
+    def note(self, entries: list[dict]) -> None:
+        """
+        Appends the entries to the manifest and syncs it to the disk. Only the values which differ from the noted
+        entry of the source are written
+        :param entries: Manifest entries
+        :return: None
+        """
+        loaded = self.__load()
+
+        lines = []
+        for entry in entries:
+            previous = loaded.get(entry["source"], {})
+            changed = {key: value for key, value in entry.items() if previous.get(key) != value}
+            if len(changed) == 0:
+                continue
+
+            lines.append(json.dumps(dict(changed, source=entry["source"]), ensure_ascii=False) + "\n")
+            loaded[entry["source"]] = dict(previous, **entry)
+
+        if len(lines) == 0:
+            return
+
+        with open(self.manifestFile, "a", encoding="utf-8") as file:
+            file.write("".join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+
+        self.__lines += len(lines)
+        self.__compactIfNeeded()
+
+    def compact(self) -> None:
+        """
+        Rewrites the manifest with one line per entry. The new manifest is written next to the old one, synced
+        and swapped in atomically, so a crash keeps either of them
+        :return: None
+        """
+        loaded = self.__load()
+
+        # Sources of the legacy file which were never noted again stay only in the legacy file
+        entries = [entry for entry in loaded.values() if len(entry) > 1]
+
+        with open(self.compactingFile, "w", encoding="utf-8") as file:
+            file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(self.compactingFile, self.manifestFile)
+        self.__lines = len(entries)
+
+    def __compactIfNeeded(self) -> None:
+        if self.__lines >= max(MIN_COMPACT_LINES, COMPACT_RATIO * len(self.__entries)):
+            self.compact()
+
+    def __load(self) -> dict[str, dict]:
+        if self.__entries is not None:
+            return self.__entries
+
+        self.__entries = {}
+        self.__lines = 0
+
+        if self.legacyFile is not None:
+            try:
+                with open(self.legacyFile, "r") as file:
+                    for source in file.read().split("\n"):
+                        if source != "":
+                            self.__entries[source] = {"source": source}
+            except FileNotFoundError:
+                pass
+
+        try:
+            with open(self.manifestFile, "rb+") as file:
+                validSize = 0
+                for line in file:
+                    # A torn last line is left by a crash while appending, its source was not noted
+                    if not line.endswith(b"\n"):
+                        break
+                    entry = json.loads(line)
+                    self.__entries.setdefault(entry["source"], {}).update(entry)
+                    validSize += len(line)
+                    self.__lines += 1
+
+                file.truncate(validSize)
+        except FileNotFoundError:
+            pass
+
+        self.__compactIfNeeded()
+
+        return self.__entries
@@ -0,0 +1,382 @@
+import json
+import sqlite3
+from collections.abc import Mapping
+
+from commentIndex import commentKey, normalizeComment, staleCommentKeys
+from hashtagStatistics import HashtagStatistics
+
+class SqliteStorage(Mapping):
+    """
+    Storage of the user data and hashtag statistics in a local SQLite database. The relations are kept in
+    indexed tables, so lookups like "followers of X" don't need the whole dataset in memory.
+
+    The storage can be used in place of the user data dict - storage[user] returns the same dict as the .json file
+    """
+
+    def __init__(self, databaseFile: str):
+        self.databaseFile: str = databaseFile
+
+        self.__connection = sqlite3.connect(databaseFile)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+        self.__createTables()
+
+    def close(self) -> None:
+        self.__connection.commit()
+        self.__connection.close()
+
+    def __createTables(self) -> None:
+        self.__connection.executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                name TEXT PRIMARY KEY,
+                totalFollowingCount INTEGER NOT NULL DEFAULT 0,
+                shownFollowingCount INTEGER NOT NULL DEFAULT 0,
+                totalFollowersCount INTEGER NOT NULL DEFAULT 0,
+                shownFollowersCount INTEGER NOT NULL DEFAULT 0,
+                totalCommentsCount INTEGER NOT NULL DEFAULT 0,
+                shownCommentsCount INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS follows (
+                follower TEXT NOT NULL,
+                followed TEXT NOT NULL,
+                PRIMARY KEY (follower, followed)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS followsByFollowed ON follows (followed, follower);
+
+            CREATE TABLE IF NOT EXISTS comments (
+                commenter TEXT NOT NULL,
+                creator TEXT NOT NULL,
+                PRIMARY KEY (commenter, creator)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS commentsByCreator ON comments (creator, commenter);
+
+            CREATE TABLE IF NOT EXISTS userHashtags (
+                user TEXT NOT NULL,
+                hashtag TEXT NOT NULL,
+                PRIMARY KEY (user, hashtag)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS userHashtagsByHashtag ON userHashtags (hashtag, user);
+
+            CREATE TABLE IF NOT EXISTS commentsPosted (
+                id INTEGER PRIMARY KEY,
+                user TEXT NOT NULL,
+                text TEXT NOT NULL,
+                likes INTEGER NOT NULL,
+                hashtags TEXT NOT NULL,
+                dedupKey TEXT NOT NULL,
+                UNIQUE (user, dedupKey)
+            );
+
+            CREATE TABLE IF NOT EXISTS hashtags (
+                tag TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS hashtagConnections (
+                tag TEXT NOT NULL,
+                other TEXT NOT NULL,
+                weight INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (tag, other)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS parsedSources (
+                source TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime INTEGER,
+                hash TEXT,
+                contribution TEXT
+            ) WITHOUT ROWID;
+        """)
+
+        self.__connection.commit()
+
+    ###########
+    # Writing #
+    ###########
+
+    def applyRecord(self, source: str, record: dict, entry: dict, commit: bool = True) -> None:
+        """
+        Upserts the record created by DataParser and notes its source as parsed in the same transaction,
+        so the data and the parsed sources can't get out of sync. If applying the record fails, the whole
+        connection is rolled back - with commit=False that also drops every record applied since the last commit,
+        so the caller has to apply their sources again (like IngestDaemon does after a failed file)
+        :param source: Path to the source file
+        :param record: Record created by one of the DataParser parse functions
+        :param entry: Manifest entry of the source
+        :param commit: Whether to commit the transaction straight away (False is used in batch mode)
+        :return: None
+        """
+        try:
+            if record["type"] == "comments":
+                self.__applyCommentsRecord(record)
+            elif record["type"] == "follows":
+                self.__applyFollowsRecord(record)
+            else:
+                raise ValueError(f"Unknown record type {record['type']}")
+
+            self.noteSource(dict(entry, source=source), commit=False)
+        except BaseException:
+            self.__connection.rollback()
+            raise
+
+        if commit:
+            self.commit()
+
+    def noteSource(self, entry: dict, commit: bool = True) -> None:
+        """
+        Inserts or replaces the manifest entry of a parsed source
+        :param entry: Manifest entry of the source
+        :param commit: Whether to commit the transaction straight away
+        :return: None
+        """
+        self.__connection.execute(
+            "INSERT OR REPLACE INTO parsedSources VALUES (?, ?, ?, ?, ?)",
+            (entry["source"], entry.get("size"), entry.get("mtime"), entry.get("hash"),
+             json.dumps(entry.get("contribution", {})))
+        )
+
+        if commit:
+            self.commit()
+
+    def sourceEntry(self, source: str) -> dict | None:
+        """
+        :param source: Path to the source file
+        :return: Manifest entry of the parsed source, None if it was never parsed
+        """
+        row = self.__connection.execute(
+            "SELECT size, mtime, hash, contribution FROM parsedSources WHERE source = ?", (source,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        entry = {"source": source, "contribution": json.loads(row[3])}
+        if row[2] is not None:
+            entry.update(size=row[0], mtime=row[1], hash=row[2])
+
+        return entry
+
+    def commit(self) -> None:
+        self.__connection.commit()
+
+    def rollback(self) -> None:
+        self.__connection.rollback()
+
+    def __applyFollowsRecord(self, record: dict) -> None:
+        accountUser: str = record["account"]
+        count: int = record["count"]
+        usernames: list[str] = [user for user in record["users"] if user != ""]
+
+        self.__ensureUsers([accountUser] + usernames)
+
+        if record["kind"] == "Followers":
+            self.__connection.execute(
+                "UPDATE users SET totalFollowersCount = ?, shownFollowersCount = ? WHERE name = ?",
+                (count, len(usernames), accountUser)
+            )
+            self.__connection.executemany(
+                "INSERT OR IGNORE INTO follows VALUES (?, ?)",
+                ((user, accountUser) for user in usernames)
+            )
+        elif record["kind"] == "Following":
+            self.__connection.execute(
+                "UPDATE users SET totalFollowingCount = ?, shownFollowingCount = ? WHERE name = ?",
+                (count, len(usernames), accountUser)
+            )
+            self.__connection.executemany(
+                "INSERT OR IGNORE INTO follows VALUES (?, ?)",
+                ((accountUser, user) for user in usernames)
+            )
+        else:
+            raise NameError("File must be either (Followers) or (Following)")
+
+    def __applyCommentsRecord(self, record: dict) -> None:
+        postCreator: str = record["creator"]
+        hashtags: list[str] = sorted(set(record["hashtags"]))
+        # A changed source replaces the counts of its previous version
+        previous: dict = record.get("previous", {})
+        previousHashtags = set(previous.get("hashtags", []))
+
+        filteredComments = dict()
+        for user, text, likes in record["comments"]:
+            filteredComments[(user, text, likes)] = None
+        usernames = {user for user, _, _ in filteredComments}
+
+        self.__ensureUsers([postCreator])
+        self.__connection.execute(
+            "UPDATE users SET totalCommentsCount = totalCommentsCount + ?, "
+            "shownCommentsCount = shownCommentsCount + ? WHERE name = ?",
+            (record["count"] - previous.get("count", 0), len(filteredComments) - previous.get("shown", 0), postCreator)
+        )
+
+        self.__ensureUsers(list(usernames))
+
+        # Comments of the previous version which changed or are gone, so they don't stay next to their new versions
+        self.__connection.executemany(
+            "DELETE FROM commentsPosted WHERE user = ? AND dedupKey = ?", staleCommentKeys(record)
+        )
+
+        hashtagsJson = json.dumps(hashtags)
+        for user, text, likes in filteredComments:
+            newComment = normalizeComment(text, likes, hashtags)
+
+            self.__connection.execute(
+                "INSERT OR IGNORE INTO commentsPosted (user, text, likes, hashtags, dedupKey) VALUES (?, ?, ?, ?, ?)",
+                (user, newComment["text"], likes, hashtagsJson, commentKey(newComment))
+            )
+
+        self.__connection.executemany(
+            "INSERT OR IGNORE INTO comments VALUES (?, ?)",
+            ((user, postCreator) for user in usernames)
+        )
+        self.__connection.executemany(
+            "INSERT OR IGNORE INTO userHashtags VALUES (?, ?)",
+            ((user, tag) for user in usernames | {postCreator} for tag in hashtags)
+        )
+
+        self.__connection.executemany(
+            "INSERT INTO hashtags VALUES (?, 1) ON CONFLICT (tag) DO UPDATE SET count = count + 1",
+            ((tag,) for tag in hashtags if tag not in previousHashtags)
+        )
+        # Pairs which were both on the previous version of the post are already counted
+        self.__connection.executemany(
+            "INSERT INTO hashtagConnections VALUES (?, ?, 1) ON CONFLICT (tag, other) DO UPDATE SET weight = weight + 1",
+            (
+                (tag, other) for tag in hashtags for other in hashtags
+                if tag != other and not (tag in previousHashtags and other in previousHashtags)
+            )
+        )
+
+        # Hashtags and pairs the previous version had and this one doesn't are counted down
+        currentHashtags = set(hashtags)
+        self.__connection.executemany(
+            "UPDATE hashtags SET count = count - 1 WHERE tag = ?",
+            ((tag,) for tag in previousHashtags - currentHashtags)
+        )
+        self.__connection.executemany(
+            "UPDATE hashtagConnections SET weight = weight - 1 WHERE tag = ? AND other = ?",
+            (
+                (tag, other) for tag in previousHashtags for other in previousHashtags
+                if tag != other and not (tag in currentHashtags and other in currentHashtags)
+            )
+        )
+        if len(previousHashtags - currentHashtags) > 0:
+            self.__connection.execute("DELETE FROM hashtags WHERE count <= 0")
+            self.__connection.execute("DELETE FROM hashtagConnections WHERE weight <= 0")
+
+    def __ensureUsers(self, users: list[str]) -> None:
+        self.__connection.executemany("INSERT OR IGNORE INTO users (name) VALUES (?)", ((user,) for user in users))
+
+    ###########
+    # Reading #
+    ###########
+
+    def __getitem__(self, user: str) -> dict:
+        """
+        :param user: Username
+        :return: The user in the same format as in the .json storage
+        """
+        row = self.__connection.execute(
+            "SELECT totalFollowingCount, shownFollowingCount, totalFollowersCount, shownFollowersCount, "
+            "totalCommentsCount, shownCommentsCount FROM users WHERE name = ?",
+            (user,)
+        ).fetchone()
+
+        if row is None:
+            raise KeyError(user)
+
+        return {
+            "totalFollowingCount": row[0],
+            "shownFollowingCount": row[1],
+            "following": self.followingOf(user),
+            "totalFollowersCount": row[2],
+            "shownFollowersCount": row[3],
+            "followers": self.followersOf(user),
+            "totalCommentsCount": row[4],
+            "shownCommentsCount": row[5],
+            "commentedOn": self.commentedOnBy(user),
+            "commenters": self.commentersOf(user),
+            "hashtags": self.hashtagsOf(user),
+            "commentsPosted": self.commentsPostedBy(user),
+        }
+
+    def __contains__(self, user: object) -> bool:
+        row = self.__connection.execute("SELECT 1 FROM users WHERE name = ?", (user,)).fetchone()
+        return row is not None
+
+    def __iter__(self):
+        # Separate cursor, so the users can be read while iterating
+        for (user,) in self.__connection.cursor().execute("SELECT name FROM users ORDER BY name"):
+            yield user
+
+    def __len__(self) -> int:
+        return self.__connection.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def followersOf(self, user: str) -> list[str]:
+        return self.__column("SELECT follower FROM follows WHERE followed = ?", user)
+
+    def followingOf(self, user: str) -> list[str]:
+        return self.__column("SELECT followed FROM follows WHERE follower = ?", user)
+
+    def commentersOf(self, user: str) -> list[str]:
+        return self.__column("SELECT commenter FROM comments WHERE creator = ?", user)
+
+    def commentedOnBy(self, user: str) -> list[str]:
+        return self.__column("SELECT creator FROM comments WHERE commenter = ?", user)
+
+    def hashtagsOf(self, user: str) -> list[str]:
+        return self.__column("SELECT hashtag FROM userHashtags WHERE user = ?", user)
+
+    def usersWithHashtag(self, hashtag: str) -> list[str]:
+        return self.__column("SELECT user FROM userHashtags WHERE hashtag = ?", hashtag)
+
+    def commentsPostedBy(self, user: str) -> list[dict]:
+        return [
+            {"text": text, "likes": likes, "hashtags": json.loads(hashtags)}
+            for text, likes, hashtags in self.__connection.execute(
+                "SELECT text, likes, hashtags FROM commentsPosted WHERE user = ? ORDER BY id", (user,)
+            )
+        ]
+
+    def hashtagStatistics(self) -> dict[str, dict]:
+        """
+        :return: Hashtag statistics in the same format as the hashtag .json file
+        """
+        statistics = {
+            tag: {"count": count, "connections": []}
+            for tag, count in self.__connection.execute("SELECT tag, count FROM hashtags")
+        }
+        for tag, other in self.__connection.execute("SELECT tag, other FROM hashtagConnections"):
+            statistics[tag]["connections"].append(other)
+
+        return statistics
+
+    def hashtagCooccurrence(self) -> HashtagStatistics:
+        """
+        :return: Hashtag statistics with the co-occurrence counts
+        """
+        return HashtagStatistics.fromWeights(
+            dict(self.__connection.execute("SELECT tag, count FROM hashtags")),
+            self.__connection.execute("SELECT tag, other, weight FROM hashtagConnections"),
+        )
+
+    def exportJson(self, dataFile: str, hashtagFile: str, hashtagStatisticsFile: str | None = None) -> None:
+        """
+        Writes the storage into the .json files used by the rest of the scripts
+        :param dataFile: .json file for the user data
+        :param hashtagFile: .json file for the hashtag statistics
+        :param hashtagStatisticsFile: Optional .npz file for the hashtag statistics with the co-occurrence counts
+        :return: None
+        """
+        with open(dataFile, "w") as file:
+            json.dump(dict(self.items()), file, indent=3)
+
+        with open(hashtagFile, "w") as file:
+            json.dump(self.hashtagStatistics(), file, indent=3)
+
+        if hashtagStatisticsFile is not None:
+            self.hashtagCooccurrence().save(hashtagStatisticsFile)
+
+    def __column(self, query: str, value: str) -> list[str]:
+        return [row[0] for row in self.__connection.execute(query, (value,))]
@@ -3,188 +3,1190 @@
 ##################################################
 
 import igraph as ig
+import itertools
 import leidenalg
-from collections import defaultdict
+import multiprocessing
+import os
+import random
+import time
+import numpy as np
+import scipy.sparse as sp
+from array import array
+from collections.abc import Mapping
 
-class RelationshipExtractor:
-    def extract(self, data: dict) -> ( dict[str, int] | set[str], set[tuple[str, str]] ):
-        raise NotImplementedError("Abstract method")
+from GeneratingCommunities.snapshot import UserSnapshot
+from GeneratingCommunities.userGraph import UserGraph
 
-class LeidenExtractor(RelationshipExtractor):
+# Prime of the universal hash functions of MinHash, products of the hash parameters and ids fit into 64 bits
+MINHASH_PRIME: int = (1 << 31) - 1
+# Number of entries of the hashed incidence matrix processed at once while computing the signatures
+MINHASH_CHUNK: int = 1 << 24
+# Probability with which a pair of the threshold similarity becomes a candidate of the LSH banding
+LSH_RECALL: float = 0.95
+# Rows per band when even the threshold similarity would allow more (threshold 1)
+LSH_MAX_ROWS: int = 8
 
-    def __init__(self,
-                 followingWeight: float = 1.0,
-                 commentedWeight: float = 2.0,
-                 hashtagWeight: float = 0.5,
-                 ):
-        if not all((isinstance(followingWeight, float),
-                    isinstance(commentedWeight, float),
-                    isinstance(hashtagWeight, float))):
-            raise TypeError('All weights must be floats')
+# Partitions of the resolution sweep, they take the resolution parameter
+RESOLUTION_PARTITIONS: dict[str, type] = {
+    "RBConfiguration": leidenalg.RBConfigurationVertexPartition,
+    "CPM": leidenalg.CPMVertexPartition,
+}
 
-        self.__followingWeight = followingWeight
-        self.__commentedWeight = commentedWeight
-        self.__hashtagWeight = hashtagWeight
+def hashtagIncidence(data: Mapping, userIds: dict[str, int]) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    :param data: User data
+    :param userIds: Vertex id of every user of the data
+    :return: Arrays (userIds, hashtagIds) with one item for every hashtag of every user, sorted by the users,
+    and the number of hashtags
+    """
+    tagIds: dict[str, int] = {}
+    rows = array("i")
+    columns = array("i")
 
-        self.__providedData = None
-        self.__hashtagUsers = None
+    for user, info in data.items():
+        userId = userIds[user]
+        for tag in set(info.get('hashtags', [])):
+            rows.append(userId)
+            columns.append(tagIds.setdefault(tag, len(tagIds)))
 
-    def extract(self, data: dict) -> tuple[ dict[str, int], set[tuple[str, str]] ]:
+    rows = np.frombuffer(rows, dtype=np.int32)
+    columns = np.frombuffer(columns, dtype=np.int32)
 
-        self.__providedData = data
-        self.__hashtagUsers = self.__preprocessHashtags()
+    order = np.argsort(rows, kind="stable")
+    return rows[order], columns[order], len(tagIds)
 
-        weightedData = self.__weighData()
+def hashtagEdges(data: Mapping,
+                 userIds: dict[str, int],
+                 hashtagWeight: float,
+                 hashtagIdf: bool = False,
+                 maxHashtagUsers: int | None = None,
+                 ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes the hashtag layer as the sparse product A * diag(w) * A^T of the user x hashtag incidence matrix A,
+    so users sharing k hashtags get one edge in both directions with the weight hashtagWeight * k
+    (or the sum of the damped hashtag weights)
+    :param data: User data
+    :param userIds: Vertex id of every user of the data
+    :param hashtagWeight: Weight of one shared hashtag
+    :param hashtagIdf: Damp popular hashtags - a hashtag of df users has the weight log(1 + numUsers / df)
+    :param maxHashtagUsers: Hashtags of more users are skipped, None keeps all of them
+    :return: Arrays (sources, targets, weights) of the directed edges, without self loops
+    """
+    return incidenceHashtagEdges(hashtagIncidence(data, userIds), len(userIds), hashtagWeight, hashtagIdf,
+                                 maxHashtagUsers)
 
-        graph = self.__createGraph(weightedData)
+def incidenceHashtagEdges(incidence: tuple[np.ndarray, np.ndarray, int],
+                          numUsers: int,
+                          hashtagWeight: float,
+                          hashtagIdf: bool = False,
+                          maxHashtagUsers: int | None = None,
+                          ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    hashtagEdges() of an incidence already in arrays
+    :param incidence: (userIds, hashtagIds, number of hashtags) as from hashtagIncidence()
+    :param numUsers: Number of the users with hashtags, their ids are smaller
+    :return: Arrays (sources, targets, weights) of the directed edges, without self loops
+    """
+    rows, columns, numTags = incidence
 
-        partition = leidenalg.find_partition(
-            graph,
-            leidenalg.ModularityVertexPartition,
-            weights=graph.es["weight"]
-        )
+    # Number of users of every hashtag
+    usersPerTag = np.bincount(columns, minlength=numTags)
 
-        usersByCommunity: dict[str, int]
-        usersByCommunity = {
-            graph.vs[i]['name']: communityId
-            for i, communityId in enumerate(partition.membership)
-        }
+    tagWeights = np.ones(numTags, dtype=np.float64)
+    if hashtagIdf:
+        tagWeights = np.log1p(numUsers / np.maximum(usersPerTag, 1))
+    if maxHashtagUsers is not None:
+        tagWeights[usersPerTag > maxHashtagUsers] = 0.0
 
-        connections: set[tuple[str, str]] = set(weightedData.keys())
+    kept = tagWeights[columns] > 0
+    incidence = sp.csr_matrix(
+        (np.ones(np.count_nonzero(kept), dtype=np.float64), (rows[kept], columns[kept])),
+        shape=(numUsers, numTags),
+    )
 
-        return usersByCommunity, connections
+    shared = (incidence @ sp.diags(tagWeights) @ incidence.T).tocoo()
 
-    def __preprocessHashtags(self) -> dict[str, set[str]]:
-        hashtagDict = defaultdict(set)
-        for user, info in self.__providedData.items():
-            for tag in info.get('hashtags', []):
-                hashtagDict[tag].add(user)
+    notLoop = shared.row != shared.col
+    return (shared.row[notLoop].astype(np.int32),
+            shared.col[notLoop].astype(np.int32),
+            shared.data[notLoop] * hashtagWeight)
 
-        return dict(hashtagDict)
+def emptyEdges() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
 
-    def __weighData(self) -> dict[tuple[str, str], float]:
-        edgeWeights = defaultdict(float)
+def lshRowsFor(threshold: float, bands: int, recall: float = LSH_RECALL) -> int:
+    """
+    :param threshold: Jaccard similarity threshold
+    :param bands: Number of LSH bands
+    :param recall: Probability with which a pair of the threshold similarity has to become a candidate
+    :return: Most rows per band for which a pair of the threshold similarity shares a band with the probability
+    1 - (1 - threshold ^ rows) ^ bands of at least recall. The midpoint of the S-curve (1 / bands) ^ (1 / rows) is then
+    well below the threshold, the pairs below it are dropped by the exact check of the candidates
+    """
+    if threshold >= 1.0:
+        return LSH_MAX_ROWS
 
-        for user, info in self.__providedData.items():
+    # Probability with which the pair has to agree on a whole band
+    bandAgreement = 1.0 - (1.0 - recall) ** (1.0 / bands)
+    rows = int(np.floor(np.log(bandAgreement) / np.log(threshold)))
 
-            for followed in info.get('following', []):
+    return min(max(1, rows), LSH_MAX_ROWS)
 
-                edgeWeights[(user, followed)] += self.__followingWeight
+def minHashEdges(data: Mapping,
+                 userIds: dict[str, int],
+                 hashtagWeight: float,
+                 threshold: float,
+                 bands: int = 16,
+                 rows: int | None = None,
+                 bucketNeighbours: int | None = 4,
+                 seed: int = 0,
+                 ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Approximate hashtag layer - users with the Jaccard similarity of their hashtag sets at least threshold get
+    an edge in both directions weighted hashtagWeight * similarity.
+    Every user gets a MinHash signature of bands * rows hash values. Users with the same values in a band land in
+    the same bucket and become candidates, inside a bucket every user is paired only with the next bucketNeighbours
+    users (in a random order, different in every band), so even the huge buckets of users with the same hashtags
+    give a linear number of candidates. The similarity of the candidates is computed exactly from their hashtags,
+    so no edge is below the threshold and the weights are exact - only the pairs which never became candidates
+    are missing. More bands find more of the similar pairs (higher recall) for more time and memory
+    :param data: User data
+    :param userIds: Vertex id of every user of the data
+    :param hashtagWeight: Weight of the edge between users with the same hashtags
+    :param threshold: Minimal Jaccard similarity of the hashtag sets of the connected users
+    :param bands: Number of LSH bands
+    :param rows: Number of hash values in a band, None derives it from the threshold (see lshRowsFor())
+    :param bucketNeighbours: Number of following users in a bucket every user is paired with, None pairs all
+    the users of a bucket (quadratic in the size of the largest bucket)
+    :param seed: Seed of the hash functions and the orders in the buckets
+    :return: Arrays (sources, targets, weights) of the directed edges, without self loops
+    """
+    return incidenceMinHashEdges(hashtagIncidence(data, userIds), hashtagWeight, threshold, bands, rows,
+                                 bucketNeighbours, seed)
 
-            for commentedOn in info.get('commentedOn', []):
-                edgeWeights[(user, commentedOn)] += self.__commentedWeight
+def incidenceMinHashEdges(incidence: tuple[np.ndarray, np.ndarray, int],
+                          hashtagWeight: float,
+                          threshold: float,
+                          bands: int = 16,
+                          rows: int | None = None,
+                          bucketNeighbours: int | None = 4,
+                          seed: int = 0,
+                          ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    minHashEdges() of an incidence already in arrays
+    :param incidence: (userIds, hashtagIds, number of hashtags) as from hashtagIncidence()
+    :return: Arrays (sources, targets, weights) of the directed edges, without self loops
+    """
+    if rows is None:
+        rows = lshRowsFor(threshold, bands)
 
-            userHashtags = set(info.get('hashtags', []))
+    random = np.random.default_rng(seed)
+    numHashes = bands * rows
 
-            for hashtag in userHashtags:
-                for otherUser in self.__hashtagUsers[hashtag]:
-                    if user == otherUser:
-                        continue
-                    edgeWeights[(user, otherUser)] += self.__hashtagWeight
+    userRows, columns, numTags = incidence
+    users, starts = np.unique(userRows, return_index=True)
+    if len(users) < 2:
+        return emptyEdges()
 
-        return edgeWeights
+    # Values of the universal hash functions (a * tag + b) mod p of every hashtag, one row per function
+    multipliers = random.integers(1, MINHASH_PRIME, numHashes, dtype=np.uint64)
+    increments = random.integers(0, MINHASH_PRIME, numHashes, dtype=np.uint64)
+    tagHashes = (np.outer(multipliers, np.arange(numTags, dtype=np.uint64)) + increments[:, None]) % MINHASH_PRIME
+    tagHashes = tagHashes.astype(np.uint32)
 
-    def __createGraph(self, weightedEdges: dict[tuple[str, str], float]) -> ig.Graph:
-        graph = ig.Graph(directed=True)
+    # Signature of a user is the minimum of every hash function over the hashtags of the user
+    signatures = np.empty((len(users), numHashes), dtype=np.uint32)
+    step = max(1, MINHASH_CHUNK // max(len(columns), 1))
+    for first in range(0, numHashes, step):
+        hashed = tagHashes[first:first + step][:, columns]
+        signatures[:, first:first + step] = np.minimum.reduceat(hashed, starts, axis=1).T
 
-        nodes = set(self.__providedData.keys())
-        for u1, u2 in weightedEdges.keys():
-            nodes.update([u1, u2])
-        graph.add_vertices(list(nodes))
+    del tagHashes
 
-        edges = list(weightedEdges.keys())
-        weights = list(weightedEdges.values())
-        graph.add_edges(edges)
-        graph.es["weight"] = weights
+    pairKeys = []
+    bandMultipliers = random.integers(1, 2 ** 63, rows, dtype=np.uint64) | np.uint64(1)
+    for band in range(bands):
+        # Bucket of the user - hash of the band of its signature
+        bucket = (signatures[:, band * rows:(band + 1) * rows].astype(np.uint64) * bandMultipliers).sum(axis=1)
 
-        return graph
+        order = np.lexsort((random.random(len(users)), bucket))
+        sortedBuckets = bucket[order]
+
+        offsets = itertools.count(1) if bucketNeighbours is None else range(1, bucketNeighbours + 1)
+        for offset in offsets:
+            same = np.flatnonzero(sortedBuckets[offset:] == sortedBuckets[:-offset])
+            if len(same) == 0:
+                break
+
+            first, second = order[same], order[same + offset]
+            low, high = np.minimum(first, second), np.maximum(first, second)
+            pairKeys.append(low.astype(np.int64) << 32 | high)
+
+    del signatures
+
+    if len(pairKeys) == 0:
+        return emptyEdges()
+
+    pairKeys = np.concatenate(pairKeys)
+    pairKeys.sort()
+    pairKeys = pairKeys[np.concatenate(([True], pairKeys[1:] != pairKeys[:-1]))]
+    low, high = (pairKeys >> 32).astype(np.int64), (pairKeys & 0xFFFFFFFF).astype(np.int64)
+
+    # Exact Jaccard similarity of the candidates - shared hashtags from the rows of the incidence matrix
+    incidence = sp.csr_matrix(
+        (np.ones(len(columns), dtype=np.float64), (np.searchsorted(users, userRows), columns)),
+        shape=(len(users), numTags),
+    )
+    sizes = np.diff(incidence.indptr)
+    shared = np.empty(len(pairKeys), dtype=np.float64)
+    step = max(1, MINHASH_CHUNK // max(int(sizes.max()), 1))
+    for first in range(0, len(pairKeys), step):
+        chunk = slice(first, first + step)
+        shared[chunk] = np.asarray(incidence[low[chunk]].multiply(incidence[high[chunk]]).sum(axis=1)).ravel()
+
+    similarity = shared / (sizes[low] + sizes[high] - shared)
+
+    kept = similarity >= threshold
+    sources, targets = users[low[kept]], users[high[kept]]
+    weights = similarity[kept] * hashtagWeight
+
+    return (np.concatenate((sources, targets)).astype(np.int32),
+            np.concatenate((targets, sources)).astype(np.int32),
+            np.concatenate((weights, weights)))
+
+def relationEdges(data: Mapping, userIds: dict[str, int], relation: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    :param data: User data
+    :param userIds: Vertex ids, users missing from it get new ids
+    :param relation: Relation of the user data, e.g. "following"
+    :return: Arrays (sources, targets) with one item for every related user of every user
+    """
+    sources = array("i")
+    targets = array("i")
+
+    for user, info in data.items():
+        others = info.get(relation, [])
+        sources.extend([userIds[user]] * len(others))
+        targets.extend(userIds.setdefault(other, len(userIds)) for other in others)
+
+    return np.frombuffer(sources, dtype=np.int32), np.frombuffer(targets, dtype=np.int32)
+
+def userGraphOf(data) -> UserGraph | None:
+    """
+    :param data: User data, its UserSnapshot or a UserGraph
+    :return: The array graph of the data (the UserGraph itself or the graph of the snapshot), None for the user data
+    which can only be read user by user (the .json dict, SqliteStorage)
+    """
+    if isinstance(data, UserGraph):
+        return data
+    if isinstance(data, UserSnapshot):
+        return data.graph
+    return None
+
+def userGraphEdges(graph: UserGraph,
+                   relations: tuple[str, ...],
+                   ) -> tuple[ list[str], int, tuple[np.ndarray, np.ndarray, int], dict[str, tuple[np.ndarray, np.ndarray]] ]:
+    """
+    The vertices, hashtag incidence and relation edges straight from the CSR arrays of a UserGraph, the same as
+    hashtagIncidence() and relationEdges() give for the user data. The users of the data come first (in the order
+    of their ids), then the users which only are targets of the relations, other users of the graph are left out
+    :param graph: Array graph of the user data
+    :param relations: Relations whose edges are returned, e.g. ("following", "commentedOn")
+    :return: Vertex names, number of the users of the data, the hashtag incidence and (sources, targets) of every
+    relation
+    """
+    relationArrays = {relation: graph.edges(relation) for relation in relations}
+
+    inData = np.asarray(graph.inData, dtype=bool)
+    targeted = np.zeros(graph.numUsers, dtype=bool)
+    for _, targets in relationArrays.values():
+        targeted[targets] = True
+
+    dataUsers = np.flatnonzero(inData)
+    order = np.concatenate((dataUsers, np.flatnonzero(targeted & ~inData)))
+    vertexIds = np.full(graph.numUsers, -1, dtype=np.int32)
+    vertexIds[order] = np.arange(len(order), dtype=np.int32)
+
+    allNames = graph.users.toList()
+    names = [allNames[user] for user in order.tolist()]
+
+    # Every hashtag of a user once - the rows of the CSR are sorted and the vertex ids keep the order of the data users
+    rows, columns = graph.edges("hashtags")
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+    incidence = (vertexIds[rows[first]], np.asarray(columns[first], dtype=np.int32), len(graph.hashtags))
+
+    edges = {
+        relation: (vertexIds[sources], vertexIds[targets]) for relation, (sources, targets) in relationArrays.items()
+    }
+
+    return names, len(dataUsers), incidence, edges
+
+def sumEdges(sources: np.ndarray, targets: np.ndarray, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    :return: Arrays (sources, targets, weights) with every edge once with the summed weights of its copies,
+    sorted by the sources and targets
+    """
+    keys = sources.astype(np.int64) << 32 | targets.astype(np.int64)
+    uniqueKeys, inverse = np.unique(keys, return_inverse=True)
+    summed = np.bincount(inverse, weights=weights, minlength=len(uniqueKeys))
+
+    return (uniqueKeys >> 32).astype(np.int32), (uniqueKeys & 0xFFFFFFFF).astype(np.int32), summed
+
+class WeightedEdges:
+    """
+    Weighted graph of the users as arrays - vertex names and one (source, target, weight) item for every edge
+    """
+
+    def __init__(self, names: list[str], sources: np.ndarray, targets: np.ndarray, weights: np.ndarray):
+        self.names: list[str] = names
+        self.sources: np.ndarray = sources
+        self.targets: np.ndarray = targets
+        self.weights: np.ndarray = weights
+
+    @property
+    def numVertices(self) -> int:
+        return len(self.names)
+
+    @property
+    def numEdges(self) -> int:
+        return len(self.sources)
+
+    def undirected(self) -> "WeightedEdges":
+        """
+        :return: Edges with both directions of an edge collapsed into one (source < target) with the summed weights
+        """
+        low = np.minimum(self.sources, self.targets)
+        high = np.maximum(self.sources, self.targets)
+
+        return WeightedEdges(self.names, *sumEdges(low, high, self.weights))
+
+    def toGraph(self, directed: bool) -> ig.Graph:
+        """
+        :param directed: Whether the graph is directed, the edges are not collapsed here (see undirected())
+        :return: igraph graph with the vertex attribute "name" and the edge attribute "weight"
+        """
+        return ig.Graph(
+            n=self.numVertices,
+            edges=np.column_stack((self.sources, self.targets)),
+            directed=directed,
+            vertex_attrs={"name": self.names},
+            edge_attrs={"weight": self.weights},
+        )
+
+    def namedPairs(self) -> set[tuple[str, str]]:
+        """
+        :return: Set of the edges as pairs of the vertex names
+        """
+        names = self.names
+        return set(zip([names[i] for i in self.sources.tolist()], [names[i] for i in self.targets.tolist()]))
+
+class GraphBuilder:
+    """
+    Builds the weighted user graph from the user data - following and commentedOn edges of the users
+    and the hashtag edges between the users with the same hashtags
+    """
 
-class LouvainExtractor(RelationshipExtractor):
     def __init__(self,
                  followingWeight: float = 1.0,
                  commentedWeight: float = 2.0,
                  hashtagWeight: float = 0.5,
+                 hashtagIdf: bool = False,
+                 maxHashtagUsers: int | None = None,
+                 hashtagSimilarity: float | None = None,
+                 lshBands: int = 16,
+                 lshBucketNeighbours: int | None = 4,
                  ):
+        """
+        :param hashtagIdf: Damp the weight of popular hashtags, see hashtagEdges()
+        :param maxHashtagUsers: Hashtags of more users don't create edges, None keeps all of them
+        :param hashtagSimilarity: If set, the hashtag edges are approximated by minHashEdges() - only users with
+        the Jaccard similarity of their hashtags at least hashtagSimilarity are connected
+        :param lshBands: Number of LSH bands of the approximation, more bands find more similar users but take longer
+        :param lshBucketNeighbours: Number of users every user is paired with inside an LSH bucket, None pairs all
+        the users of a bucket - the most similar users but quadratic time in the largest bucket
+        """
         if not all((isinstance(followingWeight, float),
                     isinstance(commentedWeight, float),
                     isinstance(hashtagWeight, float))):
             raise TypeError('All weights must be floats')
 
-        self.__followingWeight = followingWeight
-        self.__commentedWeight = commentedWeight
-        self.__hashtagWeight = hashtagWeight
+        if maxHashtagUsers is not None and (not isinstance(maxHashtagUsers, int) or maxHashtagUsers < 2):
+            raise ValueError('maxHashtagUsers must be an int of at least 2')
 
-        self.__providedData = None
-        self.__hashtagUsers = None
+        if hashtagSimilarity is not None and not 0.0 < hashtagSimilarity <= 1.0:
+            raise ValueError('hashtagSimilarity must be in (0, 1]')
 
-    def extract(self, data: dict) -> ( dict[str, int] | set[str], set[tuple[str, str]] ):
+        if not isinstance(lshBands, int) or lshBands < 1:
+            raise ValueError('lshBands must be a positive int')
+
+        if lshBucketNeighbours is not None and (not isinstance(lshBucketNeighbours, int) or lshBucketNeighbours < 1):
+            raise ValueError('lshBucketNeighbours must be a positive int or None')
+
+        self.followingWeight = followingWeight
+        self.commentedWeight = commentedWeight
+        self.hashtagWeight = hashtagWeight
+        self.hashtagIdf = hashtagIdf
+        self.maxHashtagUsers = maxHashtagUsers
+        self.hashtagSimilarity = hashtagSimilarity
+        self.lshBands = lshBands
+        self.lshBucketNeighbours = lshBucketNeighbours
+
+    def configuration(self) -> dict:
+        """
+        :return: Parameters which decide the built graph
+        """
+        return {
+            "followingWeight": self.followingWeight,
+            "commentedWeight": self.commentedWeight,
+            "hashtagWeight": self.hashtagWeight,
+            "hashtagIdf": self.hashtagIdf,
+            "maxHashtagUsers": self.maxHashtagUsers,
+            "hashtagSimilarity": self.hashtagSimilarity,
+            "lshBands": self.lshBands,
+            "lshBucketNeighbours": self.lshBucketNeighbours,
+        }
 
-        self.__providedData = data
-        self.__hashtagUsers = self.__hashtagUsers = self.__preprocessHashtags()
+    def build(self, data: Mapping) -> WeightedEdges:
+        """
+        :param data: User data
+        :return: Directed edges of the graph, the users of the data come first in the vertices,
+        the users which only appear in the relations of others after them
+        """
+        names, layers = self.__layerEdges(data)
+        layerWeights = {
+            'hashtags': self.hashtagWeight,
+            'following': self.followingWeight,
+            'commentedOn': self.commentedWeight,
+        }
 
-        weightedData = self.__weighData()
+        sources = np.concatenate([layers[layer][0] for layer in layerWeights])
+        targets = np.concatenate([layers[layer][1] for layer in layerWeights])
+        weights = np.concatenate([layers[layer][2] * weight for layer, weight in layerWeights.items()])
 
-        undirGraph = self.__createGraph(weightedData)
+        return WeightedEdges(names, *sumEdges(sources, targets, weights))
 
-        partition = undirGraph.community_multilevel(weights="weight")
+    def buildLayers(self, data: Mapping) -> "EdgeLayers":
+        """
+        :param data: User data
+        :return: The relation layers of the graph with unit weights, the weights of the builder are not used
+        """
+        names, layers = self.__layerEdges(data)
 
-        usersByCommunity: dict[str, int]
-        usersByCommunity = {
-            undirGraph.vs[i]['name']: communityId
-            for i, communityId in enumerate(partition.membership)
+        matrices = {
+            layer: sp.csr_matrix((weights, (sources, targets)), shape=(len(names), len(names)))
+            for layer, (sources, targets, weights) in layers.items()
         }
 
-        connections: set[tuple[str, str]] = set(weightedData.keys())
+        return EdgeLayers(names, matrices)
+
+    def __layerEdges(self, data) -> tuple[list[str], dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+        """
+        :param data: User data, its UserSnapshot or a UserGraph - the arrays of the last two are used directly
+        :return: Vertex names and the edges of every layer with unit weights - 1 for a following or commentedOn edge,
+        the number of shared (or damped) hashtags or the hashtag similarity for a hashtag edge
+        """
+        relations = ('following', 'commentedOn')
+
+        graph = userGraphOf(data)
+        if graph is None:
+            userIds: dict[str, int] = {user: i for i, user in enumerate(data.keys())}
+            numUsers = len(userIds)
+            incidence = hashtagIncidence(data, userIds)
+            relationData = {relation: relationEdges(data, userIds, relation) for relation in relations}
+            names = list(userIds.keys())
+        else:
+            names, numUsers, incidence, relationData = userGraphEdges(graph, relations)
+
+        if self.hashtagSimilarity is None:
+            hashtagData = incidenceHashtagEdges(incidence, numUsers, 1.0, self.hashtagIdf, self.maxHashtagUsers)
+        else:
+            hashtagData = incidenceMinHashEdges(incidence, 1.0, self.hashtagSimilarity, self.lshBands,
+                                                bucketNeighbours=self.lshBucketNeighbours)
+
+        layers = {'hashtags': hashtagData}
+        for relation, (sources, targets) in relationData.items():
+            layers[relation] = (sources, targets, np.ones(len(sources)))
+
+        return names, layers
+
+class EdgeLayers:
+    """
+    The relation layers of the graph as sparse matrices (rows are the sources) with unit weights. They are computed
+    once and combined into the weighted graph for any weights
+    """
+
+    LAYERS: tuple[str, ...] = ('following', 'commentedOn', 'hashtags')
+    # Order in which GraphBuilder.build() sums the layers
+    __SUM_ORDER: tuple[str, ...] = ('hashtags', 'following', 'commentedOn')
+
+    def __init__(self, names: list[str], matrices: dict[str, sp.csr_matrix]):
+        self.names: list[str] = names
+        self.matrices: dict[str, sp.csr_matrix] = matrices
+
+        # The union of the edges of all the layers and the edge of every layer entry, like in sumEdges(). combine()
+        # then only sums the weighted entries
+        layers = [matrices[layer].tocoo() for layer in self.__SUM_ORDER]
+        keys = np.concatenate([layer.row.astype(np.int64) << 32 | layer.col.astype(np.int64) for layer in layers])
+        uniqueKeys, self.__edgeOfEntry = np.unique(keys, return_inverse=True)
+
+        self.__sources: np.ndarray = (uniqueKeys >> 32).astype(np.int32)
+        self.__targets: np.ndarray = (uniqueKeys & 0xFFFFFFFF).astype(np.int32)
+        self.__values: list[np.ndarray] = [layer.data for layer in layers]
+
+    def combine(self, followingWeight: float, commentedWeight: float, hashtagWeight: float) -> WeightedEdges:
+        """
+        :return: Directed edges of the graph with the given weights of the layers, the same edges and weights
+        as GraphBuilder.build() with these weights gives - also the edges of zero-weighted layers
+        """
+        layerWeights = {'hashtags': hashtagWeight, 'following': followingWeight, 'commentedOn': commentedWeight}
+        weights = np.concatenate([values * layerWeights[layer]
+                                  for layer, values in zip(self.__SUM_ORDER, self.__values)])
+        summed = np.bincount(self.__edgeOfEntry, weights=weights, minlength=len(self.__sources))
+
+        return WeightedEdges(self.names, self.__sources, self.__targets, summed)
+
+# State shared by the tasks of a worker process (the graph, the extractor...), set once by initWorker()
+workerState: dict = {}
+
+def initWorker(state: dict) -> None:
+    workerState.update(state)
+
+def mapInWorkers(task, items: list, state: dict, workers: int = 0) -> list:
+    """
+    Runs the task for every item in a pool of processes. The state is handed to every worker once, with the fork start
+    method the workers share its memory with this process instead of getting copies
+    :param task: Module level function taking one item, it reads the state from workerState
+    :param state: Read-only data of the tasks
+    :param workers: Number of worker processes, 0 means one per CPU core and 1 runs the tasks in this process
+    :return: Results of the task in the order of the items
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        initWorker(state)
+        return [task(item) for item in items]
+
+    with multiprocessing.Pool(min(workers, max(len(items), 1)), initializer=initWorker, initargs=(state,)) as pool:
+        return pool.map(task, items, chunksize=1)
+
+def runSweepConfiguration(weights: tuple[float, float, float]) -> dict:
+    """
+    Task of the weight sweep - combines the layers with the weights and partitions the graph
+    :param weights: (followingWeight, commentedWeight, hashtagWeight)
+    :return: Row of the sweep table
+    """
+    extractor: RelationshipExtractor = workerState["extractor"]
+    layers: EdgeLayers = workerState["layers"]
+
+    start = time.perf_counter()
+
+    edges = layers.combine(*weights)
+    if not extractor.directed:
+        edges = edges.undirected()
+
+    graph = edges.toGraph(extractor.directed)
+    membership = extractor.partition(graph)
+
+    seconds = time.perf_counter() - start
+
+    return {
+        "followingWeight": weights[0],
+        "commentedWeight": weights[1],
+        "hashtagWeight": weights[2],
+        "communities": len(set(membership)),
+        "modularity": graph.modularity(membership, weights="weight"),
+        "seconds": seconds,
+    }
+
+def runResolution(resolution: float) -> dict:
+    """
+    Task of the resolution sweep - partitions the shared graph at the resolution
+    :return: Row of the sweep table with the membership under "membership"
+    """
+    graph: ig.Graph = workerState["graph"]
+
+    start = time.perf_counter()
+    partition = leidenalg.find_partition(
+        graph,
+        RESOLUTION_PARTITIONS[workerState["partitionType"]],
+        weights="weight",
+        resolution_parameter=resolution,
+        seed=workerState["seed"],
+    )
+    seconds = time.perf_counter() - start
+
+    return {
+        "resolution": resolution,
+        "communities": len(partition),
+        "quality": partition.quality(),
+        "modularity": graph.modularity(partition.membership, weights="weight"),
+        "seconds": seconds,
+        "membership": partition.membership,
+    }
+
+def runConsensusSeed(seed: int) -> np.ndarray:
+    """
+    Task of the consensus mode - one seeded partitioning of the shared graph
+    :return: Community of every vertex
+    """
+    extractor: RelationshipExtractor = workerState["extractor"]
+    return np.asarray(extractor.partition(workerState["graph"], seed=seed), dtype=np.int32)
+
+def canonicalMembership(membership) -> np.ndarray:
+    """
+    :param membership: Community of every vertex
+    :return: The same partition with the communities numbered by their size (the largest is 0), communities of the
+    same size by their first vertex - the numbers do not depend on the labels the algorithm chose
+    """
+    labels, first, inverse, sizes = np.unique(np.asarray(membership), return_index=True, return_inverse=True,
+                                              return_counts=True)
+    order = np.lexsort((first, -sizes))
+
+    numbers = np.empty(len(labels), dtype=np.int32)
+    numbers[order] = np.arange(len(labels), dtype=np.int32)
+
+    return numbers[inverse]
+
+def labelByNeighbours(pairs: WeightedEdges,
+                      labels: np.ndarray,
+                      maxRounds: int | None = 10,
+                      strongestEdge: bool = False,
+                      ) -> np.ndarray:
+    """
+    Labels the vertices without a label (-1) by the label of the largest weight among their labelled neighbours,
+    the newly labelled vertices label their neighbours in the next round
+    :param pairs: Undirected edges
+    :param labels: Label of every vertex, -1 for the unlabelled ones
+    :param maxRounds: Maximum number of rounds, None runs until no more vertices can be labelled
+    :param strongestEdge: Take the label of the neighbour with the strongest edge instead of summing the weights
+    of the neighbours with the same label
+    :return: The labels, the vertices without labelled neighbours get new labels of their own
+    """
+    labels = labels.copy()
+
+    sources = np.concatenate((pairs.sources, pairs.targets))
+    targets = np.concatenate((pairs.targets, pairs.sources))
+    weights = np.concatenate((pairs.weights, pairs.weights))
+
+    rounds = 0
+    while maxRounds is None or rounds < maxRounds:
+        rounds += 1
+
+        voting = (labels[sources] < 0) & (labels[targets] >= 0)
+        if not voting.any():
+            break
+
+        if strongestEdge:
+            vertices, votedLabels, votes = sources[voting], labels[targets[voting]], weights[voting]
+        else:
+            vertices, votedLabels, votes = sumEdges(sources[voting], labels[targets[voting]], weights[voting])
+
+        # The first item of every vertex after sorting by the votes (ties go to the smaller label)
+        order = np.lexsort((votedLabels, -votes, vertices))
+        first = order[np.r_[True, vertices[order][1:] != vertices[order][:-1]]]
+        labels[vertices[first]] = votedLabels[first]
+
+    unlabelled = np.flatnonzero(labels < 0)
+    labels[unlabelled] = labels.max(initial=-1) + 1 + np.arange(len(unlabelled))
+
+    return labels
+
+def matchCommunities(previous: np.ndarray, membership: np.ndarray, previousIds: list[int]) -> np.ndarray:
+    """
+    Gives the communities of the membership the ids of the previous communities they overlap the most with,
+    every previous id is used at most once (the largest overlaps are matched first). The other communities get
+    new ids after the largest previous one
+    :param previous: Previous community (index into previousIds) of every vertex, -1 for the new vertices
+    :param membership: Current community of every vertex
+    :param previousIds: Ids of the previous communities
+    :return: Id of the community of every vertex
+    """
+    numCommunities = int(membership.max(initial=-1)) + 1
+    known = previous >= 0
+
+    current, old, overlaps = sumEdges(membership[known], previous[known], np.ones(int(known.sum())))
+
+    ids = np.full(numCommunities, -1, dtype=np.int64)
+    usedOld = np.zeros(len(previousIds), dtype=bool)
+    for index in np.argsort(-overlaps, kind="stable").tolist():
+        if ids[current[index]] < 0 and not usedOld[old[index]]:
+            ids[current[index]] = previousIds[old[index]]
+            usedOld[old[index]] = True
+
+    unmatched = np.flatnonzero(ids < 0)
+    ids[unmatched] = max(previousIds, default=-1) + 1 + np.arange(len(unmatched))
+
+    return ids[membership]
+
+def communitySubgraphs(edges: WeightedEdges,
+                       labels: np.ndarray,
+                       communities: list[int],
+                       ) -> list[tuple[np.ndarray, WeightedEdges]]:
+    """
+    Splits the graph into the subgraphs induced by the members of the communities. The vertices and the edges are
+    grouped by their communities once, so the edge list is not scanned again for every community
+    :param edges: Edges of the graph
+    :param labels: Community of every vertex
+    :param communities: Communities whose subgraphs are created
+    :return: Vertices (in increasing order) and the subgraph of every community
+    """
+    # Index of the community in communities for every vertex, -1 for the other vertices
+    positions = np.full(int(labels.max(initial=-1)) + 1, -1, dtype=np.int64)
+    positions[communities] = np.arange(len(communities))
+    vertexPositions = positions[labels]
+
+    vertices = np.flatnonzero(vertexPositions >= 0)
+    vertices = vertices[np.argsort(vertexPositions[vertices], kind="stable")]
+    vertexBounds = np.searchsorted(vertexPositions[vertices], np.arange(len(communities) + 1))
+
+    # Index of every vertex inside the subgraph of its community
+    localIndices = np.zeros(len(labels), dtype=np.int64)
+    localIndices[vertices] = np.arange(len(vertices)) - vertexBounds[vertexPositions[vertices]]
+
+    edgePositions = vertexPositions[edges.sources]
+    inside = np.flatnonzero((edgePositions >= 0) & (labels[edges.sources] == labels[edges.targets]))
+    inside = inside[np.argsort(edgePositions[inside], kind="stable")]
+    edgeBounds = np.searchsorted(edgePositions[inside], np.arange(len(communities) + 1))
+
+    subgraphs = []
+    for index in range(len(communities)):
+        members = vertices[vertexBounds[index]:vertexBounds[index + 1]]
+        memberEdges = inside[edgeBounds[index]:edgeBounds[index + 1]]
+
+        subgraphs.append((members, WeightedEdges(
+            [edges.names[vertex] for vertex in members.tolist()],
+            localIndices[edges.sources[memberEdges]].astype(np.int32),
+            localIndices[edges.targets[memberEdges]].astype(np.int32),
+            edges.weights[memberEdges],
+        )))
+
+    return subgraphs
+
+def runSubcommunities(subgraph: WeightedEdges) -> np.ndarray:
+    """
+    Task of the hierarchical mode - partitions the subgraph induced by the members of a community
+    :return: Subcommunity of every member (in the order of the vertices of the subgraph)
+    """
+    extractor: RelationshipExtractor = workerState["extractor"]
+
+    return canonicalMembership(extractor.partition(subgraph.toGraph(extractor.directed), seed=workerState["seed"]))
+
+def formatSweep(results: list[dict]) -> str:
+    """
+    :param results: Rows of a sweep, e.g. from RelationshipExtractor.sweepWeights(), lists in them are left out
+    :return: The rows as a text table
+    """
+    if len(results) == 0:
+        return ""
+
+    columns = [column for column, value in results[0].items() if not isinstance(value, list)]
+    widths = [max(len(column), 10) for column in columns]
+
+    def cell(value) -> str:
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.4g}"
+        return str(value)
+
+    lines = [" ".join(f"{column:>{width}}" for column, width in zip(columns, widths))]
+    for row in results:
+        lines.append(" ".join(f"{cell(row[column]):>{width}}" for column, width in zip(columns, widths)))
+
+    return "\n".join(lines)
+
+class RelationshipExtractor:
+    """
+    Base of the extractors - the graph is built by GraphBuilder (the constructor takes its parameters)
+    and the extractors differ only in partition()
+    """
+
+    # Louvain works on the undirected graph
+    directed: bool = True
+
+    def __init__(self, *args, graphCache=None, pruneCore: int | None = None, **kwargs):
+        """
+        :param graphCache: GraphCache from graphCache.py, the built graphs are stored in it and reused
+        while the data file and the parameters stay the same
+        :param pruneCore: extract() partitions only the pruneCore-core of the graph (vertices with at least pruneCore
+        neighbours inside it), the other vertices join the community of their strongest neighbour
+        """
+        if pruneCore is not None and pruneCore < 1:
+            raise ValueError("pruneCore has to be at least 1")
+
+        self.builder: GraphBuilder = GraphBuilder(*args, **kwargs)
+        self.graphCache = graphCache
+        self.pruneCore: int | None = pruneCore
+        # Sizes of the graph before and after the pruning of the last extract() and the seconds the pruning took
+        self.pruningReport: dict | None = None
+        # Directed edges of the graph the last extraction worked with
+        self.lastGraph: WeightedEdges | None = None
+
+    def extract(self, data: dict, dataFile: str | None = None) -> tuple[ dict[str, int], set[tuple[str, str]] ]:
+        """
+        :param data: User data
+        :param dataFile: File the data was loaded from, the graph is taken from the graphCache if it has one
+        :return: Community of every user and the set of the (directed) edges of the graph as pairs of the users
+        """
+        edges = self.buildGraph(data, dataFile)
+
+        graphEdges = edges if self.directed else edges.undirected()
+        if self.pruneCore is None:
+            membership = self.partition(graphEdges.toGraph(self.directed))
+        else:
+            membership = self.__partitionPruned(graphEdges).tolist()
+
+        usersByCommunity: dict[str, int] = dict(zip(edges.names, membership))
+        connections: set[tuple[str, str]] = edges.namedPairs()
 
         return usersByCommunity, connections
 
-    def __preprocessHashtags(self) -> dict[str, set[str]]:
-        hashtagDict = defaultdict(set)
-        for user, info in self.__providedData.items():
-            for tag in info.get('hashtags', []):
-                hashtagDict[tag].add(user)
+    def buildGraph(self, data: Mapping, dataFile: str | None = None) -> WeightedEdges:
+        """
+        :param data: User data
+        :param dataFile: File the data was loaded from
+        :return: Directed edges of the graph, from the graphCache if possible
+        """
+        if self.graphCache is None or dataFile is None or not os.path.exists(dataFile):
+            self.lastGraph = self.builder.build(data)
+        else:
+            self.lastGraph = self.graphCache.getOrBuild(dataFile, data, self.builder)
 
-        return dict(hashtagDict)
+        return self.lastGraph
 
-    def __weighData(self) -> dict[tuple[str, str], float]:
-        edgeWeights = defaultdict(float)
+    def __partitionPruned(self, edges: WeightedEdges) -> np.ndarray:
+        """
+        Partitions the pruneCore-core of the graph, the pruned vertices take the community of their strongest neighbour
+        (round by round, so the trees hanging from the core are labelled from the core outwards). The components
+        of the graph outside of the core become communities of their own
+        :param edges: Edges of the graph in the form partition() works with
+        :return: Community of every vertex
+        """
+        start = time.perf_counter()
 
-        for user, info in self.__providedData.items():
+        pairs = edges.undirected()
+        skeleton = ig.Graph(n=edges.numVertices, edges=np.column_stack((pairs.sources, pairs.targets)))
+        kept = np.asarray(skeleton.coreness()) >= self.pruneCore
 
-            for followed in info.get('following', []):
+        keptEdges = kept[edges.sources] & kept[edges.targets]
+        newIndices = np.cumsum(kept) - 1
+        core = WeightedEdges(
+            [name for name, isKept in zip(edges.names, kept.tolist()) if isKept],
+            newIndices[edges.sources[keptEdges]].astype(np.int32),
+            newIndices[edges.targets[keptEdges]].astype(np.int32),
+            edges.weights[keptEdges],
+        )
+        pruningSeconds = time.perf_counter() - start
+
+        coreMembership = self.partition(core.toGraph(self.directed))
 
-                edgeWeights[(user, followed)] += self.__followingWeight
+        start = time.perf_counter()
+        labels = np.full(edges.numVertices, -1, dtype=np.int64)
+        labels[kept] = coreMembership
 
-            for commentedOn in info.get('commentedOn', []):
-                edgeWeights[(user, commentedOn)] += self.__commentedWeight
+        # Components without any vertex of the core cannot reach its communities, each becomes a community
+        components = np.asarray(skeleton.connected_components().membership)
+        outside = (np.bincount(components, weights=kept) == 0)[components]
+        labels[outside] = labels.max(initial=-1) + 1 + np.unique(components[outside], return_inverse=True)[1]
 
-            userHashtags = set(info.get('hashtags', []))
+        membership = labelByNeighbours(pairs, labels, maxRounds=None, strongestEdge=True)
 
-            for hashtag in userHashtags:
-                for otherUser in self.__hashtagUsers[hashtag]:
-                    if user == otherUser:
-                        continue
-                    edgeWeights[(user, otherUser)] += self.__hashtagWeight
+        self.pruningReport = {
+            "vertices": edges.numVertices,
+            "keptVertices": core.numVertices,
+            "edges": edges.numEdges,
+            "keptEdges": core.numEdges,
+            "seconds": pruningSeconds + time.perf_counter() - start,
+        }
 
-        return edgeWeights
+        return membership
 
-    def __createGraph(self, weightedEdges: dict[tuple[str, str], float]) -> ig.Graph:
+    def extractHierarchy(self,
+                         data: Mapping,
+                         maxSize: int,
+                         workers: int = 0,
+                         dataFile: str | None = None,
+                         maxDepth: int = 8,
+                         seed: int | None = None,
+                         ) -> tuple[ dict[str, int], set[tuple[str, str]], dict[int, int | None] ]:
         """
-        :returns: an undirected graph where the weight of edges is the sum of their directions weights
+        Hierarchical communities - the graph is partitioned and every community with more than maxSize members
+        is partitioned again as its own subgraph, level by level. The subgraphs of one level are created in one pass
+        over the edges (communitySubgraphs()) and partitioned in a pool of processes
+        :param data: User data
+        :param maxSize: Communities with more members are split
+        :param workers: Number of worker processes, 0 means one per CPU core
+        :param dataFile: File the data was loaded from, the graph is taken from the graphCache if it has one
+        :param maxDepth: Maximum number of levels below the top communities
+        :param seed: Seed of the partitioning
+        :return: Leaf community of every user, the set of the (directed) edges of the graph as pairs of the users
+        and the parent of every community of the tree (None for the top communities). The children have larger ids
+        than their parents
         """
+        edges = self.buildGraph(data, dataFile)
+        graphEdges = edges if self.directed else edges.undirected()
 
-        graph = ig.Graph(directed=True)
+        labels = canonicalMembership(self.partition(graphEdges.toGraph(self.directed), seed=seed)).astype(np.int64)
+        parents: dict[int, int | None] = {community: None for community in range(int(labels.max(initial=-1)) + 1)}
+        # Leaves which have not been tried to split yet
+        splittable = set(parents)
 
-        nodes = set(self.__providedData.keys())
-        for u1, u2 in weightedEdges.keys():
-            nodes.update([u1, u2])
-        graph.add_vertices(list(nodes))
+        for _ in range(maxDepth):
+            sizes = np.bincount(labels, minlength=len(parents))
+            large = [community for community in sorted(splittable) if sizes[community] > maxSize]
+            if len(large) == 0:
+                break
 
-        edges = list(weightedEdges.keys())
-        weights = list(weightedEdges.values())
-        graph.add_edges(edges)
-        graph.es["weight"] = weights
+            subgraphs = communitySubgraphs(graphEdges, labels, large)
+            state = {"extractor": self, "seed": seed}
+            subcommunities = mapInWorkers(runSubcommunities, [subgraph for _, subgraph in subgraphs], state, workers)
 
-        graph = graph.as_undirected(combine_edges="sum")
+            labels = labels.copy()
+            for community, (members, _), membership in zip(large, subgraphs, subcommunities):
+                splittable.discard(community)
+                if membership.max(initial=0) == 0:
+                    # The community does not split any more
+                    continue
+
+                firstId = len(parents)
+                labels[members] = firstId + membership
+                for child in range(firstId, firstId + int(membership.max()) + 1):
+                    parents[child] = community
+                    splittable.add(child)
+
+        usersByCommunity: dict[str, int] = dict(zip(edges.names, labels.tolist()))
+
+        return usersByCommunity, edges.namedPairs(), parents
+
+    def extractConsensus(self,
+                         data: Mapping,
+                         runs: int,
+                         workers: int = 0,
+                         dataFile: str | None = None,
+                         seed: int = 0,
+                         threshold: float = 0.0,
+                         maxIterations: int = 10,
+                         ) -> tuple[ dict[str, int], set[tuple[str, str]], dict[str, float] ]:
+        """
+        Consensus clustering of more partitionings (Lancichinetti and Fortunato) - the graph is partitioned with
+        the seeds seed, seed + 1, ... in a pool of processes and every edge of the graph gets the share of the runs
+        in which its users ended up together. When the runs agree on every edge (the shares are 0 or 1), their
+        partition is the result. Otherwise the co-assignment graph - the edges weighted by their weight times
+        the share - is partitioned by the same runs again, until the runs agree or maxIterations is reached, then
+        the last co-assignment graph is partitioned once more. The communities are numbered by their size,
+        so the same data gives the same numbers
+        :param data: User data
+        :param runs: Number of the seeded partitionings
+        :param workers: Number of worker processes, 0 means one per CPU core
+        :param dataFile: File the data was loaded from, the graph is taken from the graphCache if it has one
+        :param threshold: Edges whose users were together in at most this share of the runs are left out
+        :param maxIterations: Maximum number of the rounds of the runs on the co-assignment graphs
+        :return: Community of every user, the set of the (directed) edges of the graph as pairs of the users
+        and the confidence of every user - the share of the runs on the graph agreeing with the final community
+        of the user over its edges, weighted by the edge weights (1 for the users without edges)
+        """
+        edges = self.buildGraph(data, dataFile)
+        graphEdges = edges if self.directed else edges.undirected()
+        graph = graphEdges.toGraph(self.directed)
+        seeds = list(range(seed, seed + runs))
+
+        pairs = edges.undirected()
+        kept = np.ones(pairs.numEdges, dtype=bool)
+        firstTogether: np.ndarray | None = None
+        membership: np.ndarray | None = None
+
+        for _ in range(maxIterations + 1):
+            memberships = mapInWorkers(runConsensusSeed, seeds, {"extractor": self, "graph": graph}, workers)
+
+            together = np.zeros(pairs.numEdges)
+            for runMembership in memberships:
+                together += runMembership[pairs.sources] == runMembership[pairs.targets]
+            together /= runs
+
+            if firstTogether is None:
+                firstTogether = together
+
+            # Unanimous runs, every edge is either always inside a community or always between two
+            if np.all((together[kept] == 0) | (together[kept] == 1)):
+                membership = canonicalMembership(memberships[0])
+                break
+
+            kept &= together > threshold
+            graph = WeightedEdges(
+                edges.names, pairs.sources[kept], pairs.targets[kept], (pairs.weights * together)[kept]
+            ).toGraph(directed=False)
+
+        if membership is None:
+            membership = canonicalMembership(self.partition(graph, seed=seed))
+
+        # Agreement of an edge with the final partition - its users are together in the runs as often as in the end
+        agreement = np.where(membership[pairs.sources] == membership[pairs.targets], firstTogether, 1 - firstTogether)
+        agreeing = (np.bincount(pairs.sources, pairs.weights * agreement, minlength=edges.numVertices)
+                    + np.bincount(pairs.targets, pairs.weights * agreement, minlength=edges.numVertices))
+        total = (np.bincount(pairs.sources, pairs.weights, minlength=edges.numVertices)
+                 + np.bincount(pairs.targets, pairs.weights, minlength=edges.numVertices))
+        confidence = np.divide(agreeing, total, out=np.ones(edges.numVertices), where=total > 0)
+
+        usersByCommunity: dict[str, int] = dict(zip(edges.names, membership.tolist()))
+        confidenceByUser: dict[str, float] = dict(zip(edges.names, confidence.tolist()))
+
+        return usersByCommunity, edges.namedPairs(), confidenceByUser
+
+    def sweepWeights(self,
+                     data: Mapping,
+                     weightGrid: list[tuple[float, float, float]],
+                     workers: int = 0,
+                     ) -> list[dict]:
+        """
+        Partitions the graph for every weight triple. The relation layers are built once (EdgeLayers) and every
+        weighted graph is their linear combination, the configurations run in a pool of processes
+        :param data: User data
+        :param weightGrid: Triples (followingWeight, commentedWeight, hashtagWeight)
+        :param workers: Number of worker processes, 0 means one per CPU core
+        :return: Row for every triple - the weights, number of communities, modularity and seconds it took
+        """
+        layers = self.builder.buildLayers(data)
+
+        return mapInWorkers(runSweepConfiguration, weightGrid, {"extractor": self, "layers": layers}, workers)
+
+    def partition(self, graph: ig.Graph, seed: int | None = None) -> list[int]:
+        """
+        :param graph: Weighted graph with the edge attribute "weight"
+        :param seed: Seed of the algorithm, the same seed gives the same partition of the same graph
+        :return: Community of every vertex
+        """
+        raise NotImplementedError("Abstract method")
+
+class LeidenExtractor(RelationshipExtractor):
+
+    def partition(self, graph: ig.Graph, seed: int | None = None) -> list[int]:
+        partition = leidenalg.find_partition(
+            graph,
+            leidenalg.ModularityVertexPartition,
+            weights=graph.es["weight"],
+            seed=seed,
+        )
+
+        return partition.membership
+
+    def extractIncremental(self,
+                           data: Mapping,
+                           previousCommunities: Mapping,
+                           dataFile: str | None = None,
+                           radius: int | None = 1,
+                           seed: int | None = None,
+                           ) -> tuple[ dict[str, int], set[tuple[str, str]] ]:
+        """
+        Updates the communities of an earlier run instead of partitioning the graph from scratch. The users keep their
+        previous communities, the new users join the community of the largest weight among their neighbours and then
+        only the vertices near the new users are moved. The communities keep their previous ids (see
+        matchCommunities()), so the output can replace the previous community file
+        :param data: User data
+        :param previousCommunities: Community file (or snapshot) of an earlier run over a part of the data, its keys
+        are the integer community ids
+        :param dataFile: File the data was loaded from, the graph is taken from the graphCache if it has one
+        :param radius: Only the new users and the users at most radius edges from them are moved, None moves all
+        :param seed: Seed of the optimisation
+        :return: Community of every user and the set of the (directed) edges of the graph as pairs of the users
+        """
+        previousIds: list[int] = []
+        for community in previousCommunities:
+            try:
+                previousIds.append(int(community))
+            except (TypeError, ValueError):
+                raise ValueError(f'The previous communities must have integer ids, got {community!r}') from None
+
+        edges = self.buildGraph(data, dataFile)
+        pairs = edges.undirected()
+        vertexIds = {name: i for i, name in enumerate(edges.names)}
+
+        previous = np.full(edges.numVertices, -1, dtype=np.int64)
+        for index, community in enumerate(previousCommunities):
+            # The split communities of a hierarchical file contain the members of their children
+            if len(previousCommunities[community].get("children", [])) > 0:
+                continue
+
+            members = [vertexIds[user] for user in previousCommunities[community]["members"] if user in vertexIds]
+            previous[members] = index
+
+        # Leiden requires the labels of the initial membership to be smaller than the number of the vertices
+        initial = np.unique(labelByNeighbours(pairs, previous), return_inverse=True)[1]
+
+        if radius is None:
+            fixed = np.zeros(edges.numVertices, dtype=bool)
+        else:
+            moving = previous < 0
+            for _ in range(radius):
+                reached = moving.copy()
+                moving[pairs.targets[reached[pairs.sources]]] = True
+                moving[pairs.sources[reached[pairs.targets]]] = True
+            fixed = ~moving
+
+        graph = edges.toGraph(self.directed)
+        partition = leidenalg.ModularityVertexPartition(graph, initial_membership=initial.tolist(), weights="weight")
+
+        optimiser = leidenalg.Optimiser()
+        if seed is not None:
+            optimiser.set_rng_seed(seed)
+        optimiser.optimise_partition(partition, n_iterations=2, is_membership_fixed=fixed.tolist())
+
+        membership = np.unique(np.asarray(partition.membership), return_inverse=True)[1]
+        communityIds = matchCommunities(previous, membership, previousIds)
+
+        usersByCommunity: dict[str, int] = dict(zip(edges.names, communityIds.tolist()))
+
+        return usersByCommunity, edges.namedPairs()
+
+    def sweepResolutions(self,
+                         data: Mapping,
+                         resolutions: list[float],
+                         partitionType: str = "RBConfiguration",
+                         workers: int = 0,
+                         dataFile: str | None = None,
+                         seed: int = 0,
+                         ) -> list[dict]:
+        """
+        Partitions the graph at every resolution, the resolutions run in a pool of processes sharing the graph.
+        Higher resolutions give more and smaller communities
+        :param data: User data
+        :param resolutions: Values of the resolution parameter
+        :param partitionType: "RBConfiguration" (modularity with a resolution) or "CPM" (constant Potts model,
+        the resolution is the required density of the communities)
+        :param workers: Number of worker processes, 0 means one per CPU core
+        :param dataFile: File the data was loaded from, the graph is taken from the graphCache if it has one
+        :param seed: Seed of the partitioning
+        :return: Row for every resolution in increasing order - the resolution, number of communities, quality of the
+        partition, its modularity, seconds it took, the stability (normalized mutual information with the partition
+        at the previous resolution) and the membership of the vertices under "membership"
+        """
+        if partitionType not in RESOLUTION_PARTITIONS:
+            raise ValueError(f"Unknown partition type {partitionType}, use one of {', '.join(RESOLUTION_PARTITIONS)}")
+
+        graph = self.buildGraph(data, dataFile).toGraph(self.directed)
+        state = {"graph": graph, "partitionType": partitionType, "seed": seed}
+
+        results = mapInWorkers(runResolution, sorted(resolutions), state, workers)
+
+        previous = None
+        for row in results:
+            membership = row.pop("membership")
+            row["stability"] = None if previous is None else ig.compare_communities(previous, membership, method="nmi")
+            row["membership"] = membership
+            previous = membership
+
+        return results
+
+class LouvainExtractor(RelationshipExtractor):
+    directed: bool = False
+
+    def partition(self, graph: ig.Graph, seed: int | None = None) -> list[int]:
+        """
+        :param graph: Undirected graph where the weight of edges is the sum of their directions weights
+        :param seed: Seed of the random generator igraph uses (the random module)
+        """
+        if seed is not None:
+            random.seed(seed)
 
-        return graph
\ No newline at end of file
+        return graph.community_multilevel(weights="weight").membership
\ No newline at end of file
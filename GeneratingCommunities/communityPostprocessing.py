@@ -0,0 +1,216 @@
+#############################################################################
+# Turning the partition of the user graph into the data of a community file #
+#############################################################################
+
+import json
+from collections.abc import Mapping
+
+import numpy as np
+import scipy.sparse as sp
+
+from GeneratingCommunities.snapshot import UserSnapshot
+from GeneratingCommunities.userGraph import UserGraph
+from RelationshipExtractor import RelationshipExtractor, WeightedEdges, sumEdges
+
+def extractCommunities(extractor: RelationshipExtractor,
+                       data: Mapping,
+                       dataFile: str | None = None,
+                       consensusRuns: int = 0,
+                       hierarchyMaxSize: int | None = None,
+                       previousCommunities: Mapping | None = None,
+                       ) -> tuple[ dict[str, int], WeightedEdges, dict[str, float], dict[int, int | None] ]:
+    """
+    Runs the extraction mode chosen in a community generation script
+    :param extractor: Extractor partitioning the graph
+    :param data: User data
+    :param dataFile: File the data was loaded from, the graph is taken from the graphCache of the extractor if it has one
+    :param consensusRuns: Number of the seeded runs of the consensus mode, 0 partitions the graph once
+    :param hierarchyMaxSize: Communities with more members are split into a tree, None keeps them flat
+    :param previousCommunities: Communities of the previous run to update (incremental mode, Leiden only)
+    :return: Community of every user, directed edges of the graph, confidence of every user (only in the consensus
+    mode) and the parents of the communities of the tree (only in the hierarchical mode)
+    """
+    confidence: dict[str, float] = dict()
+    parents: dict[int, int | None] = dict()
+
+    # Only extract() partitions the pruned graph
+    if extractor.pruneCore is not None and \
+            (previousCommunities is not None or hierarchyMaxSize is not None or consensusRuns > 0):
+        raise ValueError("pruneCore can't be combined with the incremental, hierarchical or consensus mode")
+
+    if previousCommunities is not None:
+        usersByCommunity, _ = extractor.extractIncremental(data, previousCommunities, dataFile=dataFile)
+    elif hierarchyMaxSize is not None:
+        usersByCommunity, _, parents = extractor.extractHierarchy(data, hierarchyMaxSize, dataFile=dataFile)
+    elif consensusRuns > 0:
+        usersByCommunity, _, confidence = extractor.extractConsensus(data, consensusRuns, dataFile=dataFile)
+    else:
+        usersByCommunity, _ = extractor.extract(data, dataFile=dataFile)
+
+    return usersByCommunity, extractor.lastGraph, confidence, parents
+
+def connectionCounts(membership: np.ndarray, edges: WeightedEdges, numCommunities: int) -> sp.csr_matrix:
+    """
+    :param membership: Community (0 ... numCommunities - 1) of every vertex of the edges
+    :param edges: Directed edges of the graph
+    :return: Symmetric matrix with the number of the edges between every two different communities, an edge counts
+    for both of its communities whatever its direction is (quotient graph of the partition)
+    """
+    sources = membership[edges.sources]
+    targets = membership[edges.targets]
+    between = sources != targets
+
+    counts = sp.coo_matrix(
+        (np.ones(int(between.sum()), dtype=np.int64), (sources[between], targets[between])),
+        shape=(numCommunities, numCommunities),
+    ).tocsr()
+
+    return (counts + counts.T).tocsr()
+
+def aggregateUsers(data: Mapping,
+                   communityIndex: Mapping[str, int],
+                   numCommunities: int,
+                   ) -> tuple[ list[set[str]], list[set[str]] ]:
+    """
+    Collects the hashtags and the texts of the comments of the users of every community in one pass over the data
+    :param data: User data, a UserSnapshot or a UserGraph with the comment texts
+    :param communityIndex: Community (0 ... numCommunities - 1) of every user
+    :return: Hashtags and comments of every community
+    """
+    if isinstance(data, UserSnapshot):
+        return aggregateGraphUsers(data.graph, communityIndex, numCommunities)
+    if isinstance(data, UserGraph):
+        return aggregateGraphUsers(data, communityIndex, numCommunities)
+
+    hashtags: list[set[str]] = [set() for _ in range(numCommunities)]
+    comments: list[set[str]] = [set() for _ in range(numCommunities)]
+
+    for user in data:
+        index = communityIndex[user]
+        info = data[user]
+
+        hashtags[index].update(info["hashtags"])
+        comments[index].update(comment["text"] for comment in info["commentsPosted"])
+
+    return hashtags, comments
+
+def aggregateGraphUsers(graph: UserGraph,
+                        communityIndex: Mapping[str, int],
+                        numCommunities: int,
+                        ) -> tuple[ list[set[str]], list[set[str]] ]:
+    """
+    aggregateUsers() reading the arrays of the user graph, so no user is decoded as a whole
+    """
+    names = graph.users.toList()
+
+    # Community of every user of the graph, -1 for the users which are not in the data
+    communities = np.full(graph.numUsers, -1, dtype=np.int64)
+    for userId in np.flatnonzero(graph.inData).tolist():
+        communities[userId] = communityIndex[names[userId]]
+
+    hashtags: list[set[str]] = [set() for _ in range(numCommunities)]
+    users, tags = graph.edges("hashtags")
+    known = communities[users] >= 0
+    # Every (community, hashtag) pair once
+    tagCommunities, tagIds, _ = sumEdges(communities[users][known], tags[known], np.ones(int(known.sum())))
+    tagNames = graph.hashtags.toList()
+    for community, tag in zip(tagCommunities.tolist(), tagIds.tolist()):
+        hashtags[community].add(tagNames[tag])
+
+    comments: list[set[str]] = [set() for _ in range(numCommunities)]
+    authors, texts = graph.postedCommentTexts()
+    for community, text in zip(communities[authors].tolist(), texts):
+        if community >= 0:
+            comments[community].add(text)
+
+    return hashtags, comments
+
+def buildCommunities(data: Mapping,
+                     usersByCommunity: Mapping[str, int],
+                     edges: WeightedEdges,
+                     confidence: Mapping[str, float] | None = None,
+                     parents: dict[int, int | None] | None = None,
+                     ) -> dict[str, dict]:
+    """
+    Creates the data of a community file
+    :param data: User data
+    :param usersByCommunity: Community of every user (vertex) of the edges
+    :param edges: Directed edges of the graph, every edge between two communities is counted in their connections
+    :param confidence: Confidence of every user from the consensus mode, stored under "confidence" when given
+    :param parents: Tree of the hierarchical mode, see addCommunityTree()
+    :return: Communities {id: {"members", "connections", "hashtags", "comments"}} in the order of their first users
+    """
+    labels = np.fromiter((usersByCommunity[name] for name in edges.names), dtype=np.int64, count=edges.numVertices)
+    communityLabels, first, membership = np.unique(labels, return_index=True, return_inverse=True)
+    numCommunities = len(communityLabels)
+    communityIds = [str(label) for label in communityLabels.tolist()]
+
+    # Vertices grouped by their communities
+    byCommunity = np.argsort(membership, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(membership, minlength=numCommunities))))
+
+    counts = connectionCounts(membership, edges, numCommunities)
+    hashtags, comments = aggregateUsers(data, dict(zip(edges.names, membership.tolist())), numCommunities)
+
+    communities: dict[str, dict] = dict()
+    for index in np.argsort(first).tolist():
+        members = [edges.names[vertex] for vertex in byCommunity[bounds[index]:bounds[index + 1]].tolist()]
+        members = [member for member in members if member != ""]
+        if len(members) == 0:
+            continue
+
+        row = slice(counts.indptr[index], counts.indptr[index + 1])
+        communities[communityIds[index]] = {
+            "members": members,
+            "connections": dict(zip([communityIds[other] for other in counts.indices[row].tolist()],
+                                    counts.data[row].tolist())),
+            "hashtags": list(hashtags[index]),
+            "comments": list(comments[index]),
+        }
+
+        if confidence:
+            communities[communityIds[index]]["confidence"] = {member: confidence[member] for member in members}
+
+    if parents:
+        addCommunityTree(communities, parents)
+
+    return communities
+
+def addCommunityTree(communities: dict[str, dict], parents: dict[int, int | None]) -> None:
+    """
+    Adds the tree of the hierarchical mode into the communities of a community file. Every community gets "parent"
+    (None for the top ones) and "children", the communities which were split are added with the members,
+    hashtags and comments of their children. The connections are counted only between the leaves
+    :param communities: Leaf communities {id: {"members", "connections", "hashtags", "comments"}}
+    :param parents: Parent of every community of the tree from RelationshipExtractor.extractHierarchy()
+    """
+    children: dict[int, list[int]] = {community: [] for community in parents}
+    for community, parent in parents.items():
+        if parent is not None:
+            children[parent].append(community)
+
+    # The children have larger ids than their parents, so they are complete before their parents
+    for community in sorted(parents, reverse=True):
+        info = communities.get(str(community))
+        if info is None:
+            childInfos = [communities[str(child)] for child in children[community] if str(child) in communities]
+            info = communities[str(community)] = {
+                "members": [member for child in childInfos for member in child["members"]],
+                "connections": dict(),
+                "hashtags": list({tag for child in childInfos for tag in child["hashtags"]}),
+                "comments": list({comment for child in childInfos for comment in child["comments"]}),
+            }
+
+        info["parent"] = None if parents[community] is None else str(parents[community])
+        info["children"] = [str(child) for child in children[community]]
+
+def formatPruningReport(report: dict) -> str:
+    """
+    :param report: pruningReport of an extractor
+    """
+    return (f"Pruning kept {report['keptVertices']} of {report['vertices']} users and {report['keptEdges']} of "
+            f"{report['edges']} edges, it took {report['seconds']} seconds")
+
+def saveCommunities(communities: dict[str, dict], filename: str) -> None:
+    with open(filename, "w") as file:
+        json.dump(communities, file, indent=3)
@@ -1,25 +1,81 @@
-import json
+import os
+import sys
+
+# DataParser and its storages live in "Data gathering", which can't be imported as a package
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data gathering"))
+# The scripts import RelationshipExtractor as a sibling, also when run as python -m GeneratingCommunities.<script>
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sourceManifest import SourceManifest
+from sqliteStorage import SqliteStorage
+
+from GeneratingCommunities.snapshot import loadCommunityData, loadUserData
+from GeneratingCommunities.userGraph import UserGraph
 
 DATA_SOURCE = ".json"
 def getData():
+    """
+    Loads the user data. If DATA_SOURCE is a snapshot (see snapshot.py), it is only memory-mapped
+    and the users are decoded when accessed
+    """
     try:
-        with open(DATA_SOURCE, "r", encoding='utf-8') as file:
-            return json.load(file)
+        return loadUserData(DATA_SOURCE)
     except:
         raise RuntimeError("Data source is wrong")
 
+DATABASE_SOURCE = ".db"
+def getDatabase() -> SqliteStorage:
+    """
+    Opens the SQLite storage created by DataParser. It can be used in place of getData(), the users are read
+    from the database only when accessed
+    """
+    if not os.path.exists(DATABASE_SOURCE):
+        raise RuntimeError("Database source is wrong")
+
+    return SqliteStorage(DATABASE_SOURCE)
+
 LOUVAIN_DATA_SOURCE = ".json"
 def getLouvainData():
     try:
-        with open(LOUVAIN_DATA_SOURCE, "r", encoding='utf-8') as file:
-            return json.load(file)
+        return loadCommunityData(LOUVAIN_DATA_SOURCE)
     except:
         raise RuntimeError("Louvain data source is wrong")
 
 LEIDEN_DATA_SOURCE = ".json"
 def getLeidenData():
     try:
-        with open(LEIDEN_DATA_SOURCE, "r", encoding='utf-8') as file:
-            return json.load(file)
+        return loadCommunityData(LEIDEN_DATA_SOURCE)
     except:
-        raise RuntimeError("Leiden data source is wrong")
\ No newline at end of file
+        raise RuntimeError("Leiden data source is wrong")
+
+USER_GRAPH_SOURCE = ".npz"
+def getUserGraph() -> UserGraph:
+    """
+    Loads the array representation of the user data created by userGraphGeneration.py
+    """
+    try:
+        return UserGraph.load(USER_GRAPH_SOURCE)
+    except (FileNotFoundError, KeyError, ValueError):
+        raise RuntimeError("User graph source is wrong")
+
+def getGraphData():
+    """
+    Loads the data the extractors build the graph from - the UserGraph of USER_GRAPH_SOURCE when it was generated
+    after the last change of DATA_SOURCE, the user data of getData() otherwise. Both give the same graph, the
+    UserGraph is only faster to load and much smaller in memory
+    :return: Data and the file it was loaded from, for the key of the graph cache
+    """
+    if os.path.exists(USER_GRAPH_SOURCE) and os.path.exists(DATA_SOURCE) \
+            and os.path.getmtime(USER_GRAPH_SOURCE) >= os.path.getmtime(DATA_SOURCE):
+        return getUserGraph(), USER_GRAPH_SOURCE
+
+    return getData(), DATA_SOURCE
+
+GRAPH_CACHE_SOURCE = ".graphCache"
+def getGraphCache():
+    """
+    Opens the directory with the cached graphs of the extractors (see graphCache.py), it is created if needed
+    """
+    from GeneratingCommunities.graphCache import GraphCache
+
+    return GraphCache(GRAPH_CACHE_SOURCE, SourceManifest(f"{GRAPH_CACHE_SOURCE}/sources.manifest"))
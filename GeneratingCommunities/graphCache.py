@@ -0,0 +1,129 @@
+###################################################################
+# Persistent cache of the weighted graphs built by the extractors #
+###################################################################
+
+import hashlib
+import json
+import os
+
+from GeneratingCommunities.snapshot import SnapshotFile, stringArrays, writeSnapshot
+from RelationshipExtractor import GraphBuilder, WeightedEdges
+
+# Changes whenever the built graphs would differ for the same data and parameters
+GRAPH_CACHE_VERSION: int = 1
+GRAPH_KIND: str = "graph"
+
+class GraphCache:
+    """
+    Directory of built graphs (vertex names, edge arrays and weights as memory-mapped snapshots), keyed by the
+    content hash of the data file and the parameters of the GraphBuilder. The content hashes of the data files are
+    kept in a source manifest, so an unchanged file is not read again. The least recently used graphs are evicted
+    once there are more than maxEntries of them or they take more than maxBytes
+    """
+
+    def __init__(self, directory: str, manifest, maxEntries: int = 8, maxBytes: int | None = None):
+        """
+        :param directory: Directory of the cached graphs, it is created if it doesn't exist
+        :param manifest: SourceManifest from "Data gathering" keeping the content hashes of the data files,
+        usually SourceManifest(f"{directory}/sources.manifest")
+        :param maxEntries: Maximal number of cached graphs
+        :param maxBytes: Maximal total size of the cached graphs, None means no limit
+        """
+        if maxEntries < 1:
+            raise ValueError("maxEntries must be positive")
+
+        self.directory: str = directory
+        self.maxEntries: int = maxEntries
+        self.maxBytes: int | None = maxBytes
+
+        os.makedirs(directory, exist_ok=True)
+        self.__manifest = manifest
+
+    def key(self, dataFile: str, builder: GraphBuilder) -> str:
+        """
+        :param dataFile: File with the user data (.json, snapshot or UserGraph .npz) the graph is built from
+        :param builder: Builder of the graph
+        :return: Key of the graph
+        """
+        dataHash = self.__manifest.currentEntry(os.path.abspath(dataFile))["hash"]
+
+        identity = json.dumps({
+            "version": GRAPH_CACHE_VERSION,
+            "data": dataHash,
+            "builder": builder.configuration(),
+        }, sort_keys=True)
+
+        return hashlib.blake2b(identity.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> WeightedEdges | None:
+        """
+        :param key: Key from key()
+        :return: The cached graph, None if it is not cached
+        """
+        filename = self.__filename(key)
+
+        try:
+            snapshot = SnapshotFile(filename)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # The modification time marks the last use for the eviction
+        os.utime(filename)
+
+        arrays = snapshot.arrays
+        return WeightedEdges(
+            snapshot.stringArray("names").toList(),
+            arrays["sources"],
+            arrays["targets"],
+            arrays["weights"],
+        )
+
+    def put(self, key: str, edges: WeightedEdges) -> None:
+        """
+        Stores the graph and evicts the least recently used graphs over the limits
+        :param key: Key from key()
+        :param edges: Built graph
+        :return: None
+        """
+        arrays = stringArrays("names", edges.names)
+        arrays["sources"] = edges.sources
+        arrays["targets"] = edges.targets
+        arrays["weights"] = edges.weights
+
+        writeSnapshot(self.__filename(key), GRAPH_KIND, arrays)
+        self.__evict()
+
+    def getOrBuild(self, dataFile: str, data, builder: GraphBuilder) -> WeightedEdges:
+        """
+        :param dataFile: File the data was loaded from
+        :param data: The loaded user data
+        :param builder: Builder of the graph
+        :return: The cached graph, or the newly built (and cached) one
+        """
+        key = self.key(dataFile, builder)
+
+        edges = self.get(key)
+        if edges is None:
+            edges = builder.build(data)
+            self.put(key, edges)
+
+        return edges
+
+    def __filename(self, key: str) -> str:
+        return f"{self.directory}/{key}.graph"
+
+    def __evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".graph"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        # Newest first, everything after the limits is removed
+        entries.sort(reverse=True)
+
+        totalBytes = 0
+        for i, (_, size, path) in enumerate(entries):
+            totalBytes += size
+            if i >= self.maxEntries or (self.maxBytes is not None and totalBytes > self.maxBytes and i > 0):
+                os.remove(path)
@@ -2,88 +2,47 @@
 # This script generates communities using Louvain community detection algorithm. #
 ##################################################################################
 
-from GeneratingCommunities.fileGetter import getData
+from GeneratingCommunities.fileGetter import getData, getGraphCache, getGraphData
+from GeneratingCommunities.fileGetter import DATA_SOURCE
 from GeneratingCommunities.fileGetter import LOUVAIN_DATA_SOURCE as DATA_OUTPUT
+from GeneratingCommunities.communityPostprocessing import (buildCommunities, extractCommunities,
+                                                           formatPruningReport, saveCommunities)
 
 from RelationshipExtractor import LouvainExtractor
-import json
 import time
 
+# The graph is built from the UserGraph when it is up to date, see getGraphData()
 try:
-    data = getData()
+    graphData, graphSource = getGraphData()
 except:
-    data = {}
+    graphData, graphSource = {}, DATA_SOURCE
 
-extractor = LouvainExtractor()
+# Number of seeded runs of the consensus mode, 0 partitions the graph only once
+CONSENSUS_RUNS: int = 0
+# Partition only the k-core of the graph for this k, the other users join the community of their strongest neighbour
+# (only when partitioning the graph once, it can't be combined with the other modes)
+PRUNE_CORE: int | None = None
+# Communities with more members are partitioned again into a tree of communities, None keeps them flat
+HIERARCHY_MAX_SIZE: int | None = None
+
+extractor = LouvainExtractor(graphCache=getGraphCache(), pruneCore=PRUNE_CORE)
 
 start = time.time()
-usersByCommunity, connections = extractor.extract(data)
+usersByCommunity, edges, confidence, parents = extractCommunities(
+    extractor, graphData, graphSource, CONSENSUS_RUNS, HIERARCHY_MAX_SIZE
+)
 
 print("---------------------------------------------------------------------")
 print(f"Louvain separation took {time.time() - start} seconds")
+if extractor.pruningReport is not None:
+    print(formatPruningReport(extractor.pruningReport))
 
 checkpoint = time.time()
 
-communities: dict[str, dict[str, set | dict[str, int]]] = dict()
-for user, community in usersByCommunity.items():
-    community = str(community)
-    if user == "":
-        continue
-    if community not in communities:
-        communities[community] = {"members" : {user, }}
-    else:
-        if "members" not in communities[community]:
-            communities[community] = {"members": {user, }}
-        else:
-            communities[community]["members"].add(user)
-
-
-for conFrom, conTo  in connections:
-    conFromComm = str(usersByCommunity[conFrom])
-    conToComm = str(usersByCommunity[conTo])
-
-    if conFromComm != conToComm:
-        if "connections" not in communities[conFromComm]:
-            communities[conFromComm]["connections"] = {conToComm : 1}
-        else:
-            if conToComm not in communities[conFromComm]["connections"]:
-                communities[conFromComm]["connections"][conToComm] = 1
-            else:
-                communities[conFromComm]["connections"][conToComm] += 1
-
-        if "connections" not in communities[conToComm]:
-            communities[conToComm]["connections"] = {conFromComm : 1}
-        else:
-            if conFromComm not in communities[conToComm]["connections"]:
-                communities[conToComm]["connections"][conFromComm] = 1
-            else:
-                communities[conToComm]["connections"][conFromComm] += 1
-
-for user in data:
-    hashtags: list[str] = data[user]["hashtags"]
-    commentsPosted: list[dict[str]] = data[user]["commentsPosted"]
-    userComm = str(usersByCommunity[user])
-
-    if "hashtags" not in communities[userComm]:
-        communities[userComm]["hashtags"] = set()
-    communities[userComm]["hashtags"] = communities[userComm]["hashtags"].union(set(hashtags))
-
-
-    if "comments" not in communities[userComm]:
-        communities[userComm]["comments"] = set()
-
-    for comment in commentsPosted:
-        communities[userComm]["comments"].add(comment["text"])
-
-communities: dict[str, dict[str, list | dict[str, int]]]
-for com in communities:
-    communities[com]["members"] = list(communities[com]["members"])
-    if "connections" not in communities[com]:
-        communities[com]["connections"] = dict()
-    communities[com]["hashtags"] = list(communities[com]["hashtags"])
-    communities[com]["comments"] = list(communities[com]["comments"])
-
-with open(DATA_OUTPUT, "w") as f:
-    json.dump(communities, f, indent=3)
+# The hashtags and comments of the communities come from the graph data, only a UserGraph saved before it kept the
+# comment texts needs the user data
+data = graphData if graphSource == DATA_SOURCE or graphData.hasCommentTexts else getData()
+communities = buildCommunities(data, usersByCommunity, edges, confidence, parents)
+saveCommunities(communities, DATA_OUTPUT)
 
 print(f"Louvain data saved to '{DATA_OUTPUT}'. It took {time.time() - checkpoint} seconds.")
\ No newline at end of file
@@ -0,0 +1,33 @@
+#############################################################################
+# This script partitions the user graph by Leiden at a range of resolutions #
+#############################################################################
+
+import argparse
+import time
+
+import numpy as np
+
+from GeneratingCommunities.fileGetter import getGraphCache, getGraphData
+
+from RelationshipExtractor import LeidenExtractor, RESOLUTION_PARTITIONS, formatSweep
+
+# Default resolutions, RBConfiguration gives the modularity at 1. CPM needs much smaller values (densities)
+RESOLUTIONS: list[float] = np.geomspace(0.1, 10, 11).round(4).tolist()
+
+arguments = argparse.ArgumentParser(description="Partitions the user graph by Leiden at a range of resolutions")
+arguments.add_argument("--partition", choices=RESOLUTION_PARTITIONS, default="RBConfiguration")
+arguments.add_argument("--resolutions", type=float, nargs="+", default=RESOLUTIONS)
+arguments.add_argument("--workers", type=int, default=0, help="Worker processes, 0 means one per CPU core")
+arguments.add_argument("--seed", type=int, default=0)
+options = arguments.parse_args()
+
+data, dataFile = getGraphData()
+extractor = LeidenExtractor(graphCache=getGraphCache())
+
+start = time.time()
+results = extractor.sweepResolutions(data, options.resolutions, options.partition, options.workers,
+                                     dataFile=dataFile, seed=options.seed)
+
+print("---------------------------------------------------------------------")
+print(formatSweep(results))
+print(f"Sweep of {len(results)} resolutions took {time.time() - start} seconds")
@@ -0,0 +1,471 @@
+#######################################################################
+# Memory-mapped binary snapshots of the user data and community files #
+#######################################################################
+
+import json
+import mmap
+import os
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+from GeneratingCommunities.userGraph import StringArray, StringTable, UserGraph
+
+SNAPSHOT_MAGIC: bytes = b"SBSNAP1\n"
+# Every array starts on a multiple of the alignment, so it can be viewed straight from the mapped file
+SNAPSHOT_ALIGNMENT: int = 64
+
+USERS_KIND: str = "users"
+COMMUNITIES_KIND: str = "communities"
+
+def isSnapshot(filename: str) -> bool:
+    """
+    :param filename: Path to the file
+    :return: True if the file is a snapshot, False for anything else (e.g. a .json file)
+    """
+    with open(filename, "rb") as file:
+        return file.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+def writeSnapshot(filename: str, kind: str, arrays: dict[str, np.ndarray]) -> None:
+    """
+    Writes the arrays into one snapshot file - the magic, the length of the JSON header, the header (kind and
+    dtype, shape and offset of every array) and the aligned raw arrays. The file is written into a temporary
+    file and renamed over the old one, so processes which still have the old snapshot mapped are not affected
+    :param filename: Path to the snapshot
+    :param kind: USERS_KIND or COMMUNITIES_KIND
+    :param arrays: Arrays by their names
+    :return: None
+    """
+    arrays = {name: np.ascontiguousarray(values) for name, values in arrays.items()}
+
+    def headerBytes(offsets: dict[str, int]) -> bytes:
+        return json.dumps({
+            "kind": kind,
+            "arrays": {
+                name: {"dtype": values.dtype.str, "shape": list(values.shape), "offset": offsets[name]}
+                for name, values in arrays.items()
+            },
+        }).encode("utf-8")
+
+    # The offsets depend on the length of the header, which is padded so that it can't change once they are set
+    header = headerBytes({name: 0 for name in arrays})
+    dataStart = len(SNAPSHOT_MAGIC) + 8 + len(header) + 32 * len(arrays) + 64
+    dataStart += -dataStart % SNAPSHOT_ALIGNMENT
+
+    offsets = {}
+    position = dataStart
+    for name, values in arrays.items():
+        offsets[name] = position
+        position += values.nbytes
+        position += -position % SNAPSHOT_ALIGNMENT
+
+    header = headerBytes(offsets)
+    headerSpace = dataStart - len(SNAPSHOT_MAGIC) - 8
+
+    with open(filename + ".tmp", "wb") as file:
+        file.write(SNAPSHOT_MAGIC)
+        file.write(len(header).to_bytes(8, "little"))
+        file.write(header.ljust(headerSpace, b" "))
+
+        for name, values in arrays.items():
+            file.write(b"\0" * (offsets[name] - file.tell()))
+            file.write(values.tobytes())
+
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(filename + ".tmp", filename)
+
+class SnapshotFile:
+    """
+    Snapshot file opened via mmap. The arrays are read-only views into the mapped file, so opening the snapshot
+    doesn't read the data and processes opening the same snapshot share its pages
+    """
+
+    def __init__(self, filename: str):
+        self.filename: str = filename
+
+        with open(filename, "rb") as file:
+            if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{filename} is not a snapshot")
+
+            headerLength = int.from_bytes(file.read(8), "little")
+            header = json.loads(file.read(headerLength))
+
+            self.__mapped: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.kind: str = header["kind"]
+        self.arrays: dict[str, np.ndarray] = {}
+
+        for name, info in header["arrays"].items():
+            dtype = np.dtype(info["dtype"])
+            shape = tuple(info["shape"])
+            count = int(np.prod(shape, dtype=np.int64))
+
+            if count == 0:
+                self.arrays[name] = np.zeros(shape, dtype=dtype)
+                continue
+
+            self.arrays[name] = np.frombuffer(
+                self.__mapped, dtype=dtype, count=count, offset=info["offset"]
+            ).reshape(shape)
+
+    def stringArray(self, prefix: str) -> StringArray:
+        """
+        :param prefix: Name of the strings, their arrays are <prefix>Offsets and <prefix>Buffer
+        :return: String array viewing the mapped arrays
+        """
+        return StringArray(self.arrays[prefix + "Offsets"], self.arrays[prefix + "Buffer"])
+
+    def stringTable(self, prefix: str) -> StringTable:
+        """
+        :param prefix: Name of the strings written sorted and unique, their arrays are <prefix>Offsets
+        and <prefix>Buffer
+        :return: String table viewing the mapped arrays, its find() works
+        """
+        return StringTable(self.arrays[prefix + "Offsets"], self.arrays[prefix + "Buffer"])
+
+def stringArrays(prefix: str, strings: list[str], isSorted: bool = False) -> dict[str, np.ndarray]:
+    """
+    :param prefix: Name of the strings
+    :param strings: Strings in the order they will be indexed
+    :param isSorted: Whether the strings are sorted and unique, so they can be read by SnapshotFile.stringTable()
+    :return: Arrays <prefix>Offsets and <prefix>Buffer of the strings
+    """
+    table = StringTable.fromStrings(strings) if isSorted else StringArray.fromStrings(strings)
+    return {prefix + "Offsets": table.offsets, prefix + "Buffer": table.buffer}
+
+def raggedIndptr(lengths: array) -> np.ndarray:
+    """
+    :param lengths: Number of items of every row
+    :return: Indptr of the rows - items of row i are at indptr[i]:indptr[i + 1]
+    """
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(np.frombuffer(lengths, dtype=np.int64), out=indptr[1:])
+    return indptr
+
+class UserSnapshot(Mapping):
+    """
+    Lazy read-only dict of the user data (as created by DataParser) backed by a snapshot. The relations and counts
+    are stored as the arrays of UserGraph, the posted comments as their own columns - per user ranges of the comment
+    texts, likes and hashtags. A user's dict is decoded only when it is accessed
+    """
+
+    def __init__(self, snapshot: SnapshotFile):
+        if snapshot.kind != USERS_KIND:
+            raise ValueError(f"{snapshot.filename} is not a user data snapshot")
+
+        self.snapshot: SnapshotFile = snapshot
+        self.graph: UserGraph = UserGraph.fromArrays(snapshot.arrays)
+
+        self.__commentsIndptr: np.ndarray = self.graph.commentsIndptr
+        self.__commentTexts: StringArray = self.graph.commentTexts
+        self.__commentLikes: np.ndarray = snapshot.arrays["commentLikes"]
+        self.__commentHashtagsIndptr: np.ndarray = snapshot.arrays["commentHashtagsIndptr"]
+        self.__commentHashtagsIndices: np.ndarray = snapshot.arrays["commentHashtagsIndices"]
+        self.__commentHashtags: StringTable = snapshot.stringTable("commentHashtag")
+
+        self.__length: int | None = None
+
+    @classmethod
+    def open(cls, filename: str) -> "UserSnapshot":
+        """
+        :param filename: Path to the snapshot created by save()
+        :return: UserSnapshot
+        """
+        return cls(SnapshotFile(filename))
+
+    @staticmethod
+    def save(data: Mapping, filename: str) -> None:
+        """
+        Converts the user data into a snapshot
+        :param data: User data (the .json dict, SqliteStorage or another UserSnapshot)
+        :param filename: Path to the snapshot
+        :return: None
+        """
+        graph = UserGraph.fromData(data)
+        userIds = {user: i for i, user in enumerate(graph.users.toList())}
+
+        commentsPerUser: list[list[dict]] = [[] for _ in range(graph.numUsers)]
+        commentHashtags = set()
+        for user, info in data.items():
+            comments = info.get("commentsPosted", [])
+            commentsPerUser[userIds[user]] = comments
+            for comment in comments:
+                commentHashtags.update(comment.get("hashtags", []))
+
+        del userIds
+
+        sortedHashtags = sorted(commentHashtags)
+        hashtagIds = {tag: i for i, tag in enumerate(sortedHashtags)}
+
+        # The comment texts and their ranges of the users are arrays of the UserGraph
+        likes = array("q")
+        hashtagLengths = array("q")
+        hashtagIndices = array("i")
+
+        for comments in commentsPerUser:
+            for comment in comments:
+                likes.append(comment["likes"])
+                tags = comment.get("hashtags", [])
+                hashtagLengths.append(len(tags))
+                hashtagIndices.extend(hashtagIds[tag] for tag in tags)
+
+        del commentsPerUser
+
+        arrays = graph.toArrays()
+        arrays["commentLikes"] = np.frombuffer(likes, dtype=np.int64)
+        arrays["commentHashtagsIndptr"] = raggedIndptr(hashtagLengths)
+        arrays["commentHashtagsIndices"] = np.frombuffer(hashtagIndices, dtype=np.int32)
+        arrays.update(stringArrays("commentHashtag", sortedHashtags, isSorted=True))
+
+        writeSnapshot(filename, USERS_KIND, arrays)
+
+    def __getitem__(self, user: str) -> dict:
+        userId = self.graph.userId(user)
+        if userId == -1 or not self.graph.inData[userId]:
+            raise KeyError(user)
+
+        return self.userById(userId)
+
+    def __contains__(self, user) -> bool:
+        if not isinstance(user, str):
+            return False
+        userId = self.graph.userId(user)
+        return userId != -1 and bool(self.graph.inData[userId])
+
+    def __iter__(self):
+        users = self.graph.users
+        for userId in np.flatnonzero(self.graph.inData).tolist():
+            yield users[userId]
+
+    def __len__(self) -> int:
+        if self.__length is None:
+            self.__length = int(np.count_nonzero(self.graph.inData))
+        return self.__length
+
+    def userById(self, userId: int) -> dict:
+        """
+        :param userId: Id of the user in the graph
+        :return: Dict of the user in the format of the user data
+        """
+        graph = self.graph
+        counts = graph.counts
+
+        def names(relation: str) -> list[str]:
+            return [graph.users[other] for other in graph.neighbours(relation, userId).tolist()]
+
+        return {
+            "totalFollowingCount": int(counts["totalFollowingCount"][userId]),
+            "shownFollowingCount": int(counts["shownFollowingCount"][userId]),
+            "following": names("following"),
+            "totalFollowersCount": int(counts["totalFollowersCount"][userId]),
+            "shownFollowersCount": int(counts["shownFollowersCount"][userId]),
+            "followers": names("followers"),
+            "totalCommentsCount": int(counts["totalCommentsCount"][userId]),
+            "shownCommentsCount": int(counts["shownCommentsCount"][userId]),
+            "commentedOn": names("commentedOn"),
+            "commenters": names("commenters"),
+            "hashtags": [graph.hashtags[tag] for tag in graph.neighbours("hashtags", userId).tolist()],
+            "commentsPosted": self.__comments(userId),
+        }
+
+    def postedCommentTexts(self) -> tuple[np.ndarray, list[str]]:
+        """
+        :return: Id of the author of every posted comment and the texts of the comments, decoded at once without
+        decoding the users
+        """
+        return self.graph.postedCommentTexts()
+
+    def __comments(self, userId: int) -> list[dict]:
+        start, end = int(self.__commentsIndptr[userId]), int(self.__commentsIndptr[userId + 1])
+        if start == end:
+            return []
+
+        texts = self.__commentTexts.strings(start, end)
+        likes = self.__commentLikes[start:end].tolist()
+        bounds = self.__commentHashtagsIndptr[start:end + 1].tolist()
+
+        comments = []
+        for i in range(end - start):
+            tags = self.__commentHashtagsIndices[bounds[i]:bounds[i + 1]].tolist()
+            comments.append({
+                "text": texts[i],
+                "likes": likes[i],
+                "hashtags": [self.__commentHashtags[tag] for tag in tags],
+            })
+
+        return comments
+
+class CommunitySnapshot(Mapping):
+    """
+    Lazy read-only dict of a community file (as created by leidenCommunityGeneration.py or
+    louvainCommunityGeneration.py) backed by a snapshot. Members, connections, hashtags and comments of the
+    communities are stored as ragged columns, any other keys of a community as a JSON string
+    """
+
+    FIELDS: tuple[str, ...] = ("members", "connections", "hashtags", "comments")
+
+    def __init__(self, snapshot: SnapshotFile):
+        if snapshot.kind != COMMUNITIES_KIND:
+            raise ValueError(f"{snapshot.filename} is not a community snapshot")
+
+        self.snapshot: SnapshotFile = snapshot
+        arrays = snapshot.arrays
+
+        self.__communities: StringArray = snapshot.stringArray("community")
+        self.__members: StringArray = snapshot.stringArray("member")
+        self.__comments: StringArray = snapshot.stringArray("comment")
+        self.__hashtags: StringTable = snapshot.stringTable("hashtag")
+        self.__extra: StringArray = snapshot.stringArray("extra")
+
+        self.__membersIndptr: np.ndarray = arrays["membersIndptr"]
+        self.__connectionsIndptr: np.ndarray = arrays["connectionsIndptr"]
+        self.__connectionsIndices: np.ndarray = arrays["connectionsIndices"]
+        self.__connectionsCounts: np.ndarray = arrays["connectionsCounts"]
+        self.__hashtagsIndptr: np.ndarray = arrays["hashtagsIndptr"]
+        self.__hashtagsIndices: np.ndarray = arrays["hashtagsIndices"]
+        self.__commentsIndptr: np.ndarray = arrays["commentsIndptr"]
+
+        self.__communityIndexes: dict[str, int] | None = None
+
+    @classmethod
+    def open(cls, filename: str) -> "CommunitySnapshot":
+        """
+        :param filename: Path to the snapshot created by save()
+        :return: CommunitySnapshot
+        """
+        return cls(SnapshotFile(filename))
+
+    @classmethod
+    def save(cls, communities: Mapping, filename: str) -> None:
+        """
+        Converts the communities into a snapshot
+        :param communities: Communities {id: {"members", "connections", "hashtags", "comments", ...}}
+        :param filename: Path to the snapshot
+        :return: None
+        """
+        communityIds = list(communities.keys())
+        indexes = {community: i for i, community in enumerate(communityIds)}
+
+        sortedHashtags = sorted({tag for info in communities.values() for tag in info.get("hashtags", [])})
+        hashtagIds = {tag: i for i, tag in enumerate(sortedHashtags)}
+
+        members: list[str] = []
+        comments: list[str] = []
+        extra: list[str] = []
+        lengths = {field: array("q") for field in cls.FIELDS}
+        connectionsIndices = array("i")
+        connectionsCounts = []
+        hashtagsIndices = array("i")
+
+        for info in communities.values():
+            communityMembers = info.get("members", [])
+            members.extend(communityMembers)
+            lengths["members"].append(len(communityMembers))
+
+            connections = info.get("connections", {})
+            connectionsIndices.extend(indexes[other] for other in connections)
+            connectionsCounts.extend(connections.values())
+            lengths["connections"].append(len(connections))
+
+            tags = info.get("hashtags", [])
+            hashtagsIndices.extend(hashtagIds[tag] for tag in tags)
+            lengths["hashtags"].append(len(tags))
+
+            communityComments = info.get("comments", [])
+            comments.extend(communityComments)
+            lengths["comments"].append(len(communityComments))
+
+            extra.append(json.dumps({key: value for key, value in info.items() if key not in cls.FIELDS}))
+
+        arrays = {}
+        arrays.update(stringArrays("community", communityIds))
+        arrays.update(stringArrays("member", members))
+        arrays.update(stringArrays("comment", comments))
+        arrays.update(stringArrays("hashtag", sortedHashtags, isSorted=True))
+        arrays.update(stringArrays("extra", extra))
+        for field in cls.FIELDS:
+            arrays[f"{field}Indptr"] = raggedIndptr(lengths[field])
+        arrays["connectionsIndices"] = np.frombuffer(connectionsIndices, dtype=np.int32)
+        arrays["hashtagsIndices"] = np.frombuffer(hashtagsIndices, dtype=np.int32)
+        # Counts stay integers unless some of the connection weights aren't
+        arrays["connectionsCounts"] = np.asarray(connectionsCounts, dtype=np.float64 if any(
+            isinstance(count, float) for count in connectionsCounts) else np.int64)
+
+        writeSnapshot(filename, COMMUNITIES_KIND, arrays)
+
+    def __indexes(self) -> dict[str, int]:
+        if self.__communityIndexes is None:
+            self.__communityIndexes = {
+                community: i for i, community in enumerate(self.__communities.toList())
+            }
+        return self.__communityIndexes
+
+    def __getitem__(self, community: str) -> dict:
+        return self.communityByIndex(self.__indexes()[community])
+
+    def __contains__(self, community) -> bool:
+        return community in self.__indexes()
+
+    def __iter__(self):
+        return iter(self.__indexes())
+
+    def __len__(self) -> int:
+        return len(self.__communities)
+
+    def members(self, community: str) -> list[str]:
+        """
+        :param community: Id of the community
+        :return: Members of the community, without decoding the rest of it
+        """
+        index = self.__indexes()[community]
+        return self.__members.strings(int(self.__membersIndptr[index]), int(self.__membersIndptr[index + 1]))
+
+    def communityByIndex(self, index: int) -> dict:
+        """
+        :param index: Position of the community in the file
+        :return: Dict of the community in the format of the community file
+        """
+        connectionsStart, connectionsEnd = self.__connectionsIndptr[index:index + 2].tolist()
+        hashtagsStart, hashtagsEnd = self.__hashtagsIndptr[index:index + 2].tolist()
+        commentsStart, commentsEnd = self.__commentsIndptr[index:index + 2].tolist()
+        membersStart, membersEnd = self.__membersIndptr[index:index + 2].tolist()
+
+        others = self.__connectionsIndices[connectionsStart:connectionsEnd].tolist()
+        counts = self.__connectionsCounts[connectionsStart:connectionsEnd].tolist()
+
+        community = {
+            "members": self.__members.strings(membersStart, membersEnd),
+            "connections": {self.__communities[other]: count for other, count in zip(others, counts)},
+            "hashtags": [
+                self.__hashtags[tag] for tag in self.__hashtagsIndices[hashtagsStart:hashtagsEnd].tolist()
+            ],
+            "comments": self.__comments.strings(commentsStart, commentsEnd),
+        }
+        community.update(json.loads(self.__extra[index]))
+
+        return community
+
+def loadUserData(filename: str) -> Mapping:
+    """
+    :param filename: User data snapshot or .json file
+    :return: UserSnapshot for a snapshot, the loaded dict for a .json file
+    """
+    if isSnapshot(filename):
+        return UserSnapshot.open(filename)
+
+    with open(filename, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def loadCommunityData(filename: str) -> Mapping:
+    """
+    :param filename: Community snapshot or .json file
+    :return: CommunitySnapshot for a snapshot, the loaded dict for a .json file
+    """
+    if isSnapshot(filename):
+        return CommunitySnapshot.open(filename)
+
+    with open(filename, "r", encoding="utf-8") as file:
+        return json.load(file)
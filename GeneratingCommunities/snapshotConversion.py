@@ -0,0 +1,33 @@
+##########################################################################
+# This script converts the user data or a community file into a snapshot #
+##########################################################################
+
+import argparse
+import json
+import time
+
+from GeneratingCommunities.snapshot import CommunitySnapshot, UserSnapshot
+
+arguments = argparse.ArgumentParser(description="Converts a .json user data or community file into a snapshot")
+arguments.add_argument("source", help=".json file created by DataParser or by a community generation script")
+arguments.add_argument("output", help="Path to the snapshot")
+options = arguments.parse_args()
+
+start = time.time()
+with open(options.source, "r", encoding="utf-8") as file:
+    data = json.load(file)
+
+print("---------------------------------------------------------------------")
+print(f"'{options.source}' loaded in {time.time() - start} seconds")
+
+# Community files are the only ones with members
+isCommunityFile = len(data) > 0 and "members" in next(iter(data.values()))
+
+checkpoint = time.time()
+if isCommunityFile:
+    CommunitySnapshot.save(data, options.output)
+else:
+    UserSnapshot.save(data, options.output)
+
+kind = "Community" if isCommunityFile else "User data"
+print(f"{kind} snapshot saved to '{options.output}'. It took {time.time() - checkpoint} seconds.")
@@ -0,0 +1,325 @@
+######################################################################
+# Compact array representation of the user data from Data gathering #
+######################################################################
+
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+class StringArray:
+    """
+    Strings in any order stored as one UTF-8 buffer with offsets. Every string is identified by its index,
+    so no Python strings have to be kept in memory
+    """
+
+    def __init__(self, offsets: np.ndarray, buffer: np.ndarray):
+        self.offsets: np.ndarray = offsets
+        self.buffer: np.ndarray = buffer
+
+    @classmethod
+    def fromStrings(cls, strings: list[str]) -> "StringArray":
+        """
+        :param strings: Strings
+        :return: String array with the strings in the given order
+        """
+        encoded = [string.encode("utf-8") for string in strings]
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        return cls(offsets, buffer)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.buffer[start:end].tobytes().decode("utf-8")
+
+    def strings(self, start: int, end: int) -> list[str]:
+        """
+        :param start: Index of the first string
+        :param end: Index after the last string
+        :return: Strings start..end-1, decoded from one slice of the buffer
+        """
+        base = int(self.offsets[start])
+        encoded = self.buffer[base:self.offsets[end]].tobytes()
+        bounds = (self.offsets[start:end + 1] - base).tolist()
+
+        return [encoded[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(end - start)]
+
+    def toList(self) -> list[str]:
+        return self.strings(0, len(self))
+
+class StringTable(StringArray):
+    """
+    String array of sorted unique strings (by their UTF-8 bytes), the index of a string is found by a binary search
+    """
+
+    @classmethod
+    def fromStrings(cls, strings: list[str]) -> "StringTable":
+        """
+        :param strings: Sorted unique strings
+        :return: String table with the strings in the given order
+        """
+        # Strings compare by their code points, which is the order of their UTF-8 bytes
+        if any(first >= second for first, second in zip(strings, strings[1:])):
+            raise ValueError("The strings of a string table have to be sorted and unique")
+
+        return super().fromStrings(strings)
+
+    def find(self, string: str) -> int:
+        """
+        :param string: Searched string
+        :return: Index of the string, -1 if it is not in the table
+        """
+        encoded = string.encode("utf-8")
+
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            current = self.buffer[self.offsets[middle]:self.offsets[middle + 1]].tobytes()
+            if current < encoded:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < len(self) and self.buffer[self.offsets[low]:self.offsets[low + 1]].tobytes() == encoded:
+            return low
+        return -1
+
+class UserGraph:
+    """
+    Users interned as int32 ids (indexes into a sorted string table) and every relation of the user data
+    stored as CSR arrays - neighbours of user i are indices[indptr[i]:indptr[i + 1]]. The texts of the posted
+    comments are kept as well (texts of user i are commentTexts[commentsIndptr[i]:commentsIndptr[i + 1]]), so the
+    communities can be described without the user data.
+    The whole graph is saved and loaded as one .npz file
+    """
+
+    USER_RELATIONS: tuple[str, ...] = ("following", "followers", "commentedOn", "commenters")
+    COUNTS: tuple[str, ...] = (
+        "totalFollowingCount", "shownFollowingCount",
+        "totalFollowersCount", "shownFollowersCount",
+        "totalCommentsCount", "shownCommentsCount",
+    )
+
+    def __init__(self,
+                 users: StringTable,
+                 hashtags: StringTable,
+                 inData: np.ndarray,
+                 relations: dict[str, tuple[np.ndarray, np.ndarray]],
+                 counts: dict[str, np.ndarray],
+                 commentsIndptr: np.ndarray | None = None,
+                 commentTexts: StringArray | None = None,
+                 ):
+        self.users: StringTable = users
+        self.hashtags: StringTable = hashtags
+        self.inData: np.ndarray = inData
+        self.relations: dict[str, tuple[np.ndarray, np.ndarray]] = relations
+        self.counts: dict[str, np.ndarray] = counts
+        # None for a graph saved before the comment texts were kept
+        self.commentsIndptr: np.ndarray | None = commentsIndptr
+        self.commentTexts: StringArray | None = commentTexts
+
+    @classmethod
+    def fromData(cls, data: Mapping) -> "UserGraph":
+        """
+        Builds the graph from the user data created by DataParser (the .json dict or SqliteStorage).
+        Users which only appear in the relations of others get an id too, but are marked in inData as False
+        :param data: User data
+        :return: UserGraph
+        """
+        userNames = set(data.keys())
+        hashtagNames = set()
+        for user, info in data.items():
+            for relation in cls.USER_RELATIONS:
+                userNames.update(info.get(relation, []))
+            hashtagNames.update(info.get("hashtags", []))
+
+        sortedUsers = sorted(userNames)
+        sortedHashtags = sorted(hashtagNames)
+        del userNames, hashtagNames
+
+        if len(sortedUsers) >= 2 ** 31:
+            raise OverflowError("Too many users for int32 ids")
+
+        userIds = {user: i for i, user in enumerate(sortedUsers)}
+        hashtagIds = {tag: i for i, tag in enumerate(sortedHashtags)}
+
+        relationNames = cls.USER_RELATIONS + ("hashtags",)
+        sources: dict[str, array] = {relation: array("i") for relation in relationNames}
+        targets: dict[str, array] = {relation: array("i") for relation in relationNames}
+
+        inData = np.zeros(len(sortedUsers), dtype=np.bool_)
+        counts = {name: np.zeros(len(sortedUsers), dtype=np.int64) for name in cls.COUNTS}
+        textsPerUser: list[list[str]] = [[] for _ in range(len(sortedUsers))]
+
+        for user, info in data.items():
+            userId = userIds[user]
+            inData[userId] = True
+
+            for relation in cls.USER_RELATIONS:
+                others = info.get(relation, [])
+                sources[relation].extend([userId] * len(others))
+                targets[relation].extend(userIds[other] for other in others)
+
+            tags = info.get("hashtags", [])
+            sources["hashtags"].extend([userId] * len(tags))
+            targets["hashtags"].extend(hashtagIds[tag] for tag in tags)
+
+            for name in cls.COUNTS:
+                counts[name][userId] = info.get(name, 0)
+
+            textsPerUser[userId] = [comment["text"] for comment in info.get("commentsPosted", [])]
+
+        del userIds, hashtagIds
+
+        commentsIndptr = np.zeros(len(sortedUsers) + 1, dtype=np.int64)
+        np.cumsum([len(texts) for texts in textsPerUser], out=commentsIndptr[1:])
+        commentTexts = StringArray.fromStrings([text for texts in textsPerUser for text in texts])
+        del textsPerUser
+
+        relations = {
+            relation: cls.__toCsr(sources[relation], targets[relation], len(sortedUsers))
+            for relation in relationNames
+        }
+
+        return cls(
+            StringTable.fromStrings(sortedUsers),
+            StringTable.fromStrings(sortedHashtags),
+            inData,
+            relations,
+            counts,
+            commentsIndptr,
+            commentTexts,
+        )
+
+    @staticmethod
+    def __toCsr(sources: array, targets: array, numUsers: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Sorts the edges by source and target and creates the CSR arrays from them
+        :return: indptr and indices of the relation
+        """
+        sourceIds = np.frombuffer(sources, dtype=np.int32)
+        targetIds = np.frombuffer(targets, dtype=np.int32)
+
+        order = np.lexsort((targetIds, sourceIds))
+
+        indptr = np.zeros(numUsers + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sourceIds, minlength=numUsers), out=indptr[1:])
+
+        return indptr, targetIds[order]
+
+    def toArrays(self) -> dict[str, np.ndarray]:
+        """
+        :return: All arrays of the graph by their names in the saved files
+        """
+        arrays = {
+            "userOffsets": self.users.offsets,
+            "userBuffer": self.users.buffer,
+            "hashtagOffsets": self.hashtags.offsets,
+            "hashtagBuffer": self.hashtags.buffer,
+            "inData": self.inData,
+        }
+        for relation, (indptr, indices) in self.relations.items():
+            arrays[f"{relation}Indptr"] = indptr
+            arrays[f"{relation}Indices"] = indices
+        for name, values in self.counts.items():
+            arrays[name] = values
+        if self.hasCommentTexts:
+            arrays["commentsIndptr"] = self.commentsIndptr
+            arrays["commentTextOffsets"] = self.commentTexts.offsets
+            arrays["commentTextBuffer"] = self.commentTexts.buffer
+
+        return arrays
+
+    @classmethod
+    def fromArrays(cls, arrays: Mapping) -> "UserGraph":
+        """
+        :param arrays: Arrays by their names as created by toArrays(), e.g. a loaded .npz file or memory-mapped arrays
+        :return: UserGraph using the given arrays
+        """
+        relations = {
+            relation: (arrays[f"{relation}Indptr"], arrays[f"{relation}Indices"])
+            for relation in cls.USER_RELATIONS + ("hashtags",)
+        }
+
+        hasTexts = "commentsIndptr" in arrays
+
+        return cls(
+            StringTable(arrays["userOffsets"], arrays["userBuffer"]),
+            StringTable(arrays["hashtagOffsets"], arrays["hashtagBuffer"]),
+            arrays["inData"],
+            relations,
+            {name: arrays[name] for name in cls.COUNTS},
+            arrays["commentsIndptr"] if hasTexts else None,
+            StringArray(arrays["commentTextOffsets"], arrays["commentTextBuffer"]) if hasTexts else None,
+        )
+
+    def save(self, filename: str) -> None:
+        """
+        Saves the whole graph into one uncompressed .npz file
+        :param filename: Path to the .npz file
+        :return: None
+        """
+        with open(filename, "wb") as file:
+            np.savez(file, **self.toArrays())
+
+    @classmethod
+    def load(cls, filename: str) -> "UserGraph":
+        """
+        :param filename: Path to the .npz file created by save()
+        :return: UserGraph
+        """
+        with np.load(filename) as arrays:
+            return cls.fromArrays({name: arrays[name] for name in arrays.files})
+
+    @property
+    def numUsers(self) -> int:
+        return len(self.users)
+
+    @property
+    def hasCommentTexts(self) -> bool:
+        return self.commentTexts is not None
+
+    def postedCommentTexts(self) -> tuple[np.ndarray, list[str]]:
+        """
+        :return: Id of the author of every posted comment and the texts of the comments, decoded at once
+        """
+        if not self.hasCommentTexts:
+            raise ValueError("The user graph was saved without the comment texts, generate it again")
+
+        authors = np.repeat(np.arange(self.numUsers, dtype=np.int32), np.diff(self.commentsIndptr))
+        return authors, self.commentTexts.toList()
+
+    def userId(self, user: str) -> int:
+        """
+        :param user: Username
+        :return: Id of the user, -1 if the user is unknown
+        """
+        return self.users.find(user)
+
+    def userName(self, userId: int) -> str:
+        return self.users[userId]
+
+    def neighbours(self, relation: str, userId: int) -> np.ndarray:
+        """
+        :param relation: One of USER_RELATIONS or "hashtags"
+        :param userId: Id of the user
+        :return: Sorted ids of the related users (or hashtags)
+        """
+        indptr, indices = self.relations[relation]
+        return indices[indptr[userId]:indptr[userId + 1]]
+
+    def edges(self, relation: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param relation: One of USER_RELATIONS or "hashtags"
+        :return: Arrays (sources, targets) with one item for every edge of the relation
+        """
+        indptr, indices = self.relations[relation]
+        sources = np.repeat(np.arange(self.numUsers, dtype=np.int32), np.diff(indptr))
+        return sources, indices
@@ -0,0 +1,23 @@
+###############################################################################
+# This script converts the user data into the compact array graph (UserGraph) #
+###############################################################################
+
+from GeneratingCommunities.fileGetter import getData
+from GeneratingCommunities.fileGetter import USER_GRAPH_SOURCE as DATA_OUTPUT
+
+from GeneratingCommunities.userGraph import UserGraph
+import time
+
+data = getData()
+
+start = time.time()
+graph = UserGraph.fromData(data)
+del data
+
+print("---------------------------------------------------------------------")
+print(f"User graph with {graph.numUsers} users built in {time.time() - start} seconds")
+
+checkpoint = time.time()
+graph.save(DATA_OUTPUT)
+
+print(f"User graph saved to '{DATA_OUTPUT}'. It took {time.time() - checkpoint} seconds.")
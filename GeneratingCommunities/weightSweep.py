@@ -0,0 +1,33 @@
+########################################################################
+# This script partitions the user graph for a grid of relation weights #
+########################################################################
+
+import argparse
+import itertools
+import time
+
+from GeneratingCommunities.fileGetter import getGraphData
+
+from RelationshipExtractor import LeidenExtractor, LouvainExtractor, formatSweep
+
+# Values of every weight, the sweep runs all of their combinations
+FOLLOWING_WEIGHTS: tuple[float, ...] = (0.5, 1.0, 2.0)
+COMMENTED_WEIGHTS: tuple[float, ...] = (1.0, 2.0, 4.0)
+HASHTAG_WEIGHTS: tuple[float, ...] = (0.0, 0.25, 0.5)
+
+EXTRACTORS = {"leiden": LeidenExtractor, "louvain": LouvainExtractor}
+
+arguments = argparse.ArgumentParser(description="Partitions the user graph for a grid of relation weights")
+arguments.add_argument("--algorithm", choices=EXTRACTORS, default="leiden")
+arguments.add_argument("--workers", type=int, default=0, help="Worker processes, 0 means one per CPU core")
+options = arguments.parse_args()
+
+data, _ = getGraphData()
+weightGrid = list(itertools.product(FOLLOWING_WEIGHTS, COMMENTED_WEIGHTS, HASHTAG_WEIGHTS))
+
+start = time.time()
+results = EXTRACTORS[options.algorithm]().sweepWeights(data, weightGrid, workers=options.workers)
+
+print("---------------------------------------------------------------------")
+print(formatSweep(results))
+print(f"Sweep of {len(weightGrid)} settings took {time.time() - start} seconds")
@@ -23,6 +23,10 @@ csvDataEdges = [
 ]
 
 for comm, info in data.items():
+    # The split communities of a hierarchical file contain the members of their children
+    if len(info.get("children", [])) > 0:
+        continue
+
     commColor = getColor()
     for member in info["members"]:
         csvDataEdges.append([member, comm, commColor])
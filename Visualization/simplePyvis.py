@@ -2,29 +2,31 @@
 # Simple example of a pyvis graph #
 ###################################
 
-import json
 from pyvis.network import Network
 import networkx as nx
 
-DATA_FILE = ".json"
+from GeneratingCommunities.fileGetter import getUserGraph
 
 graph = nx.DiGraph()
 
-with open(DATA_FILE, "r", encoding="utf-8") as f:
-    data = json.load(f)
+# Only the relations of the shown user are needed, the UserGraph (USER_GRAPH_SOURCE) has them without the comments
+userGraph = getUserGraph()
 
 user = ""
+userId = userGraph.userId(user)
+if userId == -1:
+    raise KeyError(f"{user} is not in the user graph")
 
 nodes = { user, }
 edges = set()
 
-for other in data[user]["following"]:
-    nodes.add(other)
-    edges.add((user, other))
+for other in userGraph.neighbours("following", userId).tolist():
+    nodes.add(userGraph.userName(other))
+    edges.add((user, userGraph.userName(other)))
 
-for other in data[user]["followers"]:
-    nodes.add(other)
-    edges.add((other, user))
+for other in userGraph.neighbours("followers", userId).tolist():
+    nodes.add(userGraph.userName(other))
+    edges.add((userGraph.userName(other), user))
 
 graph.add_nodes_from(nodes)
 graph.add_edges_from(edges)
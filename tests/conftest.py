@@ -0,0 +1,10 @@
+import os
+import sys
+
+REPOSITORY_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# The modules import each other as siblings of their directories, like when the scripts are run from them
+for directory in ("", "Data gathering", "GeneratingCommunities", "Benchmarks"):
+    path = os.path.normpath(os.path.join(REPOSITORY_DIRECTORY, directory))
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,358 @@
+import itertools
+
+import igraph as ig
+import leidenalg
+import numpy as np
+import pytest
+
+from RelationshipExtractor import (GraphBuilder, LSH_RECALL, LeidenExtractor, LouvainExtractor, hashtagEdges, lshRowsFor,
+                                   minHashEdges)
+
+def topicHashtags(numUsers: int, seed: int = 0) -> dict:
+    """
+    :return: User data with only the hashtags - a few hashtags of one of the topics and some random ones
+    """
+    random = np.random.default_rng(seed)
+
+    data = dict()
+    for user in range(numUsers):
+        topic = random.integers(10)
+        hashtags = {f"#topic{topic}_{index}" for index in random.choice(6, random.integers(2, 6), replace=False)}
+        hashtags |= {f"#other{tag}" for tag in random.integers(0, 100, random.integers(0, 3))}
+        data[f"user{user}"] = {"hashtags": sorted(hashtags)}
+
+    return data
+
+def exactSimilarities(data: dict, threshold: float) -> dict[tuple[int, int], float]:
+    hashtags = [set(info["hashtags"]) for info in data.values()]
+
+    similarities = dict()
+    for first, second in itertools.combinations(range(len(hashtags)), 2):
+        similarity = len(hashtags[first] & hashtags[second]) / len(hashtags[first] | hashtags[second])
+        if similarity >= threshold:
+            similarities[(first, second)] = similarity
+
+    return similarities
+
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.8])
+@pytest.mark.parametrize("bands", [16, 32])
+def test_lshRowsPutTheThresholdAboveTheMidpoint(threshold, bands):
+    rows = lshRowsFor(threshold, bands)
+
+    assert (1 / bands) ** (1 / rows) < threshold
+    assert 1 - (1 - threshold ** rows) ** bands >= LSH_RECALL
+
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.7])
+def test_minHashEdgesRecallAgainstExactJaccard(threshold):
+    data = topicHashtags(600)
+    userIds = {user: index for index, user in enumerate(data)}
+    exact = exactSimilarities(data, threshold)
+
+    sources, targets, weights = minHashEdges(data, userIds, 2.0, threshold, bucketNeighbours=None)
+    found = {
+        (source, target): weight
+        for source, target, weight in zip(sources.tolist(), targets.tolist(), weights.tolist()) if source < target
+    }
+
+    # The candidates are checked exactly, so every edge is right and weighted by the exact similarity
+    assert set(found) <= set(exact)
+    for pair, weight in found.items():
+        assert weight == pytest.approx(2.0 * exact[pair])
+
+    assert len(found) / len(exact) >= 0.95
+
+def test_minHashEdgesBucketNeighboursLimitTheCandidates():
+    data = topicHashtags(600)
+    userIds = {user: index for index, user in enumerate(data)}
+
+    capped, _, _ = minHashEdges(data, userIds, 1.0, 0.5, bucketNeighbours=2)
+    uncapped, _, _ = minHashEdges(data, userIds, 1.0, 0.5, bucketNeighbours=None)
+
+    assert 0 < len(capped) < len(uncapped)
+
+def cliqueData(numCliques: int, cliqueSize: int, bridges: int = 1, seed: int = 0) -> dict:
+    """
+    :return: User data of cliques of following users, every clique follows the next one over a few random users
+    """
+    random = np.random.default_rng(seed)
+    cliques = [[f"user{clique}_{index}" for index in range(cliqueSize)] for clique in range(numCliques)]
+
+    data = dict()
+    for clique in cliques:
+        for user in clique:
+            data[user] = {"following": [other for other in clique if other != user], "commentedOn": [], "hashtags": []}
+
+    for clique, nextClique in zip(cliques, cliques[1:] + cliques[:1]):
+        for _ in range(bridges):
+            data[random.choice(clique)]["following"].append(str(random.choice(nextClique)))
+
+    return data
+
+def partitionOf(usersByCommunity: dict[str, int]) -> set[frozenset[str]]:
+    communities = dict()
+    for user, community in usersByCommunity.items():
+        communities.setdefault(community, set()).add(user)
+
+    return {frozenset(members) for members in communities.values()}
+
+def bridgedCliquePairs(numPairs: int, cliqueSize: int, sharedHashtags: int) -> dict:
+    """
+    :return: User data of pairs of cliques of following users, the two cliques of a pair are held together only by
+    two of their users with many hashtags of their own, every pair follows the next one over one user
+    """
+    data = dict()
+    for pair in range(numPairs):
+        for half in range(2):
+            clique = [f"user{pair}_{half}_{index}" for index in range(cliqueSize)]
+            for user in clique:
+                data[user] = {"following": [other for other in clique if other != user], "commentedOn": [],
+                              "hashtags": []}
+
+            data[clique[0]]["hashtags"] = [f"#pair{pair}_{tag}" for tag in range(sharedHashtags)]
+
+        data[f"user{pair}_0_1"]["following"].append(f"user{(pair + 1) % numPairs}_1_1")
+
+    return data
+
+@pytest.mark.parametrize("extractorType", [LeidenExtractor, LouvainExtractor])
+def test_consensusOfAgreeingRunsIsTheirPartition(extractorType):
+    # Partitioning the co-assignment graph with unit weights once more would split the pairs at the hashtag bridge
+    data = bridgedCliquePairs(6, 5, 50)
+    extractor = extractorType()
+
+    runs = [extractor.extract(data)[0] for _ in range(3)]
+    assert all(partitionOf(run) == partitionOf(runs[0]) for run in runs)
+    assert len(partitionOf(runs[0])) == 6
+
+    usersByCommunity, _, confidence = extractor.extractConsensus(data, 5, workers=1)
+
+    assert partitionOf(usersByCommunity) == partitionOf(runs[0])
+    assert set(confidence.values()) == {1.0}
+
+def test_consensusIsDeterministic():
+    data = cliqueData(8, 6, bridges=6)
+    extractor = LeidenExtractor()
+
+    first = extractor.extractConsensus(data, 8, workers=1, seed=3)
+    second = extractor.extractConsensus(data, 8, workers=2, seed=3)
+
+    assert first[0] == second[0] and first[2] == second[2]
+    assert all(0.0 <= value <= 1.0 for value in first[2].values())
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_hierarchySplitsLargeCommunitiesIntoTree(workers):
+    # Cliques of 4 users, several bridges between the neighbouring cliques make the top communities span more cliques
+    data = cliqueData(12, 4, bridges=8)
+    usersByCommunity, _, parents = LeidenExtractor().extractHierarchy(data, 4, workers=workers, seed=1)
+
+    children = {community: [] for community in parents}
+    for community, parent in parents.items():
+        if parent is not None:
+            assert parent < community
+            children[parent].append(community)
+
+    leaves = {community for community, communityChildren in children.items() if len(communityChildren) == 0}
+    assert any(parent is not None for parent in parents.values())
+    assert set(usersByCommunity.values()) == leaves
+
+    # Every leaf is small enough and the members of a split community are exactly the members of its leaves
+    members = {community: set() for community in parents}
+    for user, community in usersByCommunity.items():
+        while community is not None:
+            members[community].add(user)
+            community = parents[community]
+
+    assert all(len(members[leaf]) <= 4 for leaf in leaves)
+    for community, communityChildren in children.items():
+        if len(communityChildren) > 0:
+            assert members[community] == set().union(*(members[child] for child in communityChildren))
+            assert sum(len(members[child]) for child in communityChildren) == len(members[community])
+    assert partitionOf(usersByCommunity) == {frozenset(f"user{clique}_{index}" for index in range(4))
+                                             for clique in range(12)}
+
+def test_incrementalUpdateKeepsCommunityIds():
+    data = cliqueData(8, 6)
+    extractor = LeidenExtractor()
+
+    # The cliques as the previous run, with ids which differ from the labels Leiden would choose
+    previousCommunities = {
+        str(100 + 7 * clique): {"members": [f"user{clique}_{index}" for index in range(6)]} for clique in range(8)
+    }
+    previousIds = {user: int(community) for community, info in previousCommunities.items() for user in info["members"]}
+
+    # New users following most of one clique and followed back by a part of it
+    newUsers = {"new0": 0, "new1": 0, "new2": 3, "new3": 5}
+    for user, clique in newUsers.items():
+        members = [f"user{clique}_{index}" for index in range(6)]
+        data[user] = {"following": members[:5], "commentedOn": [], "hashtags": []}
+        for member in members[:3]:
+            data[member]["following"].append(user)
+
+    usersByCommunity, _ = extractor.extractIncremental(data, previousCommunities, seed=0)
+
+    assert {user: usersByCommunity[user] for user in previousIds} == previousIds
+    for user, clique in newUsers.items():
+        assert usersByCommunity[user] == previousIds[f"user{clique}_0"]
+    assert set(usersByCommunity.values()) == set(previousIds.values())
+
+@pytest.mark.parametrize("weights", [(1.0, 2.0, 0.5), (0.5, 4.0, 0.0), (0.0, 0.0, 1.0), (0.0, 0.0, 0.0)])
+def test_combinedLayersMatchBuiltGraph(weights):
+    data = bridgedCliquePairs(3, 4, 3)
+    for index, user in enumerate(data):
+        data[user]["commentedOn"] = [other for other in list(data)[index + 1:index + 4]]
+        data[user]["hashtags"] += [f"#shared{index % 3}"]
+
+    combined = GraphBuilder().buildLayers(data).combine(*weights)
+    built = GraphBuilder(*weights).build(data)
+
+    assert combined.names == built.names
+    assert combined.sources.tolist() == built.sources.tolist()
+    assert combined.targets.tolist() == built.targets.tolist()
+    assert combined.weights == pytest.approx(built.weights)
+
+@pytest.mark.parametrize("extractorType", [LeidenExtractor, LouvainExtractor])
+def test_sweepWeightsPartitionsEveryTriple(extractorType):
+    data = cliqueData(6, 5)
+    weightGrid = [(1.0, 2.0, 0.5), (2.0, 1.0, 0.0)]
+
+    results = extractorType().sweepWeights(data, weightGrid, workers=2)
+
+    assert [(row["followingWeight"], row["commentedWeight"], row["hashtagWeight"]) for row in results] == weightGrid
+    assert all(row["communities"] == 6 and row["modularity"] > 0.7 for row in results)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sweepResolutionsReportsEveryResolution(workers):
+    data = cliqueData(6, 5)
+    graph = GraphBuilder().build(data).toGraph(True)
+
+    results = LeidenExtractor().sweepResolutions(data, [2.0, 1.0, 0.01], workers=workers, seed=1)
+
+    assert [row["resolution"] for row in results] == [0.01, 1.0, 2.0]
+    assert results[0]["communities"] == 1 and results[1]["communities"] == 6
+    assert results[2]["communities"] >= 6
+
+    previous = None
+    for row in results:
+        partition = leidenalg.RBConfigurationVertexPartition(graph, initial_membership=row["membership"],
+                                                             weights="weight", resolution_parameter=row["resolution"])
+        assert row["quality"] == pytest.approx(partition.quality())
+        assert row["communities"] == len(set(row["membership"]))
+        assert row["modularity"] == pytest.approx(graph.modularity(row["membership"], weights="weight"))
+
+        expected = None if previous is None else ig.compare_communities(previous, row["membership"], method="nmi")
+        assert row["stability"] == pytest.approx(expected)
+        previous = row["membership"]
+
+    # The cliques are the partition at the modularity resolution
+    assert partitionOf(dict(zip(graph.vs["name"], results[1]["membership"]))) == {
+        frozenset(f"user{clique}_{index}" for index in range(5)) for clique in range(6)
+    }
+    assert results[1]["stability"] == 0.0
+
+def test_incrementalUpdateRejectsNonNumericCommunityIds():
+    data = cliqueData(2, 4)
+    previousCommunities = {
+        "0": {"members": [f"user0_{index}" for index in range(4)]},
+        "second": {"members": [f"user1_{index}" for index in range(4)]},
+    }
+
+    with pytest.raises(ValueError, match="'second'"):
+        LeidenExtractor().extractIncremental(data, previousCommunities)
+
+# Users sharing hashtags, user4 lists one hashtag twice and user3 shares none
+HASHTAG_USERS = {
+    "user0": {"hashtags": ["#a", "#b", "#c"]},
+    "user1": {"hashtags": ["#a", "#b"]},
+    "user2": {"hashtags": ["#b", "#d"]},
+    "user3": {"hashtags": ["#e"]},
+    "user4": {"hashtags": ["#a", "#a"]},
+}
+
+def test_hashtagEdgesMatchPairwiseWeights():
+    userIds = {user: index for index, user in enumerate(HASHTAG_USERS)}
+    sources, targets, weights = hashtagEdges(HASHTAG_USERS, userIds, 0.5)
+    found = dict(zip(zip(sources.tolist(), targets.tolist()), weights.tolist()))
+
+    # hashtagWeight for every shared hashtag of the two users in both directions, as the pairwise loop added them
+    expected = {(0, 1): 1.0, (0, 2): 0.5, (0, 4): 0.5, (1, 2): 0.5, (1, 4): 0.5}
+    expected |= {(target, source): weight for (source, target), weight in expected.items()}
+    assert found == expected
+
+    # Hashtags of more than two users (#a, #b) are skipped
+    sources, _, _ = hashtagEdges(HASHTAG_USERS, userIds, 0.5, maxHashtagUsers=2)
+    assert len(sources) == 0
+
+def legacyWeights(data: dict, followingWeight: float, commentedWeight: float,
+                  hashtagWeight: float) -> dict[tuple[str, str], float]:
+    """
+    :return: Directed edge weights as the extractors computed them before GraphBuilder, user by user
+    """
+    hashtagUsers = dict()
+    for user, info in data.items():
+        for tag in info.get('hashtags', []):
+            hashtagUsers.setdefault(tag, set()).add(user)
+
+    edgeWeights = dict()
+    for user, info in data.items():
+        for followed in info.get('following', []):
+            edgeWeights[(user, followed)] = edgeWeights.get((user, followed), 0.0) + followingWeight
+        for commentedOn in info.get('commentedOn', []):
+            edgeWeights[(user, commentedOn)] = edgeWeights.get((user, commentedOn), 0.0) + commentedWeight
+        for hashtag in set(info.get('hashtags', [])):
+            for otherUser in hashtagUsers[hashtag]:
+                if user != otherUser:
+                    edgeWeights[(user, otherUser)] = edgeWeights.get((user, otherUser), 0.0) + hashtagWeight
+
+    return edgeWeights
+
+def relationData(numUsers: int, seed: int = 0) -> dict:
+    """
+    :return: User data with random follows, comments and hashtags, some of the related users are not in the data
+    """
+    random = np.random.default_rng(seed)
+    users = [f"user{index}" for index in range(numUsers)]
+
+    data = dict()
+    for user in users:
+        others = [other for other in users + ["outside0", "outside1"] if other != user]
+        data[user] = {
+            "following": sorted(set(random.choice(others, random.integers(0, 6)).tolist())),
+            "commentedOn": sorted(set(random.choice(others, random.integers(0, 3)).tolist())),
+            "hashtags": sorted({f"#tag{tag}" for tag in random.integers(0, 12, random.integers(0, 4))}),
+        }
+
+    return data
+
+def weightsOf(edges) -> dict[tuple[str, str], float]:
+    names = edges.names
+    return {(names[source], names[target]): weight
+            for source, target, weight in zip(edges.sources.tolist(), edges.targets.tolist(), edges.weights.tolist())}
+
+@pytest.mark.parametrize("weights", [(1.0, 2.0, 0.5), (0.5, 3.0, 1.5)])
+def test_builtGraphMatchesLegacyWeights(weights):
+    data = relationData(40)
+
+    edges = GraphBuilder(*weights).build(data)
+    legacy = legacyWeights(data, *weights)
+
+    assert edges.names[:len(data)] == list(data)
+    assert set(edges.names[len(data):]) == {user for pair in legacy for user in pair} - set(data)
+    assert weightsOf(edges) == pytest.approx(legacy)
+
+def test_undirectedGraphSumsReciprocalWeights():
+    data = relationData(40)
+    legacy = legacyWeights(data, 1.0, 2.0, 0.5)
+
+    # The Louvain extractor used to collapse the directed graph in igraph, summing both directions
+    names = sorted({user for pair in legacy for user in pair})
+    graph = ig.Graph(n=len(names), edges=[(names.index(source), names.index(target)) for source, target in legacy],
+                     directed=True, edge_attrs={"weight": list(legacy.values())})
+    graph = graph.as_undirected(combine_edges="sum")
+    expected = {frozenset((names[edge.source], names[edge.target])): edge["weight"] for edge in graph.es}
+
+    undirected = GraphBuilder().build(data).undirected()
+    found = {frozenset(pair): weight for pair, weight in weightsOf(undirected).items()}
+
+    assert undirected.numEdges == len(expected)
+    assert found == pytest.approx(expected)
+    assert any(weight > 2.0 for weight in found.values())
@@ -0,0 +1,16 @@
+import pytest
+
+from GeneratingCommunities.communityPostprocessing import extractCommunities
+from RelationshipExtractor import LeidenExtractor
+
+@pytest.mark.parametrize("mode", [
+    {"consensusRuns": 3}, {"hierarchyMaxSize": 2}, {"previousCommunities": {"0": {"members": ["a"]}}},
+])
+def test_pruningIsNotIgnoredInOtherModes(mode):
+    data = {"a": {"following": ["b"], "commentedOn": [], "hashtags": []}}
+
+    with pytest.raises(ValueError, match="pruneCore"):
+        extractCommunities(LeidenExtractor(pruneCore=2), data, **mode)
+
+    # Without the pruning the modes run
+    extractCommunities(LeidenExtractor(), data, **mode)
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+from datasetGenerator import createPostDump, generateDataset, postDump
+from dumpParsing import getCommentsDataFromFile
+
+def jsPostDump(count: int, hashtags: list[str], comments: list[str]) -> str:
+    # count + '\n' + filteredTagHrefs.join('\n') + '\n\n' + filteredComments.join('\n') from postScript.js
+    return str(count) + "\n" + "\n".join(hashtags) + "\n\n" + "\n".join(comments)
+
+def test_postDumpMatchesJsLayout():
+    comments = ["@user0000001$lol$3", "@user0000002$so true$1.2K"]
+
+    assert postDump(12, ["#tag1", "#tag2"], comments) == jsPostDump(12, ["#tag1", "#tag2"], comments)
+    assert postDump(12, [], comments) == jsPostDump(12, [], comments)
+    assert postDump(0, [], []) == jsPostDump(0, [], [])
+
+    # The untagged post keeps the empty hashtag line, the parsers look for it after the count
+    assert postDump(12, [], comments).startswith("12\n\n\n@")
+
+def test_generatedPostsRoundTrip(tmp_path):
+    random = np.random.default_rng(3)
+    activityCdf = np.linspace(0.01, 1, 100)
+    hashtagCdf = np.linspace(0.1, 1, 10)
+
+    untagged = tagged = 0
+    for index in range(60):
+        text = createPostDump(random, 0, 2.0, activityCdf, hashtagCdf, 100)
+        count, rest = text.split("\n", 1)
+        header, commentBlock = rest.split("\n\n", 1)
+        postHashtags = [line for line in header.split("\n") if line != ""]
+
+        assert text == jsPostDump(int(count), postHashtags, commentBlock.split("\n"))
+
+        filename = tmp_path / f"@creator-video-{index}.txt"
+        filename.write_text(text, encoding="utf-8")
+        parsedCount, hashtags, comments, _ = getCommentsDataFromFile(str(filename))
+
+        assert parsedCount == int(count)
+        assert set(postHashtags) <= hashtags
+        assert len(comments) > 0
+
+        if postHashtags:
+            tagged += 1
+        else:
+            untagged += 1
+            assert rest.startswith("\n\n")
+
+    assert tagged > 0 and untagged > 0
+
+def test_generatedDatasetParses(tmp_path):
+    generateDataset(str(tmp_path), 300, seed=1)
+
+    for name in os.listdir(tmp_path / "comments"):
+        count, _, _, _ = getCommentsDataFromFile(str(tmp_path / "comments" / name))
+        assert count >= 0
@@ -0,0 +1,92 @@
+import re
+
+import pytest
+
+from datasetGenerator import postDump
+from dumpParsing import convertSimpleIntToInt, createFollowsRecord, getCommentsDataFromFile, readFollowsChunks
+
+def lineParser(filename: str) -> tuple[int, set[str], set[tuple[str, str, int]]]:
+    """
+    The line parser used before tokenizeCommentsDump() for the dumps without continuation lines
+    """
+    with open(filename, "r", encoding="UTF-8") as f:
+        count = int(f.readline().strip())
+        text = f.read()
+
+    hashtagSection, _, commentSection = text.partition("\n\n")
+    hashtags = {tag for tag in hashtagSection.split("\n") if tag != ""}
+
+    comments = set()
+    for line in commentSection.split("\n"):
+        sep = line.split("$")
+        hashtags.update(re.findall(r'#\w+', sep[1]))
+        comments.add((sep[0], sep[1], convertSimpleIntToInt(sep[2])))
+
+    return count, hashtags, comments
+
+def test_emptyLikesCountAsZero(tmp_path):
+    filename = tmp_path / "@creator-video.txt"
+    filename.write_text(postDump(3, ["#a"], ["@bob$no likes$", "@amy$some$1.2K"]), encoding="utf-8")
+
+    count, hashtags, comments, malformed = getCommentsDataFromFile(str(filename))
+
+    assert malformed == 0
+    assert (count, hashtags, comments) == lineParser(str(filename))
+    assert ("@bob", "no likes", 0) in comments
+
+def test_invalidLikesAreSkippedAndCounted(tmp_path):
+    filename = tmp_path / "@creator-video.txt"
+    filename.write_text(postDump(3, [], ["@bob$nice$12", "@amy$typo$1.2.3", "@cid$words$many"]), encoding="utf-8")
+
+    # The line parser failed on the whole file
+    with pytest.raises(ValueError):
+        lineParser(str(filename))
+
+    count, _, comments, malformed = getCommentsDataFromFile(str(filename))
+
+    assert count == 3
+    assert comments == {("@bob", "nice", 12)}
+    assert malformed == 2
+
+@pytest.mark.parametrize("countLine", ["", "abc", "NaN", "-1", "1.2K"])
+def test_malformedCountRejectsTheFile(tmp_path, countLine):
+    filename = tmp_path / "@creator-video.txt"
+    filename.write_text(countLine + "\n#a\n\n@bob$nice$1", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="total comments count"):
+        getCommentsDataFromFile(str(filename))
+
+def writeFollows(directory, names: list[str]) -> str:
+    filename = directory / "@anna (Followers).txt"
+    filename.write_text("\n".join([str(len(names))] + names) + "\n", encoding="utf-8")
+
+    return str(filename)
+
+@pytest.mark.parametrize("numNames", [4, 5])
+def test_followsChunksSplitAtChunkSize(tmp_path, numNames):
+    filename = writeFollows(tmp_path, [f"@user{index}" for index in range(numNames)])
+
+    chunks = list(readFollowsChunks(filename, chunkSize=4))
+
+    assert [len(chunk) for chunk in chunks] == ([4] if numNames == 4 else [4, 1])
+    assert [name for chunk in chunks for name in chunk] == [f"@user{index}" for index in range(numNames)]
+
+def test_followsChunksSkipRepeatedNamesAndBlankLines(tmp_path):
+    # "@bob" and "@amy" repeat in later chunks, the blank lines are left by the scrolling script
+    filename = writeFollows(tmp_path, ["@amy", "@bob", "", "@carl", "@bob", "@dora", "", "", "@amy", "@eve"])
+
+    chunks = list(readFollowsChunks(filename, chunkSize=2))
+
+    assert chunks == [["@amy", "@bob"], ["@carl", "@dora"], ["@eve"]]
+
+def test_streamedFollowsRecordHasTheSameUsers(tmp_path):
+    names = [f"@user{index % 7}" for index in range(30)] + ["", "@zed"]
+    filename = writeFollows(tmp_path, names)
+
+    streamed = createFollowsRecord(filename, streamed=True)
+    listed = createFollowsRecord(filename)
+
+    streamedUsers = [name for chunk in streamed.pop("chunks") for name in chunk]
+    assert len(streamedUsers) == len(set(streamedUsers))
+    assert sorted(streamedUsers) == listed.pop("users") == sorted(set(names) - {""})
+    assert streamed == listed == {"type": "follows", "account": "@anna", "kind": "Followers", "count": 32}
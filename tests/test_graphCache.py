@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from GeneratingCommunities.graphCache import GraphCache
+from RelationshipExtractor import GraphBuilder
+from sourceManifest import SourceManifest
+
+DATA = {
+    "@a": {"following": ["@b"], "commentedOn": ["@c"], "hashtags": ["#x"]},
+    "@b": {"following": ["@a"], "commentedOn": [], "hashtags": ["#x"]},
+    "@c": {"following": [], "commentedOn": [], "hashtags": []},
+}
+
+def createCache(directory, **limits) -> GraphCache:
+    return GraphCache(str(directory), SourceManifest(str(directory / "sources.manifest")), **limits)
+
+def writeData(filename, data: dict, mtime: int) -> None:
+    filename.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(filename, ns=(mtime, mtime))
+
+def test_keyChangesWithConfigurationAndContent(tmp_path):
+    cache = createCache(tmp_path / "cache")
+    dataFile = tmp_path / "data.json"
+    writeData(dataFile, DATA, 10**9)
+
+    key = cache.key(str(dataFile), GraphBuilder())
+    assert cache.key(str(dataFile), GraphBuilder()) == key
+    assert cache.key(str(dataFile), GraphBuilder(hashtagWeight=1.0)) != key
+
+    # Touched with the same content keeps the key, a changed content of the same size doesn't
+    writeData(dataFile, DATA, 2 * 10**9)
+    assert cache.key(str(dataFile), GraphBuilder()) == key
+    writeData(dataFile, dict(DATA, **{"@c": {"following": ["@d"], "commentedOn": [], "hashtags": []}}), 3 * 10**9)
+    assert cache.key(str(dataFile), GraphBuilder()) != key
+
+def test_cachedGraphRoundTrips(tmp_path):
+    cache = createCache(tmp_path / "cache")
+    dataFile = tmp_path / "data.json"
+    writeData(dataFile, DATA, 10**9)
+
+    built = cache.getOrBuild(str(dataFile), DATA, GraphBuilder())
+    cached = cache.get(cache.key(str(dataFile), GraphBuilder()))
+
+    assert cached.names == built.names
+    assert cached.namedPairs() == built.namedPairs()
+    assert cached.weights.tolist() == built.weights.tolist()
+
+def test_leastRecentlyUsedGraphsAreEvicted(tmp_path):
+    edges = GraphBuilder().build(DATA)
+    cache = createCache(tmp_path / "cache", maxEntries=2)
+
+    for key in ("first", "second"):
+        cache.put(key, edges)
+    graphFile = tmp_path / "cache" / "first.graph"
+    os.utime(graphFile, ns=(0, 0))
+    os.utime(tmp_path / "cache" / "second.graph", ns=(10**9, 10**9))
+
+    # Reading the first graph makes it the most recently used one
+    assert cache.get("first") is not None
+    cache.put("third", edges)
+    assert cache.get("second") is None
+    assert cache.get("first") is not None and cache.get("third") is not None
+
+    # The byte limit keeps only as many graphs as fit, but always the newest one
+    limited = createCache(tmp_path / "limited", maxEntries=8, maxBytes=os.path.getsize(graphFile) + 1)
+    for key in ("first", "second"):
+        limited.put(key, edges)
+        os.utime(tmp_path / "limited" / f"{key}.graph", ns=(10**9 * len(key), 10**9 * len(key)))
+    limited.put("third", edges)
+    assert sorted(os.listdir(tmp_path / "limited")) == ["third.graph"]
+
+@pytest.mark.parametrize("corruption", [b"", b"not a snapshot", None])
+def test_corruptGraphIsRebuilt(tmp_path, corruption):
+    cache = createCache(tmp_path / "cache")
+    dataFile = tmp_path / "data.json"
+    writeData(dataFile, DATA, 10**9)
+
+    built = cache.getOrBuild(str(dataFile), DATA, GraphBuilder())
+    key = cache.key(str(dataFile), GraphBuilder())
+    graphFile = tmp_path / "cache" / f"{key}.graph"
+
+    content = graphFile.read_bytes()
+    # None cuts the arrays off, the header stays readable
+    graphFile.write_bytes(content[:len(content) // 2] if corruption is None else corruption)
+
+    assert cache.get(key) is None
+    assert cache.getOrBuild(str(dataFile), DATA, GraphBuilder()).namedPairs() == built.namedPairs()
+    assert cache.get(key) is not None
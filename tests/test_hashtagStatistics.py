@@ -0,0 +1,89 @@
+import itertools
+
+import numpy as np
+
+from hashtagStatistics import HashtagStatistics
+
+POSTS = [
+    {"#a", "#b", "#c"},
+    {"#a", "#b"},
+    {"#b", "#d"},
+    set(),
+    {"#c"},
+    {"#a", "#b", "#c", "#ü"},
+]
+
+def legacyStatistics(posts: list[set[str]]) -> dict:
+    """
+    :return: Hashtag .json file as the old DataParser stored it, post by post
+    """
+    data = {}
+    for hashtags in posts:
+        for tag in hashtags:
+            if tag in data:
+                data[tag]["count"] += 1
+                data[tag]["connections"] = list(set(data[tag]["connections"]).union(hashtags))
+                data[tag]["connections"].remove(tag)
+            else:
+                data[tag] = {"count": 1, "connections": list(hashtags)}
+                data[tag]["connections"].remove(tag)
+
+    return data
+
+def statisticsOf(posts: list[set[str]]) -> HashtagStatistics:
+    statistics = HashtagStatistics()
+    for hashtags in posts:
+        statistics.addPost(hashtags)
+
+    return statistics
+
+def sortedConnections(data: dict) -> dict:
+    return {tag: {"count": info["count"], "connections": sorted(info["connections"])} for tag, info in data.items()}
+
+def test_cooccurrenceCountsArePostWeighted():
+    statistics = statisticsOf(POSTS)
+
+    for tag in ("#a", "#b", "#c", "#d", "#ü"):
+        assert statistics.count(tag) == sum(tag in hashtags for hashtags in POSTS)
+    for tag, other in itertools.permutations(["#a", "#b", "#c", "#d", "#ü"], 2):
+        assert statistics.weight(tag, other) == sum(tag in hashtags and other in hashtags for hashtags in POSTS)
+
+    assert statistics.connections("#a") == {"#b": 3, "#c": 2, "#ü": 1}
+    assert statistics.count("#missing") == 0 and statistics.weight("#a", "#a") == 0
+
+def test_foldingInBulkKeepsTheCounts(monkeypatch):
+    monkeypatch.setattr(HashtagStatistics, "FOLD_SIZE", 2)
+    folded = statisticsOf(POSTS)
+
+    assert folded.toJson() == statisticsOf(POSTS).toJson()
+    assert all(np.array_equal(first, second) for first, second in zip(folded.coo(), statisticsOf(POSTS).coo()))
+
+def test_toJsonMatchesLegacyHashtagFile():
+    assert sortedConnections(statisticsOf(POSTS).toJson()) == sortedConnections(legacyStatistics(POSTS))
+
+def test_saveAndLoadRoundTrip(tmp_path):
+    statistics = statisticsOf(POSTS)
+    statistics.save(str(tmp_path / "hashtags.npz"))
+
+    loaded = HashtagStatistics.load(str(tmp_path / "hashtags.npz"))
+
+    assert loaded.names() == statistics.names()
+    assert np.array_equal(loaded.counts(), statistics.counts())
+    assert all(np.array_equal(first, second) for first, second in zip(loaded.coo(), statistics.coo()))
+
+    # The loaded statistics keep counting
+    loaded.addPost({"#a", "#d"})
+    assert loaded.weight("#a", "#d") == 1 and loaded.count("#a") == 4
+
+def test_changedPostReplacesItsPreviousCounts():
+    changed = statisticsOf(POSTS)
+    # The last post lost "#c" and "#ü" and got "#d", the first one lost all its hashtags
+    changed.addPost({"#a", "#b", "#d"}, POSTS[5])
+    changed.addPost(set(), POSTS[0])
+
+    fresh = statisticsOf(POSTS[1:5] + [{"#a", "#b", "#d"}])
+
+    assert sortedConnections(changed.toJson()) == sortedConnections(fresh.toJson())
+    for tag, other in itertools.permutations(["#a", "#b", "#c", "#d", "#ü"], 2):
+        assert changed.weight(tag, other) == fresh.weight(tag, other)
+    assert "#ü" not in changed.toJson()
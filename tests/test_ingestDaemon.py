@@ -0,0 +1,50 @@
+from datasetGenerator import postDump
+from ingestDaemon import IngestDaemon
+from jsonTransfer import DataParser
+from sqliteStorage import SqliteStorage
+
+def test_malformedDumpInBatchKeepsOtherFiles(tmp_path):
+    dumps = tmp_path / "dumps"
+    dumps.mkdir()
+
+    (dumps / "@anna-video-1.txt").write_text(postDump(2, ["#a"], ["@bob$hi$1"]), encoding="utf-8")
+    # Fails while the record is created, before anything is applied onto the storage
+    (dumps / "@bella-video-1.txt").write_text("not a count\n#b\n\n@carl$hey$2", encoding="utf-8")
+    (dumps / "@cecil-video-1.txt").write_text(postDump(1, [], ["@dora$yo$0"]), encoding="utf-8")
+
+    storage = SqliteStorage(str(tmp_path / "data.db"))
+    parser = DataParser(str(tmp_path / "data.json"), str(tmp_path / "hashtags.json"), storage=storage)
+    parser.parsedSourceFile = str(tmp_path / "parsedSources.txt")
+    parser.manifestFile = str(tmp_path / "parsedSources.manifest")
+
+    daemon = IngestDaemon(parser, str(dumps), settleSeconds=0, flushSeconds=3600)
+    parser.startBatch()
+
+    # The failure rolls back the file applied before it, so it is parsed again in the next step
+    assert daemon.step() == 1
+    assert daemon.step() == 1
+    assert daemon.step() == 0
+    daemon.flush()
+    parser.endBatch()
+
+    assert daemon.appliedFiles == 2
+    assert daemon.failedFiles == 1
+    assert sorted(storage) == ["@anna", "@bob", "@cecil", "@dora"]
+    assert storage.commentersOf("@anna") == ["@bob"]
+    storage.close()
+
+def test_malformedLinesReportedByDaemon(tmp_path, capsys):
+    dumps = tmp_path / "dumps"
+    dumps.mkdir()
+    (dumps / "@anna-video-1.txt").write_text(postDump(2, [], ["@bob$hi$1", "@carl$hey$many"]), encoding="utf-8")
+
+    parser = DataParser(str(tmp_path / "data.json"), str(tmp_path / "hashtags.json"))
+    parser.parsedSourceFile = str(tmp_path / "parsedSources.txt")
+    parser.manifestFile = str(tmp_path / "parsedSources.manifest")
+
+    daemon = IngestDaemon(parser, str(dumps), settleSeconds=0, flushSeconds=3600)
+    assert daemon.step() == 1
+
+    assert daemon.malformedLines == 1
+    assert parser.malformedLines == {}
+    assert "1 malformed comment lines" in capsys.readouterr().out
@@ -0,0 +1,146 @@
+import json
+import os
+
+import pytest
+
+from datasetGenerator import postDump
+from ingestLog import IngestLog
+from jsonTransfer import DataParser
+from sourceManifest import SourceManifest
+
+DUMPS = {
+    "@anna-video-1.txt": postDump(3, ["#a", "#b"], ["@bob$hi$1", "@carl$nice$2K"]),
+    "@bella-video-1.txt": postDump(2, ["#b", "#c"], ["@anna$hey$0", "@bob$again #b$5"]),
+    "@cecil-video-1.txt": postDump(1, [], ["@dora$first$3"]),
+    "@dora-video-1.txt": postDump(4, ["#a", "#c", "#d"], ["@anna$wow$1.5M", "@cecil$yo$7"]),
+}
+
+class Crash(Exception):
+    pass
+
+def createParser(directory) -> DataParser:
+    parser = DataParser(str(directory / "data.json"), str(directory / "hashtags.json"),
+                        logFile=str(directory / "ingest.log"))
+    parser.parsedSourceFile = str(directory / "parsedSources.txt")
+    parser.manifestFile = str(directory / "parsedSources.manifest")
+
+    return parser
+
+def writeDumps(directory) -> list[str]:
+    dumps = directory / "dumps"
+    dumps.mkdir()
+    for name, text in DUMPS.items():
+        (dumps / name).write_text(text, encoding="utf-8")
+
+    return [str(dumps / name) for name in DUMPS]
+
+def state(directory) -> tuple[dict, dict, set[str]]:
+    """
+    :return: User data and hashtag statistics with the lists sorted, and the dumps noted in the manifest
+    """
+    stores = []
+    for name in ("data.json", "hashtags.json"):
+        with open(directory / name) as file:
+            store = json.load(file)
+        for info in store.values():
+            for key, value in info.items():
+                if isinstance(value, list):
+                    info[key] = sorted(value, key=lambda item: json.dumps(item, sort_keys=True))
+        stores.append(store)
+
+    manifest = SourceManifest(str(directory / "parsedSources.manifest"))
+    sources = {name for name in DUMPS if str(directory / "dumps" / name) in manifest}
+
+    return stores[0], stores[1], sources
+
+@pytest.fixture
+def uninterrupted(tmp_path):
+    directory = tmp_path / "uninterrupted"
+    directory.mkdir()
+    parser = createParser(directory)
+    for source in writeDumps(directory):
+        assert parser.parseFileCommentsData(source)
+    parser.compactLog()
+
+    return state(directory)
+
+def test_tornLastLineIsDroppedOnReplay(tmp_path, uninterrupted):
+    parser = createParser(tmp_path)
+    sources = writeDumps(tmp_path)
+    for source in sources[:3]:
+        assert parser.parseFileCommentsData(source)
+
+    # The crash cut the line of the last source in half
+    with open(tmp_path / "ingest.log", "rb") as file:
+        line = file.read().splitlines(keepends=True)[-1]
+    parser.parseFileCommentsData(sources[3])
+    with open(tmp_path / "ingest.log", "r+b") as file:
+        file.truncate(file.seek(0, os.SEEK_END) - len(line) // 2)
+
+    log = IngestLog(str(tmp_path / "ingest.log"))
+    assert set(log.sources()) == set(sources[:3])
+    assert len(list(log.entries())) == 3
+
+    parser = createParser(tmp_path)
+    assert parser.parseFileCommentsData(sources[3])
+    parser.compactLog()
+
+    assert state(tmp_path) == uninterrupted
+
+def test_crashAfterCommitIsFinishedOnNextOpen(tmp_path, monkeypatch, uninterrupted):
+    parser = createParser(tmp_path)
+    sources = writeDumps(tmp_path)
+    for source in sources:
+        assert parser.parseFileCommentsData(source)
+
+    # The crash comes after the first snapshot got swapped in
+    replace = os.replace
+    replaced = []
+    def crashingReplace(source, target):
+        if len(replaced) == 1:
+            raise Crash()
+        replaced.append(target)
+        replace(source, target)
+
+    with monkeypatch.context() as context:
+        context.setattr(os, "replace", crashingReplace)
+        with pytest.raises(Crash):
+            parser.compactLog()
+
+    assert os.path.exists(tmp_path / "ingest.log.commit")
+
+    # The reopened parser finishes the compaction when it first looks at the log, the sources stay parsed
+    parser = createParser(tmp_path)
+    assert not parser.parseFileCommentsData(sources[0])
+
+    assert not os.path.exists(tmp_path / "ingest.log.commit")
+    assert not os.path.exists(tmp_path / "ingest.log.compacting")
+    assert state(tmp_path) == uninterrupted
+
+def test_crashBeforeCommitKeepsOldDataAndLog(tmp_path, monkeypatch, uninterrupted):
+    parser = createParser(tmp_path)
+    sources = writeDumps(tmp_path)
+    assert parser.parseFileCommentsData(sources[0])
+    parser.compactLog()
+    compacted = state(tmp_path)
+
+    for source in sources[1:3]:
+        assert parser.parseFileCommentsData(source)
+
+    with monkeypatch.context() as context:
+        context.setattr(IngestLog, "commitCompaction", lambda self, replacements: (_ for _ in ()).throw(Crash()))
+        with pytest.raises(Crash):
+            parser.compactLog()
+
+    assert not os.path.exists(tmp_path / "ingest.log.commit")
+    assert state(tmp_path) == compacted
+    assert [source for source, _, _ in IngestLog(str(tmp_path / "ingest.log")).entries(
+        str(tmp_path / "ingest.log.compacting"))] == sources[1:3]
+
+    # The sources of the interrupted compaction stay parsed, a new one joins the next compaction
+    parser = createParser(tmp_path)
+    assert not parser.parseFileCommentsData(sources[1])
+    assert parser.parseFileCommentsData(sources[3])
+    parser.compactLog()
+
+    assert state(tmp_path) == uninterrupted
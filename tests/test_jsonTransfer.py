@@ -0,0 +1,187 @@
+import json
+import os
+
+import pytest
+
+from datasetGenerator import postDump
+from jsonTransfer import DataParser
+from sqliteStorage import SqliteStorage
+
+FIRST_VERSION = postDump(5, ["#a"], ["@alice$nice video$3", "@bob$first$1", "@carol$wow$2"])
+# Likes changed, one comment is gone, one is new and the post got another hashtag
+CHANGED_VERSION = postDump(7, ["#a", "#b"], ["@alice$nice video$10", "@bob$first$1", "@dave$late$0"])
+
+def createParser(directory, mode: str) -> DataParser:
+    storage = SqliteStorage(str(directory / "data.db")) if mode == "sqlite" else None
+    logFile = str(directory / "ingest.log") if mode == "log" else None
+
+    parser = DataParser(str(directory / "data.json"), str(directory / "hashtags.json"), logFile=logFile,
+                        storage=storage)
+    parser.parsedSourceFile = str(directory / "parsedSources.txt")
+    parser.manifestFile = str(directory / "parsedSources.manifest")
+
+    return parser
+
+def ingest(directory, mode: str, versions: list[str]) -> tuple[dict, dict]:
+    """
+    Parses every version of the same post dump in turn
+    :return: User data and hashtag statistics after the last version, with the lists sorted
+    """
+    directory.mkdir()
+    parser = createParser(directory, mode)
+    source = directory / "@creator-video.txt"
+
+    for index, version in enumerate(versions):
+        source.write_text(version, encoding="utf-8")
+        os.utime(source, ns=(index * 10**9, index * 10**9))
+        assert parser.parseFileCommentsData(str(source))
+
+    if mode == "log":
+        parser.compactLog()
+    if mode == "sqlite":
+        parser.exportJson()
+
+    return readStores(directory)
+
+def readStores(directory) -> tuple[dict, dict]:
+    """
+    :return: User data and hashtag statistics of the directory, with the lists sorted
+    """
+    with open(directory / "data.json") as file:
+        data = json.load(file)
+    with open(directory / "hashtags.json") as file:
+        hashtags = json.load(file)
+
+    for info in list(data.values()) + list(hashtags.values()):
+        for name, value in info.items():
+            if isinstance(value, list):
+                info[name] = sorted(value, key=lambda item: json.dumps(item, sort_keys=True))
+
+    return data, hashtags
+
+@pytest.mark.parametrize("mode", ["json", "log", "sqlite"])
+def test_changedCommentsDumpMatchesFreshIngest(tmp_path, mode):
+    reingested = ingest(tmp_path / "reingested", mode, [FIRST_VERSION, CHANGED_VERSION])
+    fresh = ingest(tmp_path / "fresh", mode, [CHANGED_VERSION])
+
+    data, _ = reingested
+    assert data["@alice"]["commentsPosted"] == [{"text": "nice video", "likes": 10, "hashtags": ["#a", "#b"]}]
+    assert data["@bob"]["commentsPosted"] == [{"text": "first", "likes": 1, "hashtags": ["#a", "#b"]}]
+    assert data["@carol"]["commentsPosted"] == []
+
+    # Carol stays a commenter of the creator, the connections are only ever added
+    del data["@carol"]
+    data["@creator"]["commenters"].remove("@carol")
+    assert reingested == fresh
+
+@pytest.mark.parametrize("mode", ["json", "log", "sqlite"])
+def test_changedCommentsDumpReplacesItsHashtagCounts(tmp_path, mode):
+    # The post lost "#a" and got "#c"
+    original = postDump(5, ["#a", "#b"], ["@alice$nice video$3"])
+    retagged = postDump(5, ["#b", "#c"], ["@alice$nice video$3"])
+    _, reingested = ingest(tmp_path / "reingested", mode, [original, retagged])
+    _, fresh = ingest(tmp_path / "fresh", mode, [retagged])
+
+    assert reingested == fresh == {"#b": {"count": 1, "connections": ["#c"]}, "#c": {"count": 1, "connections": ["#b"]}}
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_directoryFilesAppliedInSortedOrder(tmp_path, monkeypatch, workers):
+    dumps = tmp_path / "dumps"
+    dumps.mkdir()
+    for creator in ("@anna", "@bella", "@cecil"):
+        (dumps / f"{creator}-video.txt").write_text(postDump(1, [], [f"@dora${creator} hi$0"]), encoding="utf-8")
+
+    # The filesystem may list the files in any order
+    listdir = os.listdir
+    monkeypatch.setattr(os, "listdir", lambda directory: sorted(listdir(directory), reverse=True))
+
+    parser = createParser(tmp_path, "json")
+    parser.parseDirectoryCommentsData(str(dumps), workers=workers)
+
+    with open(tmp_path / "data.json") as file:
+        data = json.load(file)
+
+    assert [comment["text"] for comment in data["@dora"]["commentsPosted"]] == ["@anna hi", "@bella hi", "@cecil hi"]
+
+def test_malformedLinesCountedWithoutPrinting(tmp_path, capsys):
+    parser = createParser(tmp_path, "json")
+    source = tmp_path / "@creator-video.txt"
+    source.write_text(postDump(2, ["#a"], ["@alice$nice video$3", "@bob$first$many"]), encoding="utf-8")
+
+    assert parser.parseFileCommentsData(str(source))
+
+    assert parser.malformedLines == {str(source): 1}
+    assert capsys.readouterr().out == ""
+
+def writeDumpDirectories(directory) -> tuple[str, str]:
+    """
+    :return: Directories with a few comment dumps and follows dumps of the same users
+    """
+    comments = directory / "comments"
+    follows = directory / "follows"
+    comments.mkdir()
+    follows.mkdir()
+
+    (comments / "@anna-video-1.txt").write_text(postDump(3, ["#a", "#b"], ["@bob$hi$1", "@carl$nice #c$2K"]),
+                                                encoding="utf-8")
+    (comments / "@anna-video-2_q=search.txt").write_text(postDump(1, ["#b"], ["@bob$again$0"]), encoding="utf-8")
+    (comments / "@bella-video-1.txt").write_text(postDump(2, [], ["@anna$hey$5", "@dora$yo$1.2M"]),
+                                                 encoding="utf-8")
+    (comments / "@carl-video-1.txt").write_text(postDump(4, ["#a", "#c", "#d"], ["@bob$hi$1", "@anna$wow$3"]),
+                                                encoding="utf-8")
+    (comments / "--ignored.txt").write_text(postDump(1, ["#z"], ["@zed$no$0"]), encoding="utf-8")
+
+    (follows / "@anna (Followers).txt").write_text("5\n@bob\n@carl\n@dora", encoding="utf-8")
+    (follows / "@anna (Following).txt").write_text("2\n@bella\n@carl", encoding="utf-8")
+    (follows / "@bob (Following).txt").write_text("3\n@anna\n@bella\n@carl", encoding="utf-8")
+
+    return str(comments), str(follows)
+
+@pytest.mark.parametrize("flushEvery", [0, 1, 2])
+def test_batchIngestMatchesPerFileIngest(tmp_path, flushEvery):
+    perFile = tmp_path / "perFile"
+    perFile.mkdir()
+    comments, follows = writeDumpDirectories(tmp_path)
+
+    parser = createParser(perFile, "json")
+    for directory, parse in ((comments, parser.parseFileCommentsData), (follows, parser.parseFileFollowsData)):
+        for name in sorted(os.listdir(directory)):
+            if not name.startswith("--"):
+                assert parse(os.path.join(directory, name))
+
+    batch = tmp_path / "batch"
+    batch.mkdir()
+    parser = createParser(batch, "json")
+    parser.parseDirectoryCommentsData(comments, flushEvery=flushEvery)
+    parser.parseDirectoryFollowsData(follows, flushEvery=flushEvery)
+
+    assert readStores(batch) == readStores(perFile)
+    assert "@zed" not in readStores(batch)[0]
+
+    # Every flush noted the sources of its files
+    parser = createParser(batch, "json")
+    assert not parser.parseFileCommentsData(os.path.join(comments, "@carl-video-1.txt"))
+    assert not parser.parseFileFollowsData(os.path.join(follows, "@bob (Following).txt"))
+
+def test_sqliteExportMatchesJsonIngest(tmp_path):
+    stores = []
+    for mode in ("json", "sqlite"):
+        directory = tmp_path / mode
+        directory.mkdir()
+        comments, follows = writeDumpDirectories(directory)
+
+        parser = createParser(directory, mode)
+        parser.parseDirectoryCommentsData(comments)
+        parser.parseDirectoryFollowsData(follows)
+
+        # The first post changes and is parsed again
+        changed = os.path.join(comments, "@anna-video-1.txt")
+        with open(changed, "w", encoding="utf-8") as file:
+            file.write(postDump(4, ["#b", "#e"], ["@bob$hi$2", "@dora$late$0"]))
+        assert parser.parseFileCommentsData(changed)
+
+        if mode == "sqlite":
+            parser.exportJson()
+        stores.append(readStores(directory))
+
+    assert stores[0] == stores[1]
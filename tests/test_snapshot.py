@@ -0,0 +1,129 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from GeneratingCommunities import fileGetter
+from GeneratingCommunities.snapshot import CommunitySnapshot, UserSnapshot
+from GeneratingCommunities.userGraph import StringTable, UserGraph
+from RelationshipExtractor import GraphBuilder
+from communityPostprocessing import aggregateUsers
+
+def userData(numUsers: int, seed: int = 0) -> dict:
+    """
+    :return: User data with random follows, comments and hashtags, some of the followed users are not in the data
+    """
+    random = np.random.default_rng(seed)
+    users = [f"@user{index}" for index in range(numUsers)]
+
+    data = dict()
+    for user in users:
+        following = {str(other) for other in random.choice(users, random.integers(0, 8))}
+        following |= {f"@outside{other}" for other in random.integers(0, 20, random.integers(0, 2))}
+        following.discard(user)
+        data[user] = {
+            "following": sorted(following),
+            "followers": [],
+            "commentedOn": sorted({str(other) for other in random.choice(users, random.integers(0, 4))} - {user}),
+            "commenters": [],
+            "hashtags": sorted({f"#tag{tag}" for tag in random.integers(0, 30, random.integers(0, 6))}),
+            "commentsPosted": [
+                {"text": f"comment {user} {index}", "likes": int(random.integers(10)), "hashtags": ["#tag1"]}
+                for index in range(random.integers(0, 3))
+            ],
+        }
+
+    return data
+
+def namedEdges(edges) -> dict[tuple[str, str], float]:
+    return {
+        (edges.names[source], edges.names[target]): weight
+        for source, target, weight in zip(edges.sources.tolist(), edges.targets.tolist(), edges.weights.tolist())
+    }
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    data = userData(300)
+    UserSnapshot.save(data, str(tmp_path / "data.snapshot"))
+
+    # Reading the snapshot must not decode the users as a whole
+    def userById(self, userId):
+        raise AssertionError("a user was decoded")
+    monkeypatch.setattr(UserSnapshot, "userById", userById)
+
+    return data, UserSnapshot.open(str(tmp_path / "data.snapshot"))
+
+@pytest.mark.parametrize("settings", [dict(), dict(hashtagIdf=True, maxHashtagUsers=20)])
+def test_graphBuilderReadsTheSnapshotArrays(snapshot, settings):
+    data, userSnapshot = snapshot
+    builder = GraphBuilder(**settings)
+
+    expected = namedEdges(builder.build(data))
+    assert namedEdges(builder.build(UserGraph.fromData(data))) == pytest.approx(expected)
+    assert namedEdges(builder.build(userSnapshot)) == pytest.approx(expected)
+
+def test_aggregateUsersReadsTheSnapshotArrays(snapshot):
+    data, userSnapshot = snapshot
+    communityIndex = {user: index % 7 for index, user in enumerate(data)}
+
+    assert aggregateUsers(userSnapshot, communityIndex, 7) == aggregateUsers(data, communityIndex, 7)
+
+def test_aggregateUsersReadsTheUserGraphCommentTexts(tmp_path):
+    data = userData(300)
+    communityIndex = {user: index % 7 for index, user in enumerate(data)}
+    expected = aggregateUsers(data, communityIndex, 7)
+
+    graph = UserGraph.fromData(data)
+    graph.save(str(tmp_path / "graph.npz"))
+    loaded = UserGraph.load(str(tmp_path / "graph.npz"))
+
+    assert loaded.hasCommentTexts
+    assert aggregateUsers(graph, communityIndex, 7) == expected
+    assert aggregateUsers(loaded, communityIndex, 7) == expected
+
+    # A graph saved before it kept the texts can't describe the communities
+    texts = ("commentsIndptr", "commentTextOffsets", "commentTextBuffer")
+    arrays = {name: values for name, values in graph.toArrays().items() if name not in texts}
+    old = UserGraph.fromArrays(arrays)
+    assert not old.hasCommentTexts
+    with pytest.raises(ValueError):
+        aggregateUsers(old, communityIndex, 7)
+
+def test_getGraphDataUsesTheUserGraphOnlyWhenItIsNewer(tmp_path, monkeypatch):
+    data = userData(50)
+    monkeypatch.setattr(fileGetter, "DATA_SOURCE", str(tmp_path / "data.json"))
+    monkeypatch.setattr(fileGetter, "USER_GRAPH_SOURCE", str(tmp_path / "graph.npz"))
+
+    with open(tmp_path / "data.json", "w") as file:
+        json.dump(data, file)
+    assert fileGetter.getGraphData() == (data, str(tmp_path / "data.json"))
+
+    UserGraph.fromData(data).save(str(tmp_path / "graph.npz"))
+    graphData, graphSource = fileGetter.getGraphData()
+    assert isinstance(graphData, UserGraph) and graphSource == str(tmp_path / "graph.npz")
+    assert namedEdges(GraphBuilder().build(graphData)) == namedEdges(GraphBuilder().build(data))
+
+    # The data changed after the UserGraph was generated
+    os.utime(tmp_path / "graph.npz", (0, 0))
+    assert fileGetter.getGraphData()[1] == str(tmp_path / "data.json")
+
+def test_stringTablesRequireSortedStrings(tmp_path):
+    assert StringTable.fromStrings(["@a", "@b", "@é"]).find("@é") == 2
+    with pytest.raises(ValueError):
+        StringTable.fromStrings(["@b", "@a"])
+    with pytest.raises(ValueError):
+        StringTable.fromStrings(["@a", "@a"])
+
+    # Members, comments and ids of the communities are kept in their order and can't be searched
+    communities = {
+        "7": {"members": ["@zed", "@amy"], "connections": {"2": 1}, "hashtags": ["#b", "#a"], "comments": ["z", "a"]},
+        "2": {"members": ["@bob"], "connections": {"7": 1}, "hashtags": [], "comments": [], "parent": None},
+    }
+    CommunitySnapshot.save(communities, str(tmp_path / "communities.snapshot"))
+    snapshot = CommunitySnapshot.open(str(tmp_path / "communities.snapshot"))
+
+    assert list(snapshot) == ["7", "2"]
+    assert snapshot.members("7") == ["@zed", "@amy"]
+    assert {community: dict(snapshot[community], hashtags=sorted(snapshot[community]["hashtags"]))
+            for community in snapshot} == {"7": dict(communities["7"], hashtags=["#a", "#b"]), "2": communities["2"]}
@@ -0,0 +1,41 @@
+import json
+
+from sourceManifest import MIN_COMPACT_LINES, SourceManifest
+
+def test_touchedSourcesAppendOnlyTimesAndCompact(tmp_path):
+    manifestFile = tmp_path / "parsedSources.manifest"
+    manifest = SourceManifest(str(manifestFile))
+
+    entry = {"source": "@a-video.txt", "size": 10, "mtime": 0, "hash": "x",
+             "contribution": {"count": 3, "comments": [["@b", "key"]] * 50}}
+    manifest.note([entry, {"source": "@c-video.txt", "size": 1, "mtime": 0, "hash": "y", "contribution": {}}])
+
+    manifest.note([dict(entry, mtime=1)])
+    assert json.loads(manifestFile.read_text().splitlines()[-1]) == {"source": "@a-video.txt", "mtime": 1}
+
+    # Noting the same entry again writes nothing
+    manifest.note([dict(entry, mtime=1)])
+    assert len(manifestFile.read_text().splitlines()) == 3
+
+    for mtime in range(2, 3 * MIN_COMPACT_LINES):
+        manifest.note([dict(entry, mtime=mtime)])
+
+    assert len(manifestFile.read_text().splitlines()) < MIN_COMPACT_LINES
+
+    expected = dict(entry, mtime=3 * MIN_COMPACT_LINES - 1)
+    assert manifest.entry("@a-video.txt") == expected
+    assert SourceManifest(str(manifestFile)).entry("@a-video.txt") == expected
+    assert SourceManifest(str(manifestFile)).entry("@c-video.txt")["hash"] == "y"
+
+def test_legacySourcesStayParsedAfterCompaction(tmp_path):
+    legacyFile = tmp_path / "parsedSources.txt"
+    legacyFile.write_text("@old-video.txt\n")
+    manifestFile = tmp_path / "parsedSources.manifest"
+
+    manifest = SourceManifest(str(manifestFile), str(legacyFile))
+    manifest.note([{"source": "@new-video.txt", "size": 1, "mtime": 0, "hash": "z", "contribution": {}}])
+    manifest.compact()
+
+    assert manifestFile.read_text().count("\n") == 1
+    reloaded = SourceManifest(str(manifestFile), str(legacyFile))
+    assert "@old-video.txt" in reloaded and "@new-video.txt" in reloaded
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from sqliteStorage import SqliteStorage
+
+COMMENTS_RECORD = {
+    "type": "comments",
+    "creator": "@anna",
+    "count": 4,
+    "hashtags": ["#a", "#b"],
+    "comments": [["@bob", "Nice video", 3], ["@carl", "first", 0], ["@bob", "Nice video", 3]],
+}
+FOLLOWERS_RECORD = {"type": "follows", "account": "@anna", "kind": "Followers", "count": 10,
+                    "users": ["@bob", "@dora", ""]}
+FOLLOWING_RECORD = {"type": "follows", "account": "@bob", "kind": "Following", "count": 2, "users": ["@anna", "@carl"]}
+
+def entryOf(source: str) -> dict:
+    return {"source": source, "size": 1, "mtime": 2, "hash": source, "contribution": {"count": 1}}
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "data.db"))
+    yield storage
+    storage.close()
+
+def test_appliedRecordsAreQueryable(storage):
+    storage.applyRecord("comments.txt", COMMENTS_RECORD, entryOf("comments.txt"))
+    storage.applyRecord("followers.txt", FOLLOWERS_RECORD, entryOf("followers.txt"))
+    storage.applyRecord("following.txt", FOLLOWING_RECORD, entryOf("following.txt"))
+
+    assert list(storage) == ["@anna", "@bob", "@carl", "@dora"]
+    assert len(storage) == 4 and "@carl" in storage and "" not in storage and "@zed" not in storage
+
+    assert sorted(storage.followersOf("@anna")) == ["@bob", "@dora"]
+    assert sorted(storage.followingOf("@bob")) == ["@anna", "@carl"]
+    assert sorted(storage.commentersOf("@anna")) == ["@bob", "@carl"]
+    assert storage.commentedOnBy("@carl") == ["@anna"]
+    assert sorted(storage.hashtagsOf("@bob")) == ["#a", "#b"]
+    assert sorted(storage.usersWithHashtag("#a")) == ["@anna", "@bob", "@carl"]
+    assert storage.commentsPostedBy("@bob") == [{"text": "nice video", "likes": 3, "hashtags": ["#a", "#b"]}]
+
+    anna = storage["@anna"]
+    assert (anna["totalFollowersCount"], anna["shownFollowersCount"]) == (10, 2)
+    assert (anna["totalCommentsCount"], anna["shownCommentsCount"]) == (4, 2)
+    assert storage["@bob"]["totalFollowingCount"] == 2
+    with pytest.raises(KeyError):
+        storage["@zed"]
+
+    assert storage.sourceEntry("comments.txt") == entryOf("comments.txt")
+    assert storage.sourceEntry("missing.txt") is None
+    assert storage.hashtagStatistics() == {"#a": {"count": 1, "connections": ["#b"]},
+                                           "#b": {"count": 1, "connections": ["#a"]}}
+
+def test_failedRecordRollsBackTheUncommittedBatch(tmp_path, storage):
+    storage.applyRecord("comments.txt", COMMENTS_RECORD, entryOf("comments.txt"))
+
+    # Batch mode - the records wait for the commit, the failing one drops the whole batch
+    storage.applyRecord("followers.txt", FOLLOWERS_RECORD, entryOf("followers.txt"), commit=False)
+    with pytest.raises(ValueError):
+        storage.applyRecord("broken.txt", {"type": "unknown"}, entryOf("broken.txt"), commit=False)
+    storage.commit()
+
+    reopened = SqliteStorage(str(tmp_path / "data.db"))
+    for opened in (storage, reopened):
+        assert opened.followersOf("@anna") == []
+        assert opened.sourceEntry("followers.txt") is None and opened.sourceEntry("broken.txt") is None
+        assert opened.sourceEntry("comments.txt") == entryOf("comments.txt")
+        assert "@dora" not in opened
+    reopened.close()
+
+def test_rollbackDropsUncommittedRecords(storage):
+    storage.applyRecord("comments.txt", COMMENTS_RECORD, entryOf("comments.txt"), commit=False)
+    storage.rollback()
+
+    assert len(storage) == 0
+    assert storage.sourceEntry("comments.txt") is None
+
+def test_exportJsonWritesTheStoredData(tmp_path, storage):
+    storage.applyRecord("comments.txt", COMMENTS_RECORD, entryOf("comments.txt"))
+    storage.applyRecord("followers.txt", FOLLOWERS_RECORD, entryOf("followers.txt"))
+
+    storage.exportJson(str(tmp_path / "data.json"), str(tmp_path / "hashtags.json"))
+
+    with open(tmp_path / "data.json") as file:
+        data = json.load(file)
+    with open(tmp_path / "hashtags.json") as file:
+        hashtags = json.load(file)
+
+    assert data == {user: storage[user] for user in storage}
+    assert hashtags == storage.hashtagStatistics()